@@ -15,10 +15,25 @@
 ## limitations under the License.
 ##
 
-from .common.emm_engine import EMMEngine
-from .common.emm import EMM
+from .common.emm_engine import EMMEngine, DEFAULT_CHUNK_SIZE
+from .common.emm import EMM, EMMND
+from .common.plaintext_engine import PlaintextEngine
+from .common.prf import PRF_BACKENDS
+from .common.snapshot import CLIENT_FILE, load_key
+from .common.store import (
+    STORE_WRITERS,
+    CompactStore,
+    ShardedStore,
+    save_index,
+    split_index,
+    store_size_bytes,
+)
+from ..server.harness import LocalShardCluster
+from ..server.load import measure_throughput
 from ..structures.point import Point
+from ..util.serialization import LABEL_CODECS
 from ..structures.point_3d import Point3D
+from ..structures.point_nd import PointND
 
 from .range_brc import RangeBRC
 from .range_brc_3d import RangeBRC3D
@@ -26,7 +41,7 @@ from .range_brc_3d import RangeBRC3D
 from .qdag_src import QdagSRC
 from .qdag_src_3d import QdagSRC3D
 
-from .linear import Linear,Linear3D
+from .linear import Linear,Linear3D,LinearND
 
 from .quad_brc import QuadBRC
 from .quad_brc_3d import QuadBRC3D
@@ -34,6 +49,11 @@ from .quad_brc_3d import QuadBRC3D
 from .tdag_src import TdagSRC
 from .tdag_src_3d import TdagSRC3D
 
+from .range_brc_nd import RangeBRCND
+from .quad_brc_nd import QuadBRCND
+from .tdag_src_nd import TdagSRCND
+from .qdag_src_nd import QdagSRCND
+
 
 from ..util.crypto import SecureRandom
 
@@ -44,6 +64,8 @@ from itertools import accumulate
 import secrets
 import itertools
 import argparse
+import os
+import tempfile
 import json
 import random
 import time
@@ -60,6 +82,8 @@ BOUND_Y = 2 ** 3
 DOC_LENGTH = 10
 NUM_QUERIES = 100
 NUM_PROCESSES = 16
+LOOKUP_SAMPLE = 100000
+CODEC_SAMPLE = 100000
 
 
 def next_power_of_2(x):
@@ -101,6 +125,16 @@ def points_3d_to_multimap(pts: List[List[int]]):
     return mm, bound
 
 
+def points_nd_to_multimap(pts: List[List[int]]):
+    mm = defaultdict(list)
+
+    max_coord = 0
+    for coords in pts:
+        mm[PointND(*coords)].append(" ".join(map(str, coords)).encode())
+        max_coord = max(max_coord, *coords)
+    return mm, next_power_of_2(max_coord + 1)
+
+
 def generate_random_database(
     bound_x: int, bound_y: int, num_elts: int, bound_document_length: int
 ) -> Multimap:
@@ -197,11 +231,88 @@ def generate_random_3d_query(bound_x: int, bound_y: int, bound_z: int) -> Tuple[
     return (p1, p2)
 
 
+def generate_random_nd_query(bound: int, dims: int) -> Tuple[PointND, PointND]:
+    corners = [sorted((secrets.randbelow(bound), secrets.randbelow(bound))) for _ in range(dims)]
+    return PointND(*(low for low, _ in corners)), PointND(*(high for _, high in corners))
+
+
+def range_volume(p1: PointND, p2: PointND) -> int:
+    volume = 1
+    for low, high in zip(p1, p2):
+        volume *= high - low + 1
+    return volume
+
+
 # note: include token db for storage measurement for DPRF
 
 
-def run_benchmarks(schemes, datasets, run_query, benchmark):
-    
+def measure_label_codecs(bound: int) -> Dict[str, float]:
+    """
+    Labels encoded per second by each serialization.LABEL_CODECS entry, on
+    random Range-BRC-style labels (a pair of ranges) within `bound`.
+    """
+    labels = [
+        [sorted(random.sample(range(bound), 2)), sorted(random.sample(range(bound), 2))]
+        for _ in range(CODEC_SAMPLE)
+    ]
+    rates = {}
+    for name, encode in LABEL_CODECS.items():
+        t0 = time.perf_counter()
+        for label in labels:
+            encode(label)
+        rates[name] = len(labels) / (time.perf_counter() - t0)
+    return rates
+
+
+def start_remote_search(
+    s, prf_name: str, index_dir: str, server_args: List[str] = (), num_shards: int = 1
+) -> LocalShardCluster:
+    """
+    Serves the scheme's encrypted index from separate `ers.server` processes
+    (each started with `server_args`), one per shard. A
+    memory-mapped or sharded store is served from its own files; any other
+    store is written to `index_dir` first, split into `num_shards` shards
+    if that is more than one.
+    """
+    if isinstance(s.encrypted_db, ShardedStore):
+        paths = s.encrypted_db.paths
+    elif isinstance(s.encrypted_db, CompactStore) and s.emm_engine.store == "mmap":
+        paths = [s.emm_engine.store_path]
+    elif num_shards > 1:
+        index_path = os.path.join(index_dir, "index.ers")
+        sharded = split_index(s.encrypted_db, index_path, num_shards, prf_name)
+        sharded.close()
+        paths = sharded.paths
+    else:
+        paths = [os.path.join(index_dir, "index.ers")]
+        save_index(s.encrypted_db, paths[0], prf_name)
+    cluster = LocalShardCluster(paths, server_args)
+    cluster.start()
+    return cluster
+
+
+def run_benchmarks(
+    schemes,
+    datasets,
+    run_query,
+    benchmark,
+    engine_options=None,
+    remote=False,
+    server_workers=1,
+    load_clients=0,
+    dry_run=False,
+    snapshot_dir=None,
+):
+    if engine_options is None:
+        engine_options = {}
+    transport = "remote" if remote else "local"
+    server_stats = None
+    queries_per_sec = None
+    shard_sizes = None
+    cache_stats = None
+    token_cache_stats = None
+    instrumentation = {}
+
     storage_results = defaultdict(list)
     query_size_results = defaultdict(list)
     query_gen_time_results = defaultdict(list)
@@ -211,8 +322,13 @@ def run_benchmarks(schemes, datasets, run_query, benchmark):
 
     i = 0
     for ds, bound in datasets:
-        is_2d_database = isinstance(list(ds.keys())[0], Point)
-        if is_2d_database:
+        first_point = list(ds.keys())[0]
+        is_2d_database = isinstance(first_point, Point)
+        is_nd_database = isinstance(first_point, PointND)
+        if is_nd_database:
+            num_dims = len(first_point)
+            print(f"{num_dims}d database: " + " x ".join([str(bound)] * num_dims))
+        elif is_2d_database:
             print(f"2d database: {bound} x {bound}")
         else:
             print(f"3d database: {bound} x {bound} x {bound}")
@@ -220,7 +336,13 @@ def run_benchmarks(schemes, datasets, run_query, benchmark):
         bucks = defaultdict(list)
         ten_bucks = defaultdict(list)
 
-        if is_2d_database:
+        if is_nd_database:
+            for ps in tqdm(range(NUM_QUERIES*100000)):
+                p1, p2 = generate_random_nd_query(bound, num_dims)
+                percent_bucket = (int(100* range_volume(p1, p2) / (bound ** num_dims)))
+                ten_bucks[10*int(percent_bucket/10)].append((p1,p2))
+                bucks[percent_bucket].append((p1,p2))
+        elif is_2d_database:
             for ps in tqdm(range(NUM_QUERIES*10000)):
                 p1, p2 = generate_random_query(bound, bound)
                 range_size = (p2.x - p1.x+1) * (p2.y - p1.y+1)
@@ -251,15 +373,40 @@ def run_benchmarks(schemes, datasets, run_query, benchmark):
         for scheme in schemes:
             print(str(scheme.__name__))
 
+            snapshot_path = None
+            if snapshot_dir is not None:
+                snapshot_path = os.path.join(snapshot_dir, scheme.__name__)
+            loaded = snapshot_path is not None and os.path.exists(
+                os.path.join(snapshot_path, CLIENT_FILE)
+            )
+
             t0 = time.time_ns()
-            print("Building index...")
-            s = scheme(EMMEngine(bound, bound))
-            key = s.setup(16)
-            s.build_index(key, ds)
+            if loaded:
+                print("Loading snapshot from", snapshot_path)
+                s = scheme.load(snapshot_path, **engine_options)
+                key = s.key_context(load_key(snapshot_path))
+            else:
+                print("Building index...")
+                engine_class = PlaintextEngine if dry_run else EMMEngine
+                if issubclass(scheme, EMMND):
+                    s = scheme(engine_class(bound, bound, **engine_options), dims=num_dims)
+                else:
+                    s = scheme(engine_class(bound, bound, **engine_options))
+                key = s.key_context(s.setup(16))
+                s.build_index(key, ds)
             t1 = time.time_ns()
 
             total_time = t1 - t0
             print("Took", total_time, "ns")
+            if snapshot_path is not None and not loaded:
+                print("Saving snapshot to", snapshot_path)
+                s.save(snapshot_path, key)
+            prf_name = s.emm_engine.prf.name
+            num_entries = len(s.encrypted_db)
+            packing_stats = s.emm_engine.packing_stats
+            if s.instrumentation is not None:
+                instrumentation["build"] = s.instrumentation.snapshot()
+                s.instrumentation.reset()
 
             # FALSE POSITIVE COMPARISON
             if False:
@@ -273,12 +420,32 @@ def run_benchmarks(schemes, datasets, run_query, benchmark):
                     false_positive_s.build_index(false_positive_key, ds)
 
             print("Accumulating storage results...")
-            encrypted_db_size = sum(
-                        (
-                            sys.getsizeof(k) + sys.getsizeof(v)
-                            for k, v in s.encrypted_db.items()
-                        )
-                    )
+            encrypted_db_size = store_size_bytes(s.encrypted_db)
+            label_width = s.emm_engine.label_width
+            probe_labels = list(itertools.islice(iter(s.encrypted_db), LOOKUP_SAMPLE))
+            t0 = time.time_ns()
+            for label in probe_labels:
+                s.encrypted_db.get(label)
+            t1 = time.time_ns()
+            lookups_per_sec = len(probe_labels) / ((t1 - t0) / 10**9) if t1 > t0 else 0
+            label_bytes = len(s.encrypted_db) * len(probe_labels[0]) if probe_labels else 0
+
+            cluster, client = None, None
+            if remote and run_query:
+                index_dir = tempfile.TemporaryDirectory()
+                server_args = ["--workers", str(server_workers)]
+                if engine_options.get("cache_bytes"):
+                    server_args += ["--cache_bytes", str(engine_options["cache_bytes"])]
+                cluster = start_remote_search(
+                    s,
+                    prf_name,
+                    index_dir.name,
+                    server_args,
+                    s.emm_engine.num_shards,
+                )
+                shard_sizes = cluster.shard_sizes
+                client = cluster.client()
+            sent_trapdoors = []
 
             if run_query:
                 print("Running query benchmarks!...")
@@ -291,7 +458,9 @@ def run_benchmarks(schemes, datasets, run_query, benchmark):
 
                     def do_query_benchmark(p1, p2,target_bucket):
                         range_size = 0
-                        if is_2d_database:
+                        if is_nd_database:
+                            range_size = range_volume(p1, p2)
+                        elif is_2d_database:
                             range_size = (p2.x - p1.x) * (p2.y - p1.y)
                         else:
                             range_size = (p2.x - p1.x) * (p2.y - p1.y) * (p2.z - p1.z)
@@ -317,7 +486,11 @@ def run_benchmarks(schemes, datasets, run_query, benchmark):
 
                         t0 = time.time_ns()
                         #print(p1,p2)
-                        results = s.search(to_be_sent)
+                        if client is not None:
+                            sent_trapdoors.append(to_be_sent)
+                            results = client.search(to_be_sent)
+                        else:
+                            results = s.search(to_be_sent)
                         t1 = time.time_ns()
                         handling_time = t1 - t0
 
@@ -353,7 +526,10 @@ def run_benchmarks(schemes, datasets, run_query, benchmark):
 
                     elif benchmark=="all":
                         for i in tqdm(range(0,NUM_QUERIES)):
-                            do_query_benchmark(Point(0,0), Point(bound-2,bound-2) ,100)
+                            if is_nd_database:
+                                do_query_benchmark(PointND(*[0] * num_dims), PointND(*[bound-2] * num_dims), 100)
+                            else:
+                                do_query_benchmark(Point(0,0), Point(bound-2,bound-2) ,100)
 
                     else:
                         for target_bucket in tqdm(range(0,99,10)):
@@ -368,14 +544,124 @@ def run_benchmarks(schemes, datasets, run_query, benchmark):
 
 
                     print("Getting ", NUM_QUERIES, "queries took ", end -start )
+
+            if s.instrumentation is not None:
+                instrumentation["query"] = s.instrumentation.snapshot()
+            if s.emm_engine.result_cache is not None:
+                cache_stats = s.emm_engine.result_cache.stats()
+            token_cache = s.emm_engine.key_context(key).token_cache
+            if token_cache is not None:
+                token_cache_stats = token_cache.stats()
+            if client is not None:
+                server_stats = client.stats()
+                if "cache_hits" in server_stats:
+                    cache_stats = server_stats
+                if load_clients > 0:
+                    print("Measuring throughput with", load_clients, "clients...")
+                    queries_per_sec = measure_throughput(
+                        cluster.connector(), sent_trapdoors, load_clients
+                    )
+                client.close()
+                cluster.stop()
+                index_dir.cleanup()
+            s.emm_engine.close()
         i += 1
 
+    codec_rates = measure_label_codecs(max(bound, 2))
     print("Done.")
     print("IndexSizeBytes,ConstructTimeNS")
     for scheme in schemes:
         name = scheme.__name__
         print(f"{encrypted_db_size},{total_time}")
         print("----")
+        print("PRFBackend,BuildEntriesPerSec,SearchResultsPerSec")
+        total_results = sum(sum(counts) for counts in storage_results.values())
+        total_handling_time = sum(
+            sum(times) for times in server_handling_time_results.values()
+        )
+        search_throughput = (
+            total_results / (total_handling_time / 10**9)
+            if total_handling_time
+            else 0
+        )
+        print(
+            f"{prf_name},{num_entries / (total_time / 10**9)},{search_throughput}"
+        )
+        print("----")
+        print("Transport,Queries,AvgSearchLatencySec")
+        num_searches = sum(
+            len(times) for times in server_handling_time_results.values()
+        )
+        print(
+            f"{transport},{num_searches},"
+            f"{total_handling_time / num_searches / 10**9 if num_searches else 0}"
+        )
+        if server_stats is not None:
+            print("----")
+            print(
+                "ServerRequests,InlineRequests,OffloadedRequests,"
+                "LatencyMeanSec,LatencyP99Sec,MaxQueueDepth"
+            )
+            print(
+                f"{server_stats['requests']},{server_stats['inline_requests']},"
+                f"{server_stats['offloaded_requests']},"
+                f"{server_stats['latency_mean_sec']},"
+                f"{server_stats['latency_p99_sec']},"
+                f"{server_stats['max_queue_depth']}"
+            )
+        if cache_stats is not None:
+            print("----")
+            print("CacheHits,CacheMisses,CacheHitRate,CacheEvictions,CacheBytes")
+            print(
+                f"{cache_stats['cache_hits']},{cache_stats['cache_misses']},"
+                f"{cache_stats['cache_hit_rate']},{cache_stats['cache_evictions']},"
+                f"{cache_stats['cache_bytes']}"
+            )
+        if token_cache_stats is not None:
+            print("----")
+            print("TokenCacheHits,TokenCacheMisses,TokenCacheHitRate")
+            print(
+                f"{token_cache_stats['token_cache_hits']},"
+                f"{token_cache_stats['token_cache_misses']},"
+                f"{token_cache_stats['token_cache_hit_rate']}"
+            )
+        print("----")
+        print("LabelCodec,InUse,LabelsEncodedPerSec")
+        for codec, rate in codec_rates.items():
+            print(f"{codec},{codec == s.emm_engine.label_codec},{rate}")
+        if instrumentation:
+            print("----")
+            print("Stage,Counter,Value")
+            for stage, values in instrumentation.items():
+                for name, value in values.items():
+                    print(f"{stage},{name},{value}")
+        if shard_sizes is not None and len(shard_sizes) > 1:
+            print("----")
+            print("Shards,MinShardEntries,MaxShardEntries,Imbalance")
+            mean_size = sum(shard_sizes) / len(shard_sizes)
+            print(
+                f"{len(shard_sizes)},{min(shard_sizes)},{max(shard_sizes)},"
+                f"{max(shard_sizes) / mean_size if mean_size else 0}"
+            )
+        if queries_per_sec is not None:
+            print("----")
+            print("ServerWorkers,LoadClients,QueriesPerSec")
+            print(f"{server_workers},{load_clients},{queries_per_sec}")
+        print("----")
+        print("LabelWidth,LabelBytes,IndexSizeBytes,LookupsPerSec")
+        print(
+            f"{label_width or 'full'},{label_bytes},"
+            f"{encrypted_db_size},{lookups_per_sec}"
+        )
+        if packing_stats is not None:
+            print("----")
+            print("BlockSize,Values,Blocks,PaddingSlots,PaddingOverhead")
+            print(
+                f"{packing_stats['block_size']},{packing_stats['values']},"
+                f"{packing_stats['blocks']},{packing_stats['padding_slots']},"
+                f"{packing_stats['padding_slots'] / packing_stats['values']}"
+            )
+        print("----")
         print("PercentOfDomain,Average Query Time (sec)")
         for bucket, sizes in query_gen_time_results.items():
             print(f"{bucket},{(sum(sizes) / len(sizes))/10**9}")
@@ -413,7 +699,119 @@ if __name__ == "__main__":
     parser.add_argument("run_query", nargs="?", default=None)
     parser.add_argument("num_queries", nargs="?", default=None)
     parser.add_argument("benchmark", nargs="?", default=None)
+    parser.add_argument(
+        "--num_processes",
+        type=int,
+        default=1,
+        help="worker processes used to encrypt the index and decrypt results",
+    )
+    parser.add_argument("--chunk_size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument(
+        "--prf",
+        choices=sorted(PRF_BACKENDS),
+        default="sha512",
+        help="PRF/hash backend used for search tokens and labels",
+    )
+    parser.add_argument(
+        "--block_size",
+        default="1",
+        help='values packed per encrypted entry, or "auto"',
+    )
+    parser.add_argument(
+        "--search_threads",
+        type=int,
+        default=1,
+        help="threads used by the server to search large token sets",
+    )
+    parser.add_argument(
+        "--store",
+        choices=sorted(STORE_WRITERS),
+        default="dict",
+        help="layout of the encrypted index",
+    )
+    parser.add_argument(
+        "--store_path",
+        default=None,
+        help='file the "mmap" or "sqlite" store writes the index to ("sharded" appends .0, .1, ...)',
+    )
+    parser.add_argument(
+        "--label_width",
+        type=int,
+        default=None,
+        help="truncate ciphertext labels to this many bytes",
+    )
+    parser.add_argument(
+        "--memory_budget",
+        type=int,
+        default=None,
+        help="group index entries on disk, buffering at most this many bytes",
+    )
+    parser.add_argument(
+        "--spill_dir",
+        default=None,
+        help="directory for the on-disk runs of --memory_budget",
+    )
+    parser.add_argument(
+        "--cache_bytes",
+        type=int,
+        default=None,
+        help="cache search results by token in about this many bytes (server side with --remote)",
+    )
+    parser.add_argument(
+        "--token_cache_size",
+        type=int,
+        default=None,
+        help="cache this many trapdoor tokens per key on the client",
+    )
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        help="count PRF calls, probes and AES operations and time the build and query phases",
+    )
+    parser.add_argument(
+        "--num_shards",
+        type=int,
+        default=1,
+        help='shards of the "sharded" store, or of the --remote index',
+    )
+    parser.add_argument(
+        "--label_codec",
+        choices=sorted(LABEL_CODECS),
+        default="binary",
+        help='how cover nodes are serialized into labels ("json" for indexes built before the binary codec)',
+    )
+    parser.add_argument(
+        "--dry_run",
+        action="store_true",
+        help="index and search without encryption to profile scheme structure",
+    )
+    parser.add_argument(
+        "--snapshot_dir",
+        default=None,
+        help="load each scheme from a snapshot in this directory, or build it and save one there",
+    )
+    parser.add_argument(
+        "--remote",
+        action="store_true",
+        help="send search tokens to a local ers.server process over TCP",
+    )
+    parser.add_argument(
+        "--server_workers",
+        type=int,
+        default=1,
+        help="worker processes of the --remote server",
+    )
+    parser.add_argument(
+        "--load_clients",
+        type=int,
+        default=0,
+        help="measure --remote throughput with this many concurrent clients",
+    )
     args = parser.parse_args()
+    if args.dry_run and (args.remote or args.store != "dict"):
+        parser.error("--dry_run keeps the index in memory; it cannot be combined with --remote or --store")
+    if args.dry_run and args.snapshot_dir:
+        parser.error("--dry_run indexes cannot be saved as snapshots")
 
     data_file = args.dataset
     datasets = []
@@ -442,7 +840,13 @@ if __name__ == "__main__":
     if int(args.num_records) == -1:
         args.num_records = len(pts)
 
-    if num_dims == 2:
+    # Datasets of four or more dimensions, and the "_nd" schemes, use the
+    # dimension-agnostic scheme family.
+    nd_scheme_name = args.scheme_name if args.scheme_name.endswith("_nd") else args.scheme_name + "_nd"
+    if num_dims > 3 or args.scheme_name.endswith("_nd"):
+        args.scheme_name = nd_scheme_name
+        datasets.append(points_nd_to_multimap(random.sample(pts, int(args.num_records))))
+    elif num_dims == 2:
         datasets.append(points_to_multimap(random.sample(pts, int(args.num_records))))
     elif num_dims == 3:
         datasets.append(points_3d_to_multimap(pts[0 : int(args.num_records)]))
@@ -458,7 +862,11 @@ if __name__ == "__main__":
         "quad_brc_3d": QuadBRC3D,
         "tdag_src":TdagSRC,
         "tdag_src_3d":TdagSRC3D,
-
+        "linear_nd": LinearND,
+        "range_brc_nd": RangeBRCND,
+        "quad_brc_nd": QuadBRCND,
+        "tdag_src_nd": TdagSRCND,
+        "qdag_src_nd": QdagSRCND,
     }
     schemes = [scheme_dict[args.scheme_name]]
 
@@ -470,4 +878,33 @@ if __name__ == "__main__":
         query_size_results,
         query_gen_time_results,
         server_handling_time_results,
-    ) = run_benchmarks(schemes, datasets, is_run_query, args.benchmark)
+    ) = run_benchmarks(
+        schemes,
+        datasets,
+        is_run_query,
+        args.benchmark,
+        engine_options={
+            "num_processes": args.num_processes,
+            "chunk_size": args.chunk_size,
+            "prf": args.prf,
+            "block_size": (
+                args.block_size if args.block_size == "auto" else int(args.block_size)
+            ),
+            "search_threads": args.search_threads,
+            "store": args.store,
+            "store_path": args.store_path,
+            "label_width": args.label_width,
+            "memory_budget": args.memory_budget,
+            "spill_dir": args.spill_dir,
+            "num_shards": args.num_shards,
+            "cache_bytes": args.cache_bytes,
+            "token_cache_size": args.token_cache_size,
+            "instrument": args.instrument,
+            "label_codec": args.label_codec,
+        },
+        remote=args.remote,
+        server_workers=args.server_workers,
+        load_clients=args.load_clients,
+        dry_run=args.dry_run,
+        snapshot_dir=args.snapshot_dir,
+    )
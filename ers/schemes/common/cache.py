@@ -0,0 +1,158 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import threading
+
+# Approximate bytes of bookkeeping charged per cached posting list and per
+# ciphertext in it, on top of the token and ciphertext bytes themselves.
+ENTRY_OVERHEAD = 200
+ITEM_OVERHEAD = 40
+
+
+class ResultCache:
+    """
+    Bounded cache of search results keyed by search token, evicting the least
+    recently used posting lists once the cached ciphertexts exceed
+    `max_bytes`. Safe to share between threads.
+
+    A cached result is only valid for the index it was read from; call
+    invalidate() whenever that index is rebuilt or changed.
+    """
+
+    def __init__(self, max_bytes: int):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[bytes, Tuple[Tuple[bytes, ...], int]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: bytes) -> Optional[Tuple[bytes, ...]]:
+        """
+        The ciphertexts cached for `token`, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: bytes, results: Iterable[bytes]) -> None:
+        """
+        Caches the complete result of searching `token`. A result larger
+        than the whole cache is not kept.
+        """
+        results = tuple(results)
+        size = (
+            ENTRY_OVERHEAD
+            + len(token)
+            + sum(len(item) + ITEM_OVERHEAD for item in results)
+        )
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(token, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            self._entries[token] = (results, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        """
+        Drops every cached result; the counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": self.hits / lookups if lookups else 0,
+            "cache_evictions": self.evictions,
+            "cache_entries": len(self._entries),
+            "cache_bytes": self.nbytes,
+        }
+
+
+class TokenCache:
+    """
+    Bounded LRU map from label bytes to the search token derived from them
+    under one key, so the cover nodes shared by overlapping queries are
+    only run through the PRF once. Holds at most `max_entries` tokens.
+    """
+
+    def __init__(self, max_entries: int):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._tokens: "OrderedDict[bytes, bytes]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def __contains__(self, label: bytes) -> bool:
+        return label in self._tokens
+
+    def token(self, label: bytes, derive: Callable[[bytes], bytes]) -> bytes:
+        """
+        Returns the cached token for `label`, or derives it with `derive`
+        and caches it.
+        """
+        tokens = self._tokens
+        token = tokens.get(label)
+        if token is not None:
+            tokens.move_to_end(label)
+            self.hits += 1
+            return token
+        self.misses += 1
+        token = derive(label)
+        tokens[label] = token
+        if len(tokens) > self.max_entries:
+            tokens.popitem(last=False)
+        return token
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "token_cache_hits": self.hits,
+            "token_cache_misses": self.misses,
+            "token_cache_hit_rate": self.hits / lookups if lookups else 0,
+            "token_cache_entries": len(self._tokens),
+        }
@@ -15,9 +15,15 @@
 ## limitations under the License.
 ##
 
-from .emm_engine import EMMEngine
+from .emm_engine import EMMEngine, Key, KeyContext
+from .instrumentation import NULL_PHASE, Instrumentation
+from .plaintext_engine import PlaintextEngine
+from .snapshot import CLIENT_FILE, INDEX_FILE, read_client_file, write_client_file
+from .store import CompactStore, save_index
 
-from typing import Set
+from typing import ContextManager, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+import os
 
 
 class EMM:
@@ -27,5 +33,158 @@ class EMM:
     def setup(self, security_parameter: int) -> bytes:
         return self.emm_engine.setup(security_parameter)
 
-    def resolve(self, key: bytes, results: Set[bytes]) -> Set[bytes]:
+    def key_context(self, key: Key) -> KeyContext:
+        """
+        Returns the derived-key context for `key`. It can be passed to
+        build_index, trapdoor and resolve in place of the raw key.
+        """
+        return self.emm_engine.key_context(key)
+
+    @property
+    def instrumentation(self) -> Optional[Instrumentation]:
+        """
+        The engine's counters and phase timers, or None while collection is
+        off.
+        """
+        return self.emm_engine.instrumentation
+
+    def encode_label(self, o: object) -> bytes:
+        """
+        Serializes a cover node (nested lists of ints) with the engine's
+        label codec.
+        """
+        return self.emm_engine.encode_label(o)
+
+    def phase(self, name: str) -> ContextManager[None]:
+        """
+        Times the enclosed block as phase `name` when instrumentation is on.
+        """
+        stats = self.emm_engine.instrumentation
+        return NULL_PHASE if stats is None else stats.phase(name)
+
+    def _init_structures(self) -> None:
+        """
+        Builds the client-side structures (trees over the domain) that
+        trapdoor needs; build_index calls it first.
+        """
+
+    def _client_state(self) -> bytes:
+        """
+        The client-side structures as bytes, for schemes whose structures
+        are too slow to rebuild in _restore_client_state. Everything else
+        is a function of the engine's domain and is rebuilt on load.
+        """
+        return b""
+
+    def _restore_client_state(self, state: bytes) -> None:
+        self._init_structures()
+
+    def _scheme_options(self) -> Dict[str, object]:
+        """
+        Constructor arguments besides the engine that a snapshot must record
+        to recreate the scheme.
+        """
+        return {}
+
+    def save(self, path: str, key: Key = None) -> None:
+        """
+        Writes a snapshot of the built scheme to the directory `path` (see
+        snapshot.py): the client artefact, holding the engine parameters the
+        index was built with, the client-side structures and, if given, the
+        secret `key`, and the server artefact, the encrypted index.
+        """
+        engine = self.emm_engine
+        if isinstance(engine, PlaintextEngine):
+            raise ValueError("A dry-run index cannot be saved")
+        if engine.block_size == "auto":
+            raise ValueError("Call build_index before saving the scheme")
+        if isinstance(key, KeyContext):
+            key = key.key
+        os.makedirs(path, exist_ok=True)
+        metadata = {
+            "scheme": type(self).__name__,
+            "max_x": engine.MAX_X,
+            "max_y": engine.MAX_Y,
+            "prf": engine.prf.name,
+            "block_size": engine.block_size,
+            "label_width": engine.label_width,
+            "label_codec": engine.label_codec,
+            "options": self._scheme_options(),
+        }
+        write_client_file(
+            os.path.join(path, CLIENT_FILE), metadata, key, self._client_state()
+        )
+        save_index(self.encrypted_db, os.path.join(path, INDEX_FILE), engine.prf.name)
+
+    @classmethod
+    def load(cls, path: str, **engine_options) -> "EMM":
+        """
+        Restores a scheme written by `save` to the directory `path`, with its
+        encrypted index memory-mapped from the server artefact. The saved
+        engine parameters override those in `engine_options`; the saved key,
+        if any, is returned by snapshot.load_key.
+        """
+        metadata, _, state = read_client_file(os.path.join(path, CLIENT_FILE))
+        if metadata["scheme"] != cls.__name__:
+            raise ValueError(
+                f"Snapshot holds a {metadata['scheme']} index, not a {cls.__name__} one"
+            )
+        index_path = os.path.join(path, INDEX_FILE)
+        engine_options.update(
+            prf=metadata["prf"],
+            block_size=metadata["block_size"],
+            label_width=metadata["label_width"],
+            label_codec=metadata["label_codec"],
+            store="mmap",
+            store_path=index_path,
+        )
+        scheme = cls(
+            EMMEngine(metadata["max_x"], metadata["max_y"], **engine_options),
+            **metadata.get("options", {}),
+        )
+        scheme._restore_client_state(state)
+        scheme.encrypted_db = CompactStore.open(index_path)
+        return scheme
+
+    def resolve(self, key: Key, results: Set[bytes]) -> Set[bytes]:
         return self.emm_engine.resolve(key, results)
+
+    def resolve_iter(self, key: Key, results: Iterable[bytes]) -> Iterator[List[bytes]]:
+        return self.emm_engine.resolve_iter(key, results)
+
+
+class EMMND(EMM):
+    """
+    Base of the dimension-agnostic schemes, which index `dims`-dimensional
+    PointND keys in the hypercube [0, 2^height)^dims, 2^height being the
+    smallest power of two no less than the engine's MAX_X and MAX_Y. Their
+    covers are computed axis by axis from coordinates, so there are no
+    client-side structures to build or save.
+    """
+
+    def __init__(
+        self,
+        emm_engine: EMMEngine,
+        encrypted_db: Dict[bytes, bytes] = {},
+        dims: int = 2,
+    ):
+        if dims < 1:
+            raise ValueError("dims must be at least 1")
+        self.encrypted_db = encrypted_db
+        self.dims = dims
+        self.height = None
+        super().__init__(emm_engine)
+        self._init_structures()
+
+    def _init_structures(self) -> None:
+        side = max(self.emm_engine.MAX_X, self.emm_engine.MAX_Y)
+        self.height = (side - 1).bit_length()
+
+    def _scheme_options(self) -> Dict[str, object]:
+        return {"dims": self.dims}
+
+    def _check_dims(self, point: Sequence[int]) -> None:
+        if len(point) != self.dims:
+            raise ValueError(
+                f"{type(self).__name__} indexes {self.dims}-dimensional points, got {point}"
+            )
@@ -18,25 +18,268 @@
 from ...util.crypto import (
     SecureRandom,
     HashKDF,
-    HMAC,
-    Hash,
     SymmetricEncrypt,
-    SymmetricDecrypt,
+    SymmetricDecryptBatch,
 )
+from ...util.serialization import LABEL_CODECS
+from .cache import ResultCache, TokenCache
+from .grouping import ExternalGrouper
+from .instrumentation import Instrumentation
+from .prf import PRFBackend, get_prf_backend
+from .store import open_store_writer
 
-from typing import List, Dict, Set
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Set, Tuple, Union
 from tqdm import tqdm
+from collections import defaultdict, deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+import itertools
+import math
+import multiprocessing
+import struct
+import time
 
 PURPOSE_HMAC = "hmac"
 PURPOSE_ENCRYPT = "encryption"
 
-DO_NOT_ENCRYPT = False
+DEFAULT_CHUNK_SIZE = 4096
+
+# Candidate block sizes tried when EMMEngine is built with block_size="auto".
+AUTO_BLOCK_SIZES = [2 ** i for i in range(0, 11)]
+
+BLOCK_COUNT = struct.Struct(">I")
+
+# Shortest label EMMEngine(label_width=...) accepts.
+MIN_LABEL_WIDTH = 8
+
+# search_many only fans out to threads for token sets at least this large.
+PARALLEL_SEARCH_MIN_TOKENS = 256
+
+# resolve only fans out to worker processes for result sets at least this
+# large.
+PARALLEL_RESOLVE_MIN_RESULTS = 4096
+
+
+def pack_block(values: List[bytes], block_size: int) -> bytes:
+    """
+    Serialises up to `block_size` values into one block plaintext: a count
+    of real values followed by `block_size` length-prefixed slots. Slots past
+    the real values are empty padding.
+    """
+    parts = [BLOCK_COUNT.pack(len(values))]
+    for value in values:
+        parts.append(BLOCK_COUNT.pack(len(value)))
+        parts.append(value)
+    parts.append(bytes(BLOCK_COUNT.size * (block_size - len(values))))
+    return b"".join(parts)
+
+
+def unpack_block(block: bytes) -> List[bytes]:
+    """
+    Inverse of pack_block; padding slots are dropped.
+    """
+    (count,) = BLOCK_COUNT.unpack_from(block, 0)
+    offset = BLOCK_COUNT.size
+    values = []
+    for _ in range(count):
+        (length,) = BLOCK_COUNT.unpack_from(block, offset)
+        offset += BLOCK_COUNT.size
+        values.append(block[offset : offset + length])
+        offset += length
+    return values
+
+
+def choose_block_size(lengths: List[int]) -> int:
+    """
+    Picks the block size B from AUTO_BLOCK_SIZES that minimises the number of
+    blocks (one probe and one decryption each) plus the number of padding
+    slots, over a multimap whose posting lists have the given lengths.
+    """
+    best_size, best_cost = 1, None
+    for block_size in AUTO_BLOCK_SIZES:
+        blocks = sum(math.ceil(n / block_size) for n in lengths)
+        padding = blocks * block_size - sum(lengths)
+        cost = blocks + padding
+        if best_cost is None or cost < best_cost:
+            best_size, best_cost = block_size, cost
+    return best_size
+
+
+class KeyContext:
+    """
+    The keys derived from a secret key k, together with a token PRF that is
+    already keyed. Holding on to one avoids re-running HashKDF on every
+    trapdoor and resolve call. With `token_cache_size`, the tokens handed
+    out by trapdoor_token are also kept in a cache.TokenCache.
+    """
+
+    def __init__(self, key: bytes, prf: PRFBackend, token_cache_size: int = None):
+        self.key = key
+        self.hmac_key = HashKDF(key, PURPOSE_HMAC)
+        self.enc_key = HashKDF(key, PURPOSE_ENCRYPT)
+        self._token_prf = prf.keyed(self.hmac_key)
+        self.token_cache = TokenCache(token_cache_size) if token_cache_size else None
+
+    def token(self, label: bytes) -> bytes:
+        """
+        Returns F(hmac_key, label) using the pre-keyed PRF state.
+        """
+        return self._token_prf(label)
+
+    def trapdoor_token(self, label: bytes) -> bytes:
+        """
+        token(label) through the token cache, if there is one. Query-time
+        callers use this; build_index derives every label once and bypasses
+        the cache.
+        """
+        if self.token_cache is None:
+            return self._token_prf(label)
+        return self.token_cache.token(label, self._token_prf)
+
+
+Key = Union[bytes, KeyContext]
+
+# What build_index accepts: a multimap, or a stream of (label, values) pairs.
+PlaintextMM = Union[
+    Mapping[bytes, List[bytes]], Iterable[Tuple[bytes, Iterable[bytes]]]
+]
+
+
+def group_pairs(
+    pairs: Iterable[Tuple[bytes, Iterable[bytes]]]
+) -> Dict[bytes, List[bytes]]:
+    """
+    Collects a stream of (label, values) pairs into a multimap.
+    """
+    plaintext_mm = defaultdict(list)
+    for label, values in pairs:
+        plaintext_mm[label].extend(values)
+    return plaintext_mm
+
+
+def _encrypt_chunk(
+    args: Tuple[str, int, bytes, bytes, List[Tuple[bytes, int, List[bytes]]]]
+) -> List[Tuple[bytes, bytes]]:
+    """
+    Encrypts one chunk of posting-list slices. Each slice is a (label, start,
+    values) triple, where `start` is the position of values[0] within the
+    full posting list for `label`. Runs inside a worker process.
+    """
+    prf_name, label_width, hmac_key, enc_key, chunk = args
+    prf = get_prf_backend(prf_name)
+    token_prf = prf.keyed(hmac_key)
+    entries = []
+    for label, start, values in chunk:
+        token = token_prf(label)
+        for ct_label, value in zip(prf.labels(token, start, label_width), values):
+            ct_value = SymmetricEncrypt(enc_key, value)
+            entries.append((ct_label, ct_value))
+    return entries
+
+
+def _decrypt_chunk(args: Tuple[bytes, bool, List[bytes]]) -> List[bytes]:
+    """
+    Decrypts one chunk of result ciphertexts, unpacking blocks if `packed`.
+    Runs inside a worker process.
+    """
+    enc_key, packed, ciphertexts = args
+    plaintexts = SymmetricDecryptBatch(enc_key, ciphertexts)
+    if not packed:
+        return plaintexts
+    return [value for block in plaintexts for value in unpack_block(block)]
 
 
 class EMMEngine:
-    def __init__(self, max_x: int, max_y: int):
+    def __init__(
+        self,
+        max_x: int,
+        max_y: int,
+        num_processes: int = 1,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        prf: str = "sha512",
+        block_size: Union[int, str] = 1,
+        search_threads: int = 1,
+        store: str = "dict",
+        store_path: str = None,
+        label_width: int = None,
+        memory_budget: int = None,
+        spill_dir: str = None,
+        num_shards: int = 1,
+        cache_bytes: int = None,
+        token_cache_size: int = None,
+        instrument: bool = False,
+        label_codec: str = "binary",
+    ):
+        """
+        `num_processes` > 1 makes build_index encrypt, and resolve decrypt
+        large result sets, in a process pool, with each task covering at most
+        `chunk_size` values. `prf` names the
+        backend (see prf.PRF_BACKENDS) used for search tokens and labels.
+
+        `block_size` > 1 packs that many values into each encrypted entry, so
+        a posting list of length n costs ceil(n / B) probes and decryptions.
+        "auto" picks B from the posting-list lengths at build time.
+
+        `search_threads` > 1 lets search_many split large token sets across a
+        thread pool.
+
+        `store` selects how build_index lays out the encrypted index: "dict",
+        "compact" (see store.CompactStore), "mmap" (a CompactStore saved to
+        `store_path` and memory-mapped back), "sharded" (`num_shards`
+        such files, see store.ShardedStore) or "sqlite" (an SQLite database
+        at `store_path`, see store.SQLiteStore).
+
+        `label_width` truncates every ciphertext label to that many bytes
+        (at least MIN_LABEL_WIDTH); build_index fails if two labels collide.
+
+        `memory_budget` (in bytes) makes build_index group streamed pairs by
+        label in sorted runs spilled under `spill_dir` instead of in memory,
+        so no per-label state is kept while encrypting.
+
+        `cache_bytes` keeps the results of recent searches, keyed by search
+        token, in a cache.ResultCache of about that many bytes; build_index
+        invalidates it.
+
+        `token_cache_size` gives every key's KeyContext an LRU cache of that
+        many trapdoor tokens, keyed by label bytes.
+
+        `instrument` starts collecting hot-path counters and phase timers in
+        `instrumentation` (see instrumentation.Instrumentation); assigning an
+        Instrumentation or None to that attribute toggles collection later.
+
+        `label_codec` names the serialization.LABEL_CODECS entry schemes
+        encode cover nodes with: "binary" (IntsToBytes), or "json"
+        (ObjectToBytes) to query indexes built before the binary codec.
+        """
         self.MAX_X = max_x
         self.MAX_Y = max_y
+        self.num_processes = num_processes
+        self.chunk_size = chunk_size
+        self.prf = get_prf_backend(prf)
+        self.block_size = block_size
+        self.packing_stats = None
+        self.search_threads = search_threads
+        self._search_pool = None
+        self._resolve_pool = None
+        self.store = store
+        self.store_path = store_path
+        if label_width is not None and label_width < MIN_LABEL_WIDTH:
+            raise ValueError(f"label_width must be at least {MIN_LABEL_WIDTH}")
+        self.label_width = label_width
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.num_shards = num_shards
+        self.result_cache = ResultCache(cache_bytes) if cache_bytes else None
+        self.token_cache_size = token_cache_size
+        self.instrumentation = Instrumentation() if instrument else None
+        if label_codec not in LABEL_CODECS:
+            raise ValueError(
+                f"Unknown label codec {label_codec!r}; expected one of {sorted(LABEL_CODECS)}"
+            )
+        self.label_codec = label_codec
+        self.encode_label = LABEL_CODECS[label_codec]
+        self._key_contexts = {}
 
     def setup(self, security_parameter: int) -> bytes:
         """
@@ -44,56 +287,562 @@ class EMMEngine:
         """
         return SecureRandom(security_parameter)
 
-    def build_index(
-        self, key: bytes, plaintext_mm: Dict[bytes, List[bytes]]
-    ) -> Dict[bytes, bytes]:
+    def key_context(self, key: Key) -> KeyContext:
+        """
+        Returns the KeyContext for `key`, deriving it on first use. Passing a
+        KeyContext returns it unchanged.
+        """
+        if isinstance(key, KeyContext):
+            return key
+        context = self._key_contexts.get(key)
+        if context is None:
+            context = KeyContext(key, self.prf, self.token_cache_size)
+            self._key_contexts[key] = context
+        return context
+
+    def build_index(self, key: Key, plaintext_mm: PlaintextMM) -> Dict[bytes, bytes]:
         """
         Outputs an encrypted index I.
+
+        `plaintext_mm` is either a multimap (label -> values) or an iterable of
+        (label, values) pairs in which a label may appear any number of times;
+        its values are then appended to that label's posting list in order.
+        Pairs are encrypted and written to the store as they are consumed, so
+        a scheme can generate them lazily instead of building a multimap.
+        With a `memory_budget`, pairs are first grouped on disk (see
+        grouping.ExternalGrouper).
         """
-        hmac_key = HashKDF(key, PURPOSE_HMAC)
-        enc_key = HashKDF(key, PURPOSE_ENCRYPT)
+        context = self.key_context(key)
+        if self.result_cache is not None:
+            self.result_cache.invalidate()
+        grouped = isinstance(plaintext_mm, Mapping)
+        grouper = None
+        stats = self.instrumentation
+        if not grouped and self.memory_budget is not None:
+            print("Grouping labels on disk...")
+            grouper = ExternalGrouper(self.memory_budget, self.spill_dir)
+            start_ns = time.perf_counter_ns()
+            grouper.spill(plaintext_mm)
+            if stats is not None:
+                stats.add_time("grouping", time.perf_counter_ns() - start_ns)
+            print("Spilled", grouper.num_pairs, "pairs in", grouper.num_runs, "runs")
+            grouped = True
+
+        if self.block_size == "auto":
+            if grouper is not None:
+                lengths = [sum(1 for _ in values) for _, values in grouper.groups()]
+            else:
+                if not grouped:
+                    # Choosing B needs every posting-list length up front.
+                    start_ns = time.perf_counter_ns()
+                    plaintext_mm = group_pairs(plaintext_mm)
+                    if stats is not None:
+                        stats.add_time("grouping", time.perf_counter_ns() - start_ns)
+                    grouped = True
+                lengths = [len(values) for values in plaintext_mm.values()]
+            self.block_size = choose_block_size(lengths)
+            print("Packing", self.block_size, "values per block")
+
+        if grouper is not None:
+            pairs = tqdm(grouper.groups())
+        elif grouped:
+            pairs = tqdm(plaintext_mm.items())
+        else:
+            # Streamed pairs are usually generated under the caller's own
+            # progress bar.
+            pairs = plaintext_mm
+        if self.block_size > 1:
+            pairs = self._pack_pairs(pairs, grouped)
+
+        try:
+            return self._write_index(context, pairs, grouped)
+        finally:
+            if grouper is not None:
+                grouper.close()
 
+    def _write_index(
+        self,
+        context: KeyContext,
+        pairs: Iterable[Tuple[bytes, Iterable[bytes]]],
+        grouped: bool,
+    ) -> Dict[bytes, bytes]:
+        """
+        Encrypts the (possibly packed) pairs into the configured store and
+        returns it.
+        """
         print("Encrypting with Pi_bas...")
-        if not DO_NOT_ENCRYPT:
-            encrypted_db = {}
-            for label, values in tqdm(plaintext_mm.items()):
-                token = HMAC(hmac_key, label)
-                for index, value in enumerate(values):
-                    ct_label = Hash(token + bytes(index))
-                    ct_value = SymmetricEncrypt(enc_key, value)
-                    encrypted_db[ct_label] = ct_value
-            return encrypted_db
+        writer = open_store_writer(
+            self.store,
+            self.store_path,
+            self.prf.name,
+            check_collisions=self.label_width is not None,
+            num_shards=self.num_shards,
+        )
+        if self.num_processes > 1:
+            self._build_index_parallel(context, pairs, grouped, writer)
         else:
-            print("WARNING: Not encrypting!")
-            return {}
+            self._build_index_sequential(context, pairs, grouped, writer)
+        start_ns = time.perf_counter_ns()
+        encrypted_db = writer.finish()
+        if self.instrumentation is not None:
+            self.instrumentation.add_time("insert", time.perf_counter_ns() - start_ns)
+        return encrypted_db
+
+    def _build_index_sequential(
+        self,
+        context: KeyContext,
+        pairs: Iterable[Tuple[bytes, Iterable[bytes]]],
+        grouped: bool,
+        writer,
+    ) -> None:
+        """
+        Encrypts each pair's values as it arrives and writes them to `writer`.
+        Unless the pairs are `grouped` (every label appears once), remembers
+        the token and next list position of each label seen so far.
+        """
+        enc_key = context.enc_key
+        stats = self.instrumentation
+        positions = None if grouped else {}
+        for label, values in pairs:
+            position = None if grouped else positions.get(label)
+            if position is None:
+                token, start = context.token(label), 0
+                if stats is not None:
+                    stats.count("prf_calls")
+            else:
+                token, start = position
+            ct_labels = self.prf.labels(token, start, self.label_width)
+            if stats is None:
+                for value in values:
+                    writer.put(next(ct_labels), SymmetricEncrypt(enc_key, value))
+                    start += 1
+            else:
+                start += self._encrypt_instrumented(
+                    stats, enc_key, ct_labels, values, writer
+                )
+            if not grouped:
+                positions[label] = (token, start)
+
+    def _encrypt_instrumented(
+        self,
+        stats: Instrumentation,
+        enc_key: bytes,
+        ct_labels: Iterator[bytes],
+        values: Iterable[bytes],
+        writer,
+    ) -> int:
+        """
+        The inner loop of _build_index_sequential, timing encryption and
+        insertion separately. Returns the number of values written.
+        """
+        written = 0
+        nbytes = 0
+        encrypt_ns = 0
+        insert_ns = 0
+        for value in values:
+            ct_label = next(ct_labels)
+            t0 = time.perf_counter_ns()
+            ct_value = SymmetricEncrypt(enc_key, value)
+            t1 = time.perf_counter_ns()
+            writer.put(ct_label, ct_value)
+            insert_ns += time.perf_counter_ns() - t1
+            encrypt_ns += t1 - t0
+            nbytes += len(ct_label) + len(ct_value)
+            written += 1
+        stats.add_time("encryption", encrypt_ns)
+        stats.add_time("insert", insert_ns)
+        stats.count("prf_calls", written)
+        stats.count("aes_encryptions", written)
+        stats.count("ciphertext_bytes", nbytes)
+        return written
+
+    def _pack_pairs(
+        self, pairs: Iterable[Tuple[bytes, Iterable[bytes]]], grouped: bool
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Replaces every posting list with its packed blocks and records how
+        many padding slots that costs in `packing_stats` once `pairs` is
+        exhausted. For ungrouped pairs, a label's trailing partial block is
+        held back until the label has been seen for the last time, i.e. the
+        end of the stream.
+        """
+        block_size = self.block_size
+        pending = {}
+        num_values = 0
+        num_blocks = 0
+        for label, values in pairs:
+            buffer = [] if grouped else pending.pop(label, [])
+            blocks = []
+            for value in values:
+                num_values += 1
+                buffer.append(value)
+                if len(buffer) == block_size:
+                    blocks.append(pack_block(buffer, block_size))
+                    buffer = []
+            if buffer:
+                if grouped:
+                    blocks.append(pack_block(buffer, block_size))
+                else:
+                    pending[label] = buffer
+            num_blocks += len(blocks)
+            if blocks:
+                yield label, blocks
+
+        for label, buffer in pending.items():
+            num_blocks += 1
+            yield label, [pack_block(buffer, block_size)]
+
+        self.packing_stats = {
+            "block_size": block_size,
+            "values": num_values,
+            "blocks": num_blocks,
+            "padding_slots": num_blocks * block_size - num_values,
+        }
+
+    def _chunk_pairs(
+        self, pairs: Iterable[Tuple[bytes, Iterable[bytes]]], grouped: bool
+    ) -> Iterator[List[Tuple[bytes, int, List[bytes]]]]:
+        """
+        Splits the pairs into chunks of at most `chunk_size` values. Long
+        posting lists are sliced so a single label can span several chunks.
+        """
+        positions = None if grouped else {}
+        chunk = []
+        chunk_len = 0
+        for label, values in pairs:
+            values = list(values)
+            offset = 0 if grouped else positions.get(label, 0)
+            start = 0
+            while start < len(values):
+                end = min(len(values), start + self.chunk_size - chunk_len)
+                chunk.append((label, offset + start, values[start:end]))
+                chunk_len += end - start
+                start = end
+                if chunk_len >= self.chunk_size:
+                    yield chunk
+                    chunk = []
+                    chunk_len = 0
+            if not grouped:
+                positions[label] = offset + len(values)
+        if chunk:
+            yield chunk
+
+    def _build_index_parallel(
+        self,
+        context: KeyContext,
+        pairs: Iterable[Tuple[bytes, Iterable[bytes]]],
+        grouped: bool,
+        writer,
+    ) -> None:
+        """
+        Same output as _build_index_sequential, but each chunk is encrypted in
+        a separate worker and the shards are merged into `writer`. At most
+        two chunks per worker are in flight, so the pairs are consumed no
+        faster than the workers can encrypt them.
+        """
+        tasks = (
+            (
+                self.prf.name,
+                self.label_width,
+                context.hmac_key,
+                context.enc_key,
+                chunk,
+            )
+            for chunk in self._chunk_pairs(pairs, grouped)
+        )
 
-    def trapdoor(self, key: bytes, label: bytes) -> bytes:
-        hmac_key = HashKDF(key, PURPOSE_HMAC)
-        return HMAC(hmac_key, label)
+        stats = self.instrumentation
+
+        def write_oldest():
+            slices, result = in_flight.popleft()
+            start_ns = time.perf_counter_ns()
+            entries = result.get()
+            ready_ns = time.perf_counter_ns()
+            writer.put_many(entries)
+            progress.update(len(entries))
+            if stats is not None:
+                # Encryption runs in the workers; what the build sees of it
+                # is the wait for their results.
+                stats.add_time("encryption", ready_ns - start_ns)
+                stats.add_time("insert", time.perf_counter_ns() - ready_ns)
+                stats.count("prf_calls", slices + len(entries))
+                stats.count("aes_encryptions", len(entries))
+                stats.count(
+                    "ciphertext_bytes",
+                    sum(len(label) + len(value) for label, value in entries),
+                )
+
+        in_flight = deque()
+        with multiprocessing.Pool(self.num_processes) as pool, tqdm() as progress:
+            for task in tasks:
+                in_flight.append(
+                    (len(task[-1]), pool.apply_async(_encrypt_chunk, (task,)))
+                )
+                if len(in_flight) >= 2 * self.num_processes:
+                    write_oldest()
+            while in_flight:
+                write_oldest()
+
+    def trapdoor(self, key: Key, label: bytes) -> bytes:
+        context = self.key_context(key)
+        stats = self.instrumentation
+        if stats is not None:
+            cache = context.token_cache
+            if cache is None or label not in cache:
+                stats.count("prf_calls")
+        return context.trapdoor_token(label)
 
     def search(
         self, search_token: bytes, encrypted_db: dict[bytes, bytes]
     ) -> Set[bytes]:
+        if self.result_cache is not None:
+            return self._search_cached([search_token], encrypted_db)
         results = set()
+        probes = self._collect(search_token, encrypted_db, results.add)
+        if self.instrumentation is not None:
+            self.instrumentation.record_search(1, probes)
+        return results
 
-        # Iterate until can't find any more records:
-        index = 0
-        while True:
-            ct_label = Hash(search_token + bytes(index))
-            if ct_label in encrypted_db:
-                data = encrypted_db[ct_label]
-                if not isinstance(data, list):
-                    data = [data]
-                results.update(data)
+    def search_many(
+        self, search_tokens: Iterable[bytes], encrypted_db: dict[bytes, bytes]
+    ) -> Set[bytes]:
+        """
+        Returns the union of search(token) over all tokens, accumulated into a
+        single result set rather than by repeated set unions.
+        """
+        search_tokens = list(search_tokens)
+        if self.result_cache is not None:
+            return self._search_cached(search_tokens, encrypted_db)
+        results = set()
+        probes = 0
+        if (
+            self.search_threads <= 1
+            or len(search_tokens) < PARALLEL_SEARCH_MIN_TOKENS
+        ):
+            if hasattr(encrypted_db, "get_many"):
+                probes = self._collect_batched(search_tokens, encrypted_db, results.add)
             else:
-                break
-            index += 1
+                for search_token in search_tokens:
+                    probes += self._collect(search_token, encrypted_db, results.add)
+        else:
+            if self._search_pool is None:
+                self._search_pool = ThreadPoolExecutor(self.search_threads)
+            step = math.ceil(len(search_tokens) / self.search_threads)
+            slices = [
+                search_tokens[i : i + step]
+                for i in range(0, len(search_tokens), step)
+            ]
+            for partial, partial_probes in self._search_pool.map(
+                lambda tokens: self._collect_all(tokens, encrypted_db), slices
+            ):
+                results.update(partial)
+                probes += partial_probes
+        if self.instrumentation is not None:
+            self.instrumentation.record_search(len(search_tokens), probes)
+        return results
 
+    def _search_cached(
+        self, search_tokens: List[bytes], encrypted_db: dict[bytes, bytes]
+    ) -> Set[bytes]:
+        """
+        search_many through the result cache: cached tokens are answered from
+        it, and the posting lists of the others are walked and cached.
+        """
+        results = set()
+        misses = []
+        for search_token in search_tokens:
+            cached = self.result_cache.get(search_token)
+            if cached is None:
+                misses.append(search_token)
+            else:
+                results.update(cached)
+        for search_token, found in zip(
+            misses, self.posting_lists(misses, encrypted_db)
+        ):
+            self.result_cache.put(search_token, found)
+            results.update(found)
         return results
 
-    def resolve(self, key: bytes, results: Set[bytes]) -> Set[bytes]:
-        enc_key = HashKDF(key, PURPOSE_ENCRYPT)
+    def posting_lists(
+        self, search_tokens: List[bytes], encrypted_db: dict[bytes, bytes]
+    ) -> List[List[bytes]]:
+        """
+        The ciphertexts reached by each search token, token by token, without
+        consulting the result cache.
+        """
+        found = [[] for _ in search_tokens]
+        probes = 0
+        if hasattr(encrypted_db, "get_many"):
+            active = [
+                (self.prf.labels(search_token, 0, self.label_width), found[i])
+                for i, search_token in enumerate(search_tokens)
+            ]
+            while active:
+                probes += len(active)
+                values = encrypted_db.get_many([next(labels) for labels, _ in active])
+                still_active = []
+                for (labels, items), data in zip(active, values):
+                    if data is None:
+                        continue
+                    if isinstance(data, list):
+                        items.extend(data)
+                    else:
+                        items.append(data)
+                    still_active.append((labels, items))
+                active = still_active
+        else:
+            for search_token, items in zip(search_tokens, found):
+                probes += self._collect(search_token, encrypted_db, items.append)
+        if self.instrumentation is not None:
+            self.instrumentation.record_search(len(search_tokens), probes)
+        return found
+
+    def _collect_all(
+        self, search_tokens: List[bytes], encrypted_db: dict[bytes, bytes]
+    ) -> Tuple[List[bytes], int]:
+        partial = []
+        probes = 0
+        if hasattr(encrypted_db, "get_many"):
+            probes = self._collect_batched(search_tokens, encrypted_db, partial.append)
+        else:
+            for search_token in search_tokens:
+                probes += self._collect(search_token, encrypted_db, partial.append)
+        return partial, probes
+
+    def _collect_batched(
+        self,
+        search_tokens: List[bytes],
+        encrypted_db,
+        emit: Callable[[bytes], None],
+    ) -> int:
+        """
+        Walks all posting lists in lock step: each round probes the next label
+        of every still-active token with a single encrypted_db.get_many call.
+        Returns the number of labels probed.
+        """
+        active = [
+            self.prf.labels(search_token, 0, self.label_width)
+            for search_token in search_tokens
+        ]
+        probes = 0
+        while active:
+            probes += len(active)
+            found = encrypted_db.get_many([next(labels) for labels in active])
+            still_active = []
+            for labels, data in zip(active, found):
+                if data is None:
+                    continue
+                if isinstance(data, list):
+                    for item in data:
+                        emit(item)
+                else:
+                    emit(data)
+                still_active.append(labels)
+            active = still_active
+        return probes
+
+    def _collect(
+        self,
+        search_token: bytes,
+        encrypted_db: dict[bytes, bytes],
+        emit: Callable[[bytes], None],
+    ) -> int:
+        """
+        Walks the posting list reached by `search_token`, passing every
+        ciphertext found to `emit`. Returns the number of labels probed.
+        """
+        # Iterate until can't find any more records:
+        labels = self.prf.labels(search_token, 0, self.label_width)
+        for probes, ct_label in enumerate(labels, 1):
+            data = encrypted_db.get(ct_label)
+            if data is None:
+                return probes
+            if isinstance(data, list):
+                for item in data:
+                    emit(item)
+            else:
+                emit(data)
+
+    def probe(
+        self,
+        search_token: bytes,
+        encrypted_db: dict[bytes, bytes],
+        start: int = 0,
+        limit: int = None,
+    ) -> Tuple[List[bytes], Optional[int]]:
+        """
+        Walks the posting list reached by `search_token` from position
+        `start`, looking up at most `limit` labels. Returns the ciphertexts
+        found and the position to resume from, or None once the list is
+        exhausted.
+        """
+        found = []
+        labels = self.prf.labels(search_token, start, self.label_width)
+        for position in itertools.count(start):
+            if limit is not None and position - start >= limit:
+                self._record_probe(start, position - start, position - start)
+                return found, position
+            data = encrypted_db.get(next(labels))
+            if data is None:
+                self._record_probe(start, position - start + 1, position - start)
+                return found, None
+            if isinstance(data, list):
+                found.extend(data)
+            else:
+                found.append(data)
+
+    def _record_probe(self, start: int, probes: int, hits: int) -> None:
+        stats = self.instrumentation
+        if stats is None:
+            return
+        if start == 0:
+            stats.count("posting_lists_walked")
+        stats.count("db_probes", probes)
+        stats.count("prf_calls", probes)
+        stats.count("entries_walked", hits)
+
+    def resolve(self, key: Key, results: Set[bytes]) -> Set[bytes]:
         pt_values = set()
-        for ct_value in results:
-            pt_values.add(SymmetricDecrypt(enc_key, ct_value))
+        for chunk in self.resolve_iter(key, results):
+            pt_values.update(chunk)
         return pt_values
+
+    def resolve_iter(
+        self, key: Key, results: Iterable[bytes]
+    ) -> Iterator[List[bytes]]:
+        """
+        Decrypts `results` in chunks of at most `chunk_size` ciphertexts and
+        yields each chunk's plaintexts as soon as it is ready. With
+        `num_processes` > 1 and a large enough result set, chunks are
+        decrypted in a worker pool and yielded in completion order.
+        """
+        enc_key = self.key_context(key).enc_key
+        packed = self.block_size != 1
+        results = list(results)
+        if self.instrumentation is not None:
+            self.instrumentation.count("aes_decryptions", len(results))
+        chunks = (
+            (enc_key, packed, results[i : i + self.chunk_size])
+            for i in range(0, len(results), self.chunk_size)
+        )
+
+        if self.num_processes <= 1 or len(results) < PARALLEL_RESOLVE_MIN_RESULTS:
+            for chunk in chunks:
+                yield _decrypt_chunk(chunk)
+            return
+
+        if self._resolve_pool is None:
+            self._resolve_pool = multiprocessing.Pool(self.num_processes)
+        yield from self._resolve_pool.imap_unordered(_decrypt_chunk, chunks)
+
+    def close(self) -> None:
+        """
+        Shuts down the search and resolve worker pools, if any were started.
+        """
+        if self._search_pool is not None:
+            self._search_pool.shutdown()
+            self._search_pool = None
+        if self._resolve_pool is not None:
+            self._resolve_pool.close()
+            self._resolve_pool.join()
+            self._resolve_pool = None
@@ -0,0 +1,140 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import heapq
+import itertools
+import os
+import struct
+import tempfile
+
+# Each run record is a RUN_RECORD (label length, value length) header
+# followed by the label and the value.
+RUN_RECORD = struct.Struct("<II")
+
+# Rough per-pair bookkeeping cost of the in-memory buffer (tuple, bytes
+# headers, list slot), added to the label and value lengths when checking
+# the memory budget.
+PAIR_OVERHEAD = 120
+
+# Most runs merged at once; more than this are first merged in passes.
+MAX_MERGE_FANIN = 64
+
+RUN_BUFFER_SIZE = 1 << 16
+
+
+class ExternalGrouper:
+    """
+    Groups a stream of (label, values) pairs by label without holding the
+    stream in memory, for index builds larger than RAM:
+
+        > spill(pairs) - buffers (label, value) pairs until they would use
+                         more than `memory_budget` bytes, then sorts the
+                         buffer by label and writes it out as a run file
+        > groups()     - k-way merges the runs and yields (label, values)
+                         once per label, in label order, with `values` a
+                         lazy iterator
+
+    Sorting is stable and the merge prefers earlier runs, so each label's
+    values come out in the order they went in. Run files live in a temporary
+    directory under `spill_dir` (the system default if None) until `close`.
+    """
+
+    def __init__(self, memory_budget: int, spill_dir: Optional[str] = None):
+        if memory_budget <= 0:
+            raise ValueError("memory_budget must be positive")
+        self.memory_budget = memory_budget
+        self._dir = tempfile.TemporaryDirectory(dir=spill_dir)
+        self._runs = []
+        self._buffer = []
+        self._buffer_bytes = 0
+        self.num_pairs = 0
+        self.num_runs = 0
+
+    def spill(self, pairs: Iterable[Tuple[bytes, Iterable[bytes]]]) -> None:
+        for label, values in pairs:
+            for value in values:
+                self._buffer.append((label, value))
+                self._buffer_bytes += len(label) + len(value) + PAIR_OVERHEAD
+                if self._buffer_bytes >= self.memory_budget:
+                    self._flush()
+        self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        self._buffer.sort(key=lambda pair: pair[0])
+        self._runs.append(self._write_run(self._buffer))
+        self.num_pairs += len(self._buffer)
+        self._buffer = []
+        self._buffer_bytes = 0
+
+    def _write_run(self, pairs: Iterable[Tuple[bytes, bytes]]) -> str:
+        path = os.path.join(self._dir.name, f"{self.num_runs}.run")
+        self.num_runs += 1
+        with open(path, "wb", buffering=RUN_BUFFER_SIZE) as f:
+            for label, value in pairs:
+                f.write(RUN_RECORD.pack(len(label), len(value)))
+                f.write(label)
+                f.write(value)
+        return path
+
+    @staticmethod
+    def _read_run(path: str) -> Iterator[Tuple[bytes, bytes]]:
+        with open(path, "rb", buffering=RUN_BUFFER_SIZE) as f:
+            while True:
+                header = f.read(RUN_RECORD.size)
+                if not header:
+                    return
+                label_len, value_len = RUN_RECORD.unpack(header)
+                yield f.read(label_len), f.read(value_len)
+
+    def _merge(self, runs: List[str]) -> Iterator[Tuple[bytes, bytes]]:
+        return heapq.merge(
+            *(self._read_run(path) for path in runs), key=lambda pair: pair[0]
+        )
+
+    def _reduce_runs(self) -> None:
+        """
+        Merges runs MAX_MERGE_FANIN at a time until one merge can cover them
+        all, so the final merge never has too many files open.
+        """
+        while len(self._runs) > MAX_MERGE_FANIN:
+            merged = []
+            for i in range(0, len(self._runs), MAX_MERGE_FANIN):
+                batch = self._runs[i : i + MAX_MERGE_FANIN]
+                merged.append(self._write_run(self._merge(batch)))
+                for path in batch:
+                    os.remove(path)
+            self._runs = merged
+
+    def groups(self) -> Iterator[Tuple[bytes, Iterator[bytes]]]:
+        """
+        Yields every label once, with an iterator over its values. Each
+        iterator must be consumed before advancing to the next label. Can be
+        called more than once.
+        """
+        self._reduce_runs()
+        for label, group in itertools.groupby(
+            self._merge(self._runs), key=lambda pair: pair[0]
+        ):
+            yield label, (value for _, value in group)
+
+    def close(self) -> None:
+        self._dir.cleanup()
+        self._runs = []
@@ -0,0 +1,99 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator
+
+import threading
+import time
+
+# Returned by EMM.phase when instrumentation is off.
+NULL_PHASE = nullcontext()
+
+# Phases timed by the engine and schemes, in report order.
+PHASES = ["cover", "grouping", "encryption", "insert"]
+
+
+class Instrumentation:
+    """
+    Hot-path counters and phase timers for one EMMEngine and the schemes
+    built on it. The engine only collects them while its `instrumentation`
+    attribute holds an Instrumentation; it is None (the default) otherwise,
+    which costs a single None check per posting list or search.
+
+    Counters:
+        prf_calls            search tokens and ciphertext labels derived
+        db_probes            lookups in the encrypted index
+        posting_lists_walked search tokens whose posting lists were walked
+        entries_walked       index entries found while walking them
+        aes_encryptions      values encrypted by build_index
+        aes_decryptions      ciphertexts decrypted by resolve
+        ciphertext_bytes     label and ciphertext bytes build_index produced
+
+    Phases (seconds): cover (range-cover computation in trapdoor),
+    grouping (grouping pairs by label before encryption), encryption and
+    insert (writing entries to the store).
+    """
+
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.phase_ns: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def add_time(self, name: str, elapsed_ns: int) -> None:
+        with self._lock:
+            self.phase_ns[name] += elapsed_ns
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter_ns() - start)
+
+    def record_search(self, tokens: int, probes: int) -> None:
+        """
+        Records walking `tokens` posting lists to the end with `probes`
+        lookups. Every list ends at its first missing label, so all but one
+        probe per list found an entry.
+        """
+        with self._lock:
+            self.counters["posting_lists_walked"] += tokens
+            self.counters["db_probes"] += probes
+            self.counters["prf_calls"] += probes
+            self.counters["entries_walked"] += probes - tokens
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        The counters, followed by the phase times as `<phase>_sec`.
+        """
+        with self._lock:
+            values = dict(self.counters)
+            for name in PHASES + sorted(set(self.phase_ns) - set(PHASES)):
+                values[f"{name}_sec"] = self.phase_ns[name] / 10**9
+        return values
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.phase_ns.clear()
@@ -0,0 +1,124 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from .emm_engine import EMMEngine, Key, KeyContext, unpack_block
+
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import itertools
+import struct
+import time
+
+# Every stored entry is prefixed with its position in the build, so equal
+# values stored under different labels stay distinct in a result set, as
+# their ciphertexts would.
+SEQUENCE = struct.Struct(">Q")
+
+
+class PlaintextEngine(EMMEngine):
+    """
+    Dry-run stand-in for EMMEngine with identity "crypto": trapdoor returns
+    the label itself, and build_index keeps each label's values in a plain
+    list instead of encrypting them under PRF-derived labels. Search and
+    resolve return the same number of results as the real engine would, so
+    a scheme's cover sizes, replication and false-positive volume can be
+    profiled without paying for PRF calls and AES.
+
+    Grouping options (`memory_budget`, `block_size`) behave as in EMMEngine;
+    the index is always a dict of lists, so `store` must be "dict".
+    """
+
+    def __init__(self, max_x: int, max_y: int, **options):
+        if options.get("store", "dict") != "dict":
+            raise ValueError('PlaintextEngine only supports the "dict" store')
+        super().__init__(max_x, max_y, **options)
+
+    def _write_index(
+        self,
+        context: KeyContext,
+        pairs: Iterable[Tuple[bytes, Iterable[bytes]]],
+        grouped: bool,
+    ) -> Dict[bytes, List[bytes]]:
+        print("Indexing without encryption (dry run)...")
+        start_ns = time.perf_counter_ns()
+        index = defaultdict(list)
+        sequence = itertools.count()
+        for label, values in pairs:
+            posting_list = index[label]
+            for value in values:
+                posting_list.append(SEQUENCE.pack(next(sequence)) + value)
+        if self.instrumentation is not None:
+            self.instrumentation.add_time("insert", time.perf_counter_ns() - start_ns)
+        return dict(index)
+
+    def trapdoor(self, key: Key, label: bytes) -> bytes:
+        return label
+
+    def _record_lists(self, posting_lists: List[List[bytes]]) -> None:
+        stats = self.instrumentation
+        if stats is None:
+            return
+        stats.count("posting_lists_walked", len(posting_lists))
+        stats.count("db_probes", len(posting_lists))
+        stats.count("entries_walked", sum(len(found) for found in posting_lists))
+
+    def search(
+        self, search_token: bytes, encrypted_db: Dict[bytes, List[bytes]]
+    ) -> Set[bytes]:
+        return self.search_many([search_token], encrypted_db)
+
+    def search_many(
+        self, search_tokens: Iterable[bytes], encrypted_db: Dict[bytes, List[bytes]]
+    ) -> Set[bytes]:
+        search_tokens = list(search_tokens)
+        if self.result_cache is not None:
+            return self._search_cached(search_tokens, encrypted_db)
+        results = set()
+        for found in self.posting_lists(search_tokens, encrypted_db):
+            results.update(found)
+        return results
+
+    def posting_lists(
+        self, search_tokens: List[bytes], encrypted_db: Dict[bytes, List[bytes]]
+    ) -> List[List[bytes]]:
+        found = [encrypted_db.get(search_token, []) for search_token in search_tokens]
+        self._record_lists(found)
+        return found
+
+    def probe(
+        self,
+        search_token: bytes,
+        encrypted_db: Dict[bytes, List[bytes]],
+        start: int = 0,
+        limit: int = None,
+    ) -> Tuple[List[bytes], Optional[int]]:
+        posting_list = encrypted_db.get(search_token, [])
+        end = len(posting_list) if limit is None else min(len(posting_list), start + limit)
+        found = posting_list[start:end]
+        self._record_lists([found])
+        return found, end if end < len(posting_list) else None
+
+    def resolve_iter(
+        self, key: Key, results: Iterable[bytes]
+    ) -> Iterator[List[bytes]]:
+        results = list(results)
+        for i in range(0, len(results), self.chunk_size):
+            values = [entry[SEQUENCE.size :] for entry in results[i : i + self.chunk_size]]
+            if self.block_size != 1:
+                values = [value for block in values for value in unpack_block(block)]
+            yield values
@@ -0,0 +1,181 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from ...util.crypto import HMACState
+
+from cryptography.hazmat.primitives import cmac, hashes
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from typing import Callable, Dict, Iterator, Optional
+
+import hashlib
+import hmac
+import itertools
+
+
+class PRFBackend:
+    """
+    The primitives EMMEngine uses to derive search tokens and ciphertext
+    labels. A backend provides:
+
+        > keyed(key)           - the PRF F(key, .) used for search tokens
+        > labels(token, start, width)
+                               - the labels of positions start, start + 1, ...
+                                 of the posting list reached by `token`,
+                                 truncated to `width` bytes if given
+
+    Both return objects that keep per-key / per-token state, so the hot
+    loops in build_index and search only pay for finalisation.
+    """
+
+    name = None
+
+    def keyed(self, key: bytes) -> Callable[[bytes], bytes]:
+        raise NotImplementedError
+
+    def labels(
+        self, token: bytes, start: int = 0, width: Optional[int] = None
+    ) -> Iterator[bytes]:
+        raise NotImplementedError
+
+
+class SHA512Backend(PRFBackend):
+    """
+    HMAC-SHA512 tokens and SHA512(token || bytes(index)) labels. This is the
+    original construction; indexes built before backends were selectable use
+    it.
+    """
+
+    name = "sha512"
+
+    def keyed(self, key: bytes) -> Callable[[bytes], bytes]:
+        state = HMACState(key)
+
+        def prf(data: bytes) -> bytes:
+            h = state.copy()
+            h.update(data)
+            return h.finalize()
+
+        return prf
+
+    def labels(
+        self, token: bytes, start: int = 0, width: Optional[int] = None
+    ) -> Iterator[bytes]:
+        prefix = hashes.Hash(hashes.SHA512())
+        prefix.update(token)
+        for index in itertools.count(start):
+            h = prefix.copy()
+            # bytes(index) is `index` zero bytes; kept for compatibility.
+            h.update(bytes(index))
+            yield h.finalize()[:width]
+
+
+class SHA256Backend(PRFBackend):
+    """
+    HMAC-SHA256 tokens and SHA256(token || index) labels, with the index as a
+    fixed 8-byte integer.
+    """
+
+    name = "sha256"
+
+    def keyed(self, key: bytes) -> Callable[[bytes], bytes]:
+        state = hmac.new(key, digestmod=hashlib.sha256)
+
+        def prf(data: bytes) -> bytes:
+            h = state.copy()
+            h.update(data)
+            return h.digest()
+
+        return prf
+
+    def labels(
+        self, token: bytes, start: int = 0, width: Optional[int] = None
+    ) -> Iterator[bytes]:
+        prefix = hashlib.sha256(token)
+        for index in itertools.count(start):
+            h = prefix.copy()
+            h.update(index.to_bytes(8, "big"))
+            yield h.digest()[:width]
+
+
+class Blake2bBackend(PRFBackend):
+    """
+    Keyed BLAKE2b for tokens and unkeyed BLAKE2b(token || index) labels, both
+    with 32-byte digests.
+    """
+
+    name = "blake2b"
+    digest_size = 32
+
+    def keyed(self, key: bytes) -> Callable[[bytes], bytes]:
+        state = hashlib.blake2b(key=key, digest_size=self.digest_size)
+
+        def prf(data: bytes) -> bytes:
+            h = state.copy()
+            h.update(data)
+            return h.digest()
+
+        return prf
+
+    def labels(
+        self, token: bytes, start: int = 0, width: Optional[int] = None
+    ) -> Iterator[bytes]:
+        prefix = hashlib.blake2b(token, digest_size=self.digest_size)
+        for index in itertools.count(start):
+            h = prefix.copy()
+            h.update(index.to_bytes(8, "big"))
+            yield h.digest()[:width]
+
+
+class AESBackend(PRFBackend):
+    """
+    AES-CMAC tokens. The 16-byte token is then used as an AES key and the
+    labels are the encryptions of the counter blocks start, start + 1, ...
+    """
+
+    name = "aes"
+
+    def keyed(self, key: bytes) -> Callable[[bytes], bytes]:
+        state = cmac.CMAC(algorithms.AES(key))
+
+        def prf(data: bytes) -> bytes:
+            c = state.copy()
+            c.update(data)
+            return c.finalize()
+
+        return prf
+
+    def labels(
+        self, token: bytes, start: int = 0, width: Optional[int] = None
+    ) -> Iterator[bytes]:
+        encryptor = Cipher(algorithms.AES(token), modes.ECB()).encryptor()
+        for index in itertools.count(start):
+            yield encryptor.update(index.to_bytes(16, "big"))[:width]
+
+
+PRF_BACKENDS: Dict[str, PRFBackend] = {
+    backend.name: backend
+    for backend in (SHA512Backend(), SHA256Backend(), Blake2bBackend(), AESBackend())
+}
+
+
+def get_prf_backend(name: str) -> PRFBackend:
+    if name not in PRF_BACKENDS:
+        raise ValueError(
+            f"Unknown PRF backend {name!r}; expected one of {sorted(PRF_BACKENDS)}"
+        )
+    return PRF_BACKENDS[name]
@@ -0,0 +1,88 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from typing import Dict, Optional, Tuple
+
+import json
+import os
+import struct
+
+# A snapshot (see EMM.save) is a directory holding two artefacts: the
+# client's, with the scheme's parameters, its client-side structures and
+# optionally its secret key, and the server's, the encrypted index in the
+# format read by store.CompactStore.open. Only the latter may be handed to
+# a server.
+CLIENT_FILE = "client.ers"
+INDEX_FILE = "index.ers"
+
+CLIENT_MAGIC = b"ERSCLNT\x00"
+CLIENT_VERSION = 1
+# Magic, version, then the byte lengths of the JSON metadata, the key (0 if
+# none was saved) and the scheme's client state, which follow in that order.
+CLIENT_HEADER = struct.Struct("<8sIIIQ")
+
+
+def write_client_file(
+    path: str, metadata: Dict[str, object], key: Optional[bytes], state: bytes
+) -> None:
+    encoded = json.dumps(metadata, sort_keys=True).encode()
+    key = key or b""
+    with open(path, "wb") as f:
+        f.write(
+            CLIENT_HEADER.pack(
+                CLIENT_MAGIC, CLIENT_VERSION, len(encoded), len(key), len(state)
+            )
+        )
+        f.write(encoded)
+        f.write(key)
+        f.write(state)
+
+
+def read_client_file(path: str) -> Tuple[Dict[str, object], Optional[bytes], bytes]:
+    """
+    Returns the metadata, key (None if none was saved) and client state
+    written by write_client_file.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < CLIENT_HEADER.size:
+        raise ValueError("Not a client snapshot file")
+    magic, version, metadata_size, key_size, state_size = CLIENT_HEADER.unpack_from(
+        data, 0
+    )
+    if magic != CLIENT_MAGIC:
+        raise ValueError("Not a client snapshot file")
+    if version != CLIENT_VERSION:
+        raise ValueError(f"Unsupported client snapshot version {version}")
+    if CLIENT_HEADER.size + metadata_size + key_size + state_size != len(data):
+        raise ValueError("Truncated client snapshot file")
+
+    position = CLIENT_HEADER.size
+    metadata = json.loads(data[position : position + metadata_size].decode())
+    position += metadata_size
+    key = data[position : position + key_size] or None
+    position += key_size
+    return metadata, key, data[position:]
+
+
+def load_key(path: str) -> Optional[bytes]:
+    """
+    The secret key saved in the snapshot directory `path`, or None if it was
+    saved without one.
+    """
+    _, key, _ = read_client_file(os.path.join(path, CLIENT_FILE))
+    return key
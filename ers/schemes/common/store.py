@@ -0,0 +1,794 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+
+# The fanout table indexes labels by (at most) their first 24 bits.
+MAX_FANOUT_BITS = 24
+
+# On-disk layout, all integers little-endian:
+#
+#   header  - HEADER (below), padded to HEADER_SIZE bytes
+#   fanout  - (2 ** fanout_bits + 1) uint64
+#   offsets - (count + 1) uint64, relative to the start of the heap
+#   labels  - count * label_width bytes, sorted
+#   heap    - heap_size bytes of concatenated ciphertexts
+STORE_MAGIC = b"ERSEMM\x00\x00"
+STORE_VERSION = 1
+HEADER = struct.Struct("<8sIIIIQQ16s")
+HEADER_SIZE = 64
+
+# MappedStoreWriter spills entries to (by default) one temporary file per
+# leading label byte, each record a SPILL_LENGTH value length, the label and
+# the value.
+SPILL_BUCKETS = 256
+SPILL_LENGTH = struct.Struct("<I")
+
+# SQLiteStoreWriter inserts entries in batches of this many rows, and
+# SQLiteStore.get_many looks labels up this many at a time (below SQLite's
+# default limit on bound parameters).
+SQLITE_INSERT_BATCH = 10000
+SQLITE_LOOKUP_BATCH = 500
+
+
+class LabelCollisionError(ValueError):
+    """
+    Raised at build time when two entries derive the same (truncated) label.
+    """
+
+    def __init__(self, label: bytes):
+        super().__init__(
+            f"Two entries share the {len(label)}-byte label {label.hex()}; "
+            "use a wider label_width"
+        )
+        self.label = label
+
+
+class CompactStore(Mapping):
+    """
+    A read-only encrypted index laid out in flat buffers instead of a dict:
+
+        > labels  - every label, fixed width, sorted, in one contiguous buffer
+        > heap    - every ciphertext, concatenated in label order
+        > offsets - n + 1 offsets into heap; entry i is heap[offsets[i]:offsets[i + 1]]
+        > fanout  - for each value of the top `fanout_bits` bits of a label,
+                    the index of the first label with a prefix >= that value
+
+    Labels are PRF outputs, so the fanout table spreads them evenly and
+    sizing it at about one bucket per two labels leaves a binary search over
+    one or two entries per lookup. It can be used anywhere EMMEngine.search
+    expects a dict.
+
+    The in-memory buffer is byte-for-byte the on-disk format, so `save`
+    writes it out as is and `open` maps a saved file without parsing it.
+    """
+
+    def __init__(self, buffer, mapped_file=None):
+        (
+            magic,
+            version,
+            self.label_width,
+            self.fanout_bits,
+            _,
+            self._count,
+            heap_size,
+            prf,
+        ) = HEADER.unpack_from(buffer, 0)
+        if magic != STORE_MAGIC:
+            raise ValueError("Not an encrypted index file")
+        if version != STORE_VERSION:
+            raise ValueError(f"Unsupported encrypted index version {version}")
+        self.prf = prf.rstrip(b"\x00").decode()
+
+        self.buffer = buffer
+        self._mapped_file = mapped_file
+
+        fanout_start = HEADER_SIZE
+        offsets_start = fanout_start + 8 * ((1 << self.fanout_bits) + 1)
+        self._labels_start = offsets_start + 8 * (self._count + 1)
+        self._heap_start = self._labels_start + self.label_width * self._count
+
+        view = memoryview(buffer)
+        self.fanout = self._uint64_array(view[fanout_start:offsets_start])
+        self.offsets = self._uint64_array(view[offsets_start : self._labels_start])
+
+    @staticmethod
+    def _uint64_array(view: memoryview):
+        if sys.byteorder == "little":
+            return view.cast("Q")
+        values = array("Q", bytes(view))
+        values.byteswap()
+        return values
+
+    @classmethod
+    def from_items(
+        cls, items: Iterable[Tuple[bytes, bytes]], prf: str = "sha512"
+    ) -> "CompactStore":
+        """
+        Builds a store from (label, ciphertext) pairs. All labels must have the
+        same width. `prf` names the backend that derived the labels.
+        """
+        entries = sorted(items, key=lambda entry: entry[0])
+        label_width = len(entries[0][0]) if entries else 0
+
+        offsets = array("Q", [0])
+        position = 0
+        previous = None
+        for label, value in entries:
+            if len(label) != label_width:
+                raise ValueError("CompactStore labels must all have the same width")
+            if label == previous:
+                raise LabelCollisionError(label)
+            previous = label
+            position += len(value)
+            offsets.append(position)
+
+        labels = b"".join(label for label, _ in entries)
+        heap = b"".join(value for _, value in entries)
+
+        fanout_bits = min(MAX_FANOUT_BITS, (len(entries) // 2).bit_length())
+        fanout = cls._build_fanout(labels, label_width, len(entries), fanout_bits)
+
+        if sys.byteorder != "little":
+            offsets.byteswap()
+            fanout.byteswap()
+        header = HEADER.pack(
+            STORE_MAGIC,
+            STORE_VERSION,
+            label_width,
+            fanout_bits,
+            0,
+            len(entries),
+            len(heap),
+            prf.encode(),
+        ).ljust(HEADER_SIZE, b"\x00")
+        return cls(b"".join([header, fanout.tobytes(), offsets.tobytes(), labels, heap]))
+
+    @classmethod
+    def open(cls, path: str) -> "CompactStore":
+        """
+        Memory-maps a file written by `save`. Only the header is read here;
+        label and ciphertext pages are faulted in by the lookups that need them.
+        """
+        with open(path, "rb") as f:
+            mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped_file, mapped_file)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.buffer)
+
+    def close(self) -> None:
+        """
+        Unmaps the backing file of a store returned by `open`.
+        """
+        if self._mapped_file is not None:
+            self.fanout.release()
+            self.offsets.release()
+            self._mapped_file.close()
+            self._mapped_file = None
+
+    @staticmethod
+    def _build_fanout(
+        labels: bytes, label_width: int, count: int, fanout_bits: int
+    ) -> array:
+        fanout = array("Q", bytes(8 * ((1 << fanout_bits) + 1)))
+        bucket = 0
+        shift = 24 - fanout_bits
+        for index in range(count):
+            start = index * label_width
+            prefix = int.from_bytes(labels[start : start + 3], "big") >> shift
+            while bucket <= prefix:
+                fanout[bucket] = index
+                bucket += 1
+        while bucket <= (1 << fanout_bits):
+            fanout[bucket] = count
+            bucket += 1
+        return fanout
+
+    def _find(self, label: bytes) -> int:
+        """
+        Returns the position of `label` in the sorted label table, or -1.
+        """
+        width = self.label_width
+        if len(label) != width:
+            return -1
+        prefix = int.from_bytes(label[:3], "big") >> (24 - self.fanout_bits)
+        lo = self.fanout[prefix]
+        hi = self.fanout[prefix + 1]
+        buffer = self.buffer
+        base = self._labels_start
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = base + mid * width
+            candidate = buffer[start : start + width]
+            if candidate < label:
+                lo = mid + 1
+            elif candidate > label:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def _value(self, index: int) -> bytes:
+        base = self._heap_start
+        return self.buffer[base + self.offsets[index] : base + self.offsets[index + 1]]
+
+    def get(self, label: bytes, default: Optional[bytes] = None) -> Optional[bytes]:
+        index = self._find(label)
+        if index < 0:
+            return default
+        return self._value(index)
+
+    def get_many(self, labels: List[bytes]) -> List[Optional[bytes]]:
+        """
+        Batch lookup: returns the ciphertext for each label (None if absent),
+        in the order given.
+        """
+        find = self._find
+        buffer = self.buffer
+        offsets = self.offsets
+        base = self._heap_start
+        results = []
+        for label in labels:
+            index = find(label)
+            if index < 0:
+                results.append(None)
+            else:
+                results.append(buffer[base + offsets[index] : base + offsets[index + 1]])
+        return results
+
+    def __getitem__(self, label: bytes) -> bytes:
+        index = self._find(label)
+        if index < 0:
+            raise KeyError(label)
+        return self._value(index)
+
+    def __contains__(self, label: object) -> bool:
+        return isinstance(label, bytes) and self._find(label) >= 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        width = self.label_width
+        base = self._labels_start
+        for index in range(self._count):
+            start = base + index * width
+            yield self.buffer[start : start + width]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def items(self) -> Iterator[Tuple[bytes, bytes]]:
+        for index, label in enumerate(self):
+            yield label, self._value(index)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the label table, heap, offsets and fanout buffers, header
+        included.
+        """
+        return len(self.buffer)
+
+
+class DictStoreWriter:
+    """
+    Collects encrypted entries into a plain dict. With `check_collisions`,
+    inserting a label twice raises LabelCollisionError.
+    """
+
+    def __init__(self, check_collisions: bool = False):
+        self.encrypted_db = {}
+        self.check_collisions = check_collisions
+
+    def put(self, label: bytes, value: bytes) -> None:
+        if self.check_collisions and label in self.encrypted_db:
+            raise LabelCollisionError(label)
+        self.encrypted_db[label] = value
+
+    def put_many(self, entries: Iterable[Tuple[bytes, bytes]]) -> None:
+        if not self.check_collisions:
+            self.encrypted_db.update(entries)
+            return
+        for label, value in entries:
+            self.put(label, value)
+
+    def finish(self) -> Dict[bytes, bytes]:
+        return self.encrypted_db
+
+
+class CompactStoreWriter:
+    """
+    Collects encrypted entries and packs them into a CompactStore on finish.
+    Duplicate labels always raise LabelCollisionError there.
+    """
+
+    def __init__(self, prf: str = "sha512"):
+        self.prf = prf
+        self.entries = []
+
+    def put(self, label: bytes, value: bytes) -> None:
+        self.entries.append((label, value))
+
+    def put_many(self, entries: Iterable[Tuple[bytes, bytes]]) -> None:
+        self.entries.extend(entries)
+
+    def finish(self) -> CompactStore:
+        store = CompactStore.from_items(self.entries, self.prf)
+        self.entries = []
+        return store
+
+
+class MappedStoreWriter:
+    """
+    Streams encrypted entries to disk, writes them out as a CompactStore file
+    at `path` on finish and returns the memory-mapped file.
+
+    Entries are spilled to `spill_buckets` (at most 256) temporary files
+    next to `path`, partitioned by the first byte of their label. Labels are
+    PRF outputs, so the buckets come out about the same size, and since
+    bucket i holds only labels that sort before those of bucket i + 1, finish
+    sorts one bucket at a time and appends it to the output. Memory use is
+    one bucket, not the whole index.
+    """
+
+    def __init__(
+        self, path: str, prf: str = "sha512", spill_buckets: int = SPILL_BUCKETS
+    ):
+        if path is None:
+            raise ValueError('The "mmap" store needs a store path')
+        self.path = path
+        self.prf = prf
+        self.label_width = None
+        self.count = 0
+        self.heap_size = 0
+        self._spill_dir = tempfile.TemporaryDirectory(
+            dir=os.path.dirname(os.path.abspath(path))
+        )
+        self._buckets = [
+            open(os.path.join(self._spill_dir.name, f"{i}.spill"), "w+b")
+            for i in range(spill_buckets)
+        ]
+
+    def put(self, label: bytes, value: bytes) -> None:
+        if self.label_width is None:
+            self.label_width = len(label)
+        elif len(label) != self.label_width:
+            raise ValueError("CompactStore labels must all have the same width")
+        bucket = self._buckets[(label[0] * len(self._buckets)) >> 8]
+        bucket.write(SPILL_LENGTH.pack(len(value)))
+        bucket.write(label)
+        bucket.write(value)
+        self.count += 1
+        self.heap_size += len(value)
+
+    def put_many(self, entries: Iterable[Tuple[bytes, bytes]]) -> None:
+        for label, value in entries:
+            self.put(label, value)
+
+    def _read_bucket(self, bucket) -> List[Tuple[bytes, bytes]]:
+        bucket.seek(0)
+        data = bucket.read()
+        bucket.close()
+        width = self.label_width
+        entries = []
+        position = 0
+        while position < len(data):
+            (length,) = SPILL_LENGTH.unpack_from(data, position)
+            position += SPILL_LENGTH.size
+            label = data[position : position + width]
+            position += width
+            entries.append((label, data[position : position + length]))
+            position += length
+        entries.sort(key=lambda entry: entry[0])
+        return entries
+
+    def finish(self) -> CompactStore:
+        width = self.label_width or 0
+        count = self.count
+        fanout_bits = min(MAX_FANOUT_BITS, (count // 2).bit_length())
+        shift = 24 - fanout_bits
+
+        fanout_start = HEADER_SIZE
+        offsets_start = fanout_start + 8 * ((1 << fanout_bits) + 1)
+        labels_start = offsets_start + 8 * (count + 1)
+        heap_start = labels_start + width * count
+
+        header = HEADER.pack(
+            STORE_MAGIC,
+            STORE_VERSION,
+            width,
+            fanout_bits,
+            0,
+            count,
+            self.heap_size,
+            self.prf.encode(),
+        ).ljust(HEADER_SIZE, b"\x00")
+
+        with open(self.path, "wb") as f:
+            f.write(header)
+            bucket_index = 0
+            index = 0
+            position = 0
+            previous = None
+            offsets_written = 0
+            labels_written = 0
+            heap_written = 0
+            fanout_written = 0
+            for bucket in self._buckets:
+                entries = self._read_bucket(bucket)
+                fanout = array("Q")
+                offsets = array("Q", [] if offsets_written else [0])
+                for label, value in entries:
+                    if label == previous:
+                        raise LabelCollisionError(label)
+                    previous = label
+                    prefix = int.from_bytes(label[:3], "big") >> shift
+                    while bucket_index <= prefix:
+                        fanout.append(index)
+                        bucket_index += 1
+                    index += 1
+                    position += len(value)
+                    offsets.append(position)
+                labels = b"".join(label for label, _ in entries)
+                heap = b"".join(value for _, value in entries)
+                del entries
+
+                if sys.byteorder != "little":
+                    fanout.byteswap()
+                    offsets.byteswap()
+                for start, written, data in (
+                    (fanout_start, fanout_written, fanout.tobytes()),
+                    (offsets_start, offsets_written, offsets.tobytes()),
+                    (labels_start, labels_written, labels),
+                    (heap_start, heap_written, heap),
+                ):
+                    f.seek(start + written)
+                    f.write(data)
+                fanout_written += len(fanout) * 8
+                offsets_written += len(offsets) * 8
+                labels_written += len(labels)
+                heap_written += len(heap)
+
+            fanout = array("Q", [count] * ((1 << fanout_bits) + 1 - bucket_index))
+            if sys.byteorder != "little":
+                fanout.byteswap()
+            f.seek(fanout_start + fanout_written)
+            f.write(fanout.tobytes())
+
+        self._spill_dir.cleanup()
+        return CompactStore.open(self.path)
+
+
+def shard_of(label: bytes, num_shards: int) -> int:
+    """
+    The shard that owns `label`. Labels are PRF outputs, so reducing their
+    leading bytes modulo the shard count spreads them evenly.
+    """
+    return int.from_bytes(label[:8], "big") % num_shards
+
+
+def shard_paths(path: str, num_shards: int) -> List[str]:
+    return [f"{path}.{shard}" for shard in range(num_shards)]
+
+
+class ShardedStore(Mapping):
+    """
+    An encrypted index partitioned by shard_of across several CompactStores.
+    Lookups go to the owning shard; each shard can also be served on its own
+    by a separate ers.server process.
+    """
+
+    def __init__(self, shards: List[CompactStore], paths: List[str] = None):
+        self.shards = shards
+        self.paths = paths
+
+    @classmethod
+    def open(cls, paths: List[str]) -> "ShardedStore":
+        return cls([CompactStore.open(path) for path in paths], paths)
+
+    def close(self) -> None:
+        for shard in self.shards:
+            shard.close()
+
+    def _shard(self, label: bytes) -> CompactStore:
+        return self.shards[shard_of(label, len(self.shards))]
+
+    def get(self, label: bytes, default: Optional[bytes] = None) -> Optional[bytes]:
+        return self._shard(label).get(label, default)
+
+    def get_many(self, labels: List[bytes]) -> List[Optional[bytes]]:
+        return [self._shard(label).get(label) for label in labels]
+
+    def __getitem__(self, label: bytes) -> bytes:
+        return self._shard(label)[label]
+
+    def __contains__(self, label: object) -> bool:
+        return isinstance(label, bytes) and label in self._shard(label)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for shard in self.shards:
+            yield from shard
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def items(self) -> Iterator[Tuple[bytes, bytes]]:
+        for shard in self.shards:
+            yield from shard.items()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(shard.nbytes for shard in self.shards)
+
+
+class ShardedStoreWriter:
+    """
+    Routes encrypted entries by shard_of to one MappedStoreWriter per shard,
+    writing `path`.0 ... `path`.(num_shards - 1).
+    """
+
+    def __init__(self, path: str, num_shards: int, prf: str = "sha512"):
+        if path is None:
+            raise ValueError('The "sharded" store needs a store path')
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        self.paths = shard_paths(path, num_shards)
+        spill_buckets = max(1, SPILL_BUCKETS // num_shards)
+        self.writers = [
+            MappedStoreWriter(shard_path, prf, spill_buckets)
+            for shard_path in self.paths
+        ]
+
+    def put(self, label: bytes, value: bytes) -> None:
+        self.writers[shard_of(label, len(self.writers))].put(label, value)
+
+    def put_many(self, entries: Iterable[Tuple[bytes, bytes]]) -> None:
+        for label, value in entries:
+            self.put(label, value)
+
+    def finish(self) -> ShardedStore:
+        return ShardedStore([writer.finish() for writer in self.writers], self.paths)
+
+
+class SQLiteStore(Mapping):
+    """
+    An encrypted index in an SQLite database: one WITHOUT ROWID table keyed
+    by the label BLOB, in WAL mode. It lives on disk, so it can be larger
+    than memory and reopened after a restart with SQLiteStore.open; the
+    PRF backend that built it is kept in a metadata table.
+
+    The connection is shared by all threads, one statement at a time.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, path: str = None):
+        self.connection = connection
+        self.path = path
+        self._lock = threading.Lock()
+        row = connection.execute("SELECT value FROM meta WHERE key = 'prf'").fetchone()
+        self.prf = row[0] if row else "sha512"
+
+    @staticmethod
+    def connect(path: str) -> sqlite3.Connection:
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS emm "
+            "(label BLOB PRIMARY KEY, value BLOB NOT NULL) WITHOUT ROWID"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        return connection
+
+    @classmethod
+    def open(cls, path: str) -> "SQLiteStore":
+        if not os.path.exists(path):
+            raise ValueError(f"No SQLite index at {path}")
+        return cls(cls.connect(path), path)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def get(self, label: bytes, default: Optional[bytes] = None) -> Optional[bytes]:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT value FROM emm WHERE label = ?", (label,)
+            ).fetchone()
+        return default if row is None else row[0]
+
+    def get_many(self, labels: List[bytes]) -> List[Optional[bytes]]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(labels), SQLITE_LOOKUP_BATCH):
+                batch = labels[i : i + SQLITE_LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                found.update(
+                    self.connection.execute(
+                        f"SELECT label, value FROM emm WHERE label IN ({placeholders})",
+                        batch,
+                    )
+                )
+        return [found.get(label) for label in labels]
+
+    def __getitem__(self, label: bytes) -> bytes:
+        value = self.get(label)
+        if value is None:
+            raise KeyError(label)
+        return value
+
+    def __contains__(self, label: object) -> bool:
+        return isinstance(label, bytes) and self.get(label) is not None
+
+    def __iter__(self) -> Iterator[bytes]:
+        for label, _ in self.items():
+            yield label
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM emm").fetchone()[0]
+
+    def items(self) -> Iterator[Tuple[bytes, bytes]]:
+        # A separate cursor, so lookups can interleave with the iteration.
+        with self._lock:
+            cursor = self.connection.execute("SELECT label, value FROM emm")
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(SQLITE_LOOKUP_BATCH)
+            if not rows:
+                return
+            yield from rows
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            page_count = self.connection.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self.connection.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+
+
+class SQLiteStoreWriter:
+    """
+    Inserts encrypted entries into a fresh SQLite database at `path` with
+    batched executemany calls inside a single transaction, and returns it
+    as an SQLiteStore on finish. A label inserted twice raises
+    LabelCollisionError.
+    """
+
+    def __init__(self, path: str, prf: str = "sha512"):
+        if path is None:
+            raise ValueError('The "sqlite" store needs a store path')
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        self.path = path
+        self.connection = SQLiteStore.connect(path)
+        # The sqlite3 module opens a transaction at this first INSERT; it
+        # stays open until finish commits.
+        self.connection.execute("INSERT INTO meta VALUES ('prf', ?)", (prf,))
+        self.pending = []
+
+    def _flush(self) -> None:
+        # executemany keeps the rows it inserted before a failing one; the
+        # savepoint lets those be undone, so the duplicate can be found
+        # among the earlier batches and the rest of this one.
+        self.connection.execute("SAVEPOINT batch")
+        try:
+            self.connection.executemany("INSERT INTO emm VALUES (?, ?)", self.pending)
+        except sqlite3.IntegrityError:
+            self.connection.execute("ROLLBACK TO batch")
+            labels = set()
+            for label, _ in self.pending:
+                if label in labels or self.connection.execute(
+                    "SELECT 1 FROM emm WHERE label = ?", (label,)
+                ).fetchone():
+                    raise LabelCollisionError(label)
+                labels.add(label)
+            raise
+        self.connection.execute("RELEASE batch")
+        self.pending = []
+
+    def put(self, label: bytes, value: bytes) -> None:
+        self.pending.append((label, value))
+        if len(self.pending) >= SQLITE_INSERT_BATCH:
+            self._flush()
+
+    def put_many(self, entries: Iterable[Tuple[bytes, bytes]]) -> None:
+        for label, value in entries:
+            self.put(label, value)
+
+    def finish(self) -> SQLiteStore:
+        self._flush()
+        self.connection.commit()
+        return SQLiteStore(self.connection, self.path)
+
+
+STORE_WRITERS = {
+    "dict": DictStoreWriter,
+    "compact": CompactStoreWriter,
+    "mmap": MappedStoreWriter,
+    "sharded": ShardedStoreWriter,
+    "sqlite": SQLiteStoreWriter,
+}
+
+
+def open_store_writer(
+    kind: str,
+    path: Optional[str] = None,
+    prf: str = "sha512",
+    check_collisions: bool = False,
+    num_shards: int = 1,
+):
+    if kind not in STORE_WRITERS:
+        raise ValueError(
+            f"Unknown store {kind!r}; expected one of {sorted(STORE_WRITERS)}"
+        )
+    if kind == "dict":
+        return DictStoreWriter(check_collisions)
+    if kind == "compact":
+        return CompactStoreWriter(prf)
+    if kind == "sharded":
+        return ShardedStoreWriter(path, num_shards, prf)
+    if kind == "sqlite":
+        return SQLiteStoreWriter(path, prf)
+    return MappedStoreWriter(path, prf)
+
+
+def save_index(encrypted_db, path: str, prf: str = "sha512") -> None:
+    """
+    Writes any encrypted index (dict or CompactStore) in the on-disk format
+    read by CompactStore.open.
+    """
+    if not isinstance(encrypted_db, CompactStore):
+        encrypted_db = CompactStore.from_items(encrypted_db.items(), prf)
+    encrypted_db.save(path)
+
+
+def split_index(
+    encrypted_db, path: str, num_shards: int, prf: str = "sha512"
+) -> ShardedStore:
+    """
+    Writes any encrypted index as `num_shards` shard files (see
+    ShardedStoreWriter) and returns them opened.
+    """
+    writer = ShardedStoreWriter(path, num_shards, prf)
+    writer.put_many(encrypted_db.items())
+    return writer.finish()
+
+
+def store_size_bytes(encrypted_db) -> int:
+    """
+    Approximate memory footprint of an encrypted index.
+    """
+    if hasattr(encrypted_db, "nbytes"):
+        return encrypted_db.nbytes
+    return sum(
+        sys.getsizeof(k)
+        + sys.getsizeof(v)
+        + (sum(sys.getsizeof(item) for item in v) if isinstance(v, list) else 0)
+        for k, v in encrypted_db.items()
+    )
@@ -15,14 +15,15 @@
 ## limitations under the License.
 ##
 
-from .common.emm_engine import EMMEngine
-from .common.emm import EMM
+from .common.emm_engine import EMMEngine, Key
+from .common.emm import EMM, EMMND
 from ..structures.point import Point
 from ..structures.point_3d import Point3D
+from ..structures.point_nd import PointND
 
-from typing import Dict, List, Set
+from typing import Dict, Iterator, List, Set, Tuple
 
-from collections import defaultdict
+import itertools
 
 
 class Linear3D(EMM):
@@ -30,33 +31,38 @@ class Linear3D(EMM):
         self.encrypted_db = encrypted_db
         super().__init__(emm_engine)
 
-    def build_index(self, key: bytes, plaintext_mm: Dict[Point3D, List[bytes]]) -> EMM:
+    def build_index(self, key: Key, plaintext_mm: Dict[Point3D, List[bytes]]) -> EMM:
         """
         Outputs an encrypted index using the Naive Linear scheme, where each file in
         the plaintext multimap is associated with the single point where the file lives.
         """
-        modified_db = defaultdict(list)
-        for point, files in plaintext_mm.items():
-            modified_db[bytes(point)].extend(files)
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
 
-        self.encrypted_db = self.emm_engine.build_index(key, modified_db)
+    def _index_entries(
+        self, plaintext_mm: Dict[Point3D, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
+        for point, files in plaintext_mm.items():
+            yield self.encode_label((point.x, point.y, point.z)), files
 
-    def trapdoor(self, key: bytes, p1: Point3D, p2: Point3D) -> Set[bytes]:
+    def trapdoor(self, key: Key, p1: Point3D, p2: Point3D) -> Set[bytes]:
+        key = self.key_context(key)
         trapdoors = set()
 
-        for point in (
-            Point3D(x, y,z) for x in range(p1.x, p2.x + 1) for y in range(p1.y, p2.y + 1) for z in range(p1.z, p2.z + 1)
-        ):
-            new_trp = self.emm_engine.trapdoor(key, bytes(point))
+        with self.phase("cover"):
+            cover = [
+                Point3D(x, y,z) for x in range(p1.x, p2.x + 1) for y in range(p1.y, p2.y + 1) for z in range(p1.z, p2.z + 1)
+            ]
+        for point in cover:
+            new_trp = self.emm_engine.trapdoor(key, self.encode_label((point.x, point.y, point.z)))
             trapdoors.add(new_trp)
         return trapdoors
 
     def search(self, trapdoors: Set[bytes]) -> Set[bytes]:
-        results = set()
-        for trpdr in trapdoors:
-            result = self.emm_engine.search(trpdr, self.encrypted_db)
-            results = results.union(result)
-        return results
+        return self.emm_engine.search_many(trapdoors, self.encrypted_db)
 
 
 class Linear(EMM):
@@ -64,30 +70,73 @@ class Linear(EMM):
         self.encrypted_db = encrypted_db
         super().__init__(emm_engine)
 
-    def build_index(self, key: bytes, plaintext_mm: Dict[Point, List[bytes]]) -> EMM:
+    def build_index(self, key: Key, plaintext_mm: Dict[Point, List[bytes]]) -> EMM:
         """
         Outputs an encrypted index using the Naive Linear scheme, where each file in
         the plaintext multimap is associated with the single point where the file lives.
         """
-        modified_db = defaultdict(list)
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
+
+    def _index_entries(
+        self, plaintext_mm: Dict[Point, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
         for point, files in plaintext_mm.items():
-            modified_db[bytes(point)].extend(files)
+            yield self.encode_label((point.x, point.y)), files
+
+    def trapdoor(self, key: Key, p1: Point, p2: Point) -> Set[bytes]:
+        key = self.key_context(key)
+        trapdoors = set()
+
+        with self.phase("cover"):
+            cover = [
+                Point(x, y) for x in range(p1.x, p2.x + 1) for y in range(p1.y, p2.y + 1)
+            ]
+        for point in cover:
+            new_trp = self.emm_engine.trapdoor(key, self.encode_label((point.x, point.y)))
+            trapdoors.add(new_trp)
+        return trapdoors
 
-        self.encrypted_db = self.emm_engine.build_index(key, modified_db)
+    def search(self, trapdoors: Set[bytes]) -> Set[bytes]:
+        return self.emm_engine.search_many(trapdoors, self.encrypted_db)
+
+
+class LinearND(EMMND):
+    def build_index(self, key: Key, plaintext_mm: Dict[PointND, List[bytes]]) -> EMM:
+        """
+        Outputs an encrypted index using the Naive Linear scheme, where each file in
+        the plaintext multimap is associated with the single point where the file lives.
+        """
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
+
+    def _index_entries(
+        self, plaintext_mm: Dict[PointND, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
+        for point, files in plaintext_mm.items():
+            self._check_dims(point)
+            yield self.encode_label(tuple(point)), files
 
-    def trapdoor(self, key: bytes, p1: Point, p2: Point) -> Set[bytes]:
+    def trapdoor(self, key: Key, p1: PointND, p2: PointND) -> Set[bytes]:
+        key = self.key_context(key)
+        self._check_dims(p1)
+        self._check_dims(p2)
         trapdoors = set()
 
-        for point in (
-            Point(x, y) for x in range(p1.x, p2.x + 1) for y in range(p1.y, p2.y + 1)
-        ):
-            new_trp = self.emm_engine.trapdoor(key, bytes(point))
+        with self.phase("cover"):
+            cover = list(
+                itertools.product(*(range(low, high + 1) for low, high in zip(p1, p2)))
+            )
+        for point in cover:
+            new_trp = self.emm_engine.trapdoor(key, self.encode_label(point))
             trapdoors.add(new_trp)
         return trapdoors
 
     def search(self, trapdoors: Set[bytes]) -> Set[bytes]:
-        results = set()
-        for trpdr in trapdoors:
-            result = self.emm_engine.search(trpdr, self.encrypted_db)
-            results = results.union(result)
-        return results
+        return self.emm_engine.search_many(trapdoors, self.encrypted_db)
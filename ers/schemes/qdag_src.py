@@ -19,44 +19,58 @@ from ..structures.point import Point
 from ..structures.rect import Rect
 from ..structures.quad_tree_src import QuadTreeSRC
 from .common.emm import EMM
-from .common.emm_engine import EMMEngine
+from .common.emm_engine import EMMEngine, Key
 
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 
 import math
 import struct
-from collections import defaultdict
-
 class QdagSRC(EMM):
     def __init__(self, emm_engine: EMMEngine, encrypted_db: Dict[bytes, bytes] = {}):
         self.encrypted_db = encrypted_db
         self.qdag = None
         super().__init__(emm_engine)
 
-    def build_index(self, key: bytes, plaintext_mm: Dict[Point, List[bytes]]):
-        """
-        Outputs an encrypted index I.
-        """
+    def _init_structures(self) -> None:
         # Build QDAG over the domain space:
         x_nearest_height = math.ceil(math.log2(self.emm_engine.MAX_X))
         y_nearest_height = math.ceil(math.log2(self.emm_engine.MAX_Y))
         qdag_height = max(x_nearest_height, y_nearest_height)
         self.qdag = QuadTreeSRC(qdag_height, True)  # True for SRC
 
+    def _client_state(self) -> bytes:
+        # The QDAG takes time exponential in its height to build, so
+        # snapshots carry it rather than rebuilding it on load.
+        return self.qdag.to_bytes()
+
+    def _restore_client_state(self, state: bytes) -> None:
+        self.qdag = QuadTreeSRC.from_bytes(state)
+
+    def build_index(self, key: Key, plaintext_mm: Dict[Point, List[bytes]]):
+        """
+        Outputs an encrypted index I.
+        """
+        self._init_structures()
+
+        # Sigma.Setup over the labelled entries:
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
+
+    def _index_entries(
+        self, plaintext_mm: Dict[Point, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
         # For every range query, insert them into the database at each of their
         # respective SRC ranges:
-        modified_db = defaultdict(list)
         for point, files in plaintext_mm.items():
             # look up all queries which cover Point
             rects = self.qdag.find_containing_range_covers(point)
-            # insert (query, file) for each file in files
-            for file in files:
-                for rect in rects:
-                    serialized_query = self._convert_rect_to_bytes(rect)
-                    modified_db[serialized_query].append(file)
-
-        # Sigma.Setup over the modified_db:
-        self.encrypted_db = self.emm_engine.build_index(key, modified_db)
+            # insert (query, files) for each covering query
+            for rect in rects:
+                serialized_query = self._convert_rect_to_bytes(rect)
+                yield serialized_query, files
 
     @classmethod
     def convert_query_to_bytes(self, p1: Point, p2: Point) -> bytes:
@@ -69,8 +83,9 @@ class QdagSRC(EMM):
         """
         return self.convert_query_to_bytes(rect.start, rect.end)
 
-    def trapdoor(self, key: bytes, p1: Point, p2: Point) -> bytes:
-        range_cover = self.qdag.get_single_range_cover(Rect(p1, p2))
+    def trapdoor(self, key: Key, p1: Point, p2: Point) -> bytes:
+        with self.phase("cover"):
+            range_cover = self.qdag.get_single_range_cover(Rect(p1, p2))
         return self.emm_engine.trapdoor(
             key, self.convert_query_to_bytes(range_cover.start, range_cover.end)
         )
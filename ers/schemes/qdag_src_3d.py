@@ -19,14 +19,12 @@ from ..structures.point_3d import Point3D
 from ..structures.rect_3d import Rect3D
 from ..structures.quad_tree_3d_src import QuadTreeSRC3D
 from .common.emm import EMM
-from .common.emm_engine import EMMEngine
+from .common.emm_engine import EMMEngine, Key
 
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 
 import math
 
-from collections import defaultdict
-
 import struct
 
 
@@ -36,10 +34,7 @@ class QdagSRC3D(EMM):
         self.qdag = None
         super().__init__(emm_engine)
 
-    def build_index(self, key: bytes, plaintext_mm: Dict[Point3D, List[bytes]]):
-        """
-        Outputs an encrypted index I.
-        """
+    def _init_structures(self) -> None:
         # Build QDAG over the domain space:
         x_nearest_height = math.ceil(math.log2(self.emm_engine.MAX_X))
         y_nearest_height = math.ceil(math.log2(self.emm_engine.MAX_Y))
@@ -47,20 +42,39 @@ class QdagSRC3D(EMM):
         qdag_height = max(x_nearest_height, y_nearest_height, z_nearest_height)
         self.qdag = QuadTreeSRC3D(qdag_height, True)  # True for SRC
 
+    def _client_state(self) -> bytes:
+        # The QDAG takes time exponential in its height to build, so
+        # snapshots carry it rather than rebuilding it on load.
+        return self.qdag.to_bytes()
+
+    def _restore_client_state(self, state: bytes) -> None:
+        self.qdag = QuadTreeSRC3D.from_bytes(state)
+
+    def build_index(self, key: Key, plaintext_mm: Dict[Point3D, List[bytes]]):
+        """
+        Outputs an encrypted index I.
+        """
+        self._init_structures()
+
+        # Sigma.Setup over the labelled entries:
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
+
+    def _index_entries(
+        self, plaintext_mm: Dict[Point3D, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
         # For every range query, insert them into the database at each of their
         # respective SRC ranges:
-        modified_db = defaultdict(list)
         for point, files in plaintext_mm.items():
             # look up all queries which cover the given point
             rects = self.qdag.find_containing_range_covers(point)
-            # insert (query, file) for each file in files
-            for file in files:
-                for rect in rects:
-                    serialized_query = self._convert_rect_to_bytes(rect)
-                    modified_db[serialized_query].append(file)
-
-        # Sigma.Setup over the modified_db:
-        self.encrypted_db = self.emm_engine.build_index(key, modified_db)
+            # insert (query, files) for each covering query
+            for rect in rects:
+                serialized_query = self._convert_rect_to_bytes(rect)
+                yield serialized_query, files
 
     def _convert_rect_to_bytes(self, rect: Rect3D):
         """
@@ -77,8 +91,9 @@ class QdagSRC3D(EMM):
             rect.end.z,
         )
 
-    def trapdoor(self, key: bytes, p1: Point3D, p2: Point3D) -> bytes:
-        range_cover = self.qdag.get_single_range_cover(Rect3D(p1, p2))
+    def trapdoor(self, key: Key, p1: Point3D, p2: Point3D) -> bytes:
+        with self.phase("cover"):
+            range_cover = self.qdag.get_single_range_cover(Rect3D(p1, p2))
         return self.emm_engine.trapdoor(key, self._convert_rect_to_bytes(range_cover))
 
     def search(self, trapdoor):
@@ -15,14 +15,13 @@
 ## limitations under the License.
 ##
 
-from .common.emm_engine import EMMEngine
+from .common.emm_engine import EMMEngine, Key
 from .common.emm import EMM
 from ..structures.point import Point
 from ..structures.quad_tree import QuadTree
 from ..structures.rect import Rect
 
-from typing import Dict, List, Set
-from collections import defaultdict
+from typing import Dict, Iterator, List, Set, Tuple
 from tqdm import tqdm
 import itertools
 import math
@@ -38,10 +37,7 @@ class QuadBRC(EMM):
         self.qdag = None
         super().__init__(emm_engine)
 
-    def build_index(self, key: bytes, plaintext_mm: Dict[Point, List[bytes]]):
-        """
-        Outputs an encrypted index I.
-        """
+    def _init_structures(self) -> None:
         print("Build quadtree...")
         max_side_len = max(self.emm_engine.MAX_X, self.emm_engine.MAX_Y)
         start_level = math.ceil(math.log2(next_power_of_2(max_side_len)))
@@ -50,17 +46,29 @@ class QuadBRC(EMM):
             start_level
         )
 
+    def build_index(self, key: Key, plaintext_mm: Dict[Point, List[bytes]]):
+        """
+        Outputs an encrypted index I.
+        """
+        self._init_structures()
+
         print("Inserting...")
-        modified_db = defaultdict(list)
+        # Sigma.Setup over the labelled entries:
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
+
+    def _index_entries(
+        self, plaintext_mm: Dict[Point, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
         for point, files in tqdm(plaintext_mm.items()):
             for rect_cover in self.qdag.find_containing_range_covers(point):
                 #if point.x == 5 and point.y ==4:
                 #    print(rect_cover)
                 label_bytes = QuadBRC._convert_rect_to_bytes(rect_cover)
-                modified_db[label_bytes].extend(files)
-
-        # Sigma.Setup over the modified_db:
-        self.encrypted_db = self.emm_engine.build_index(key, modified_db)
+                yield label_bytes, files
 
     @classmethod
     def convert_query_to_bytes(self, p1: Point, p2: Point) -> bytes:
@@ -74,9 +82,11 @@ class QuadBRC(EMM):
         """
         return QuadBRC.convert_query_to_bytes(rect.start, rect.end)
 
-    def trapdoor(self, key: bytes, p1: Point, p2: Point) -> Set[bytes]:
+    def trapdoor(self, key: Key, p1: Point, p2: Point) -> Set[bytes]:
+        key = self.key_context(key)
         trapdoors = set()
-        range_covers = self.qdag.get_brc_range_cover(Rect(p1, Point(p2.x, p2.y)))
+        with self.phase("cover"):
+            range_covers = self.qdag.get_brc_range_cover(Rect(p1, Point(p2.x, p2.y)))
         #print("Range Cover")
         #for i in range_covers:
         #    print(i)
@@ -87,10 +97,4 @@ class QuadBRC(EMM):
         return trapdoors
 
     def search(self, trapdoors: Set[bytes]) -> Set[bytes]:
-        results = set()
-        #print("results")
-        for trpdr in trapdoors:
-            result = self.emm_engine.search(trpdr, self.encrypted_db)
-            #print(len(result))
-            results = results.union(result)
-        return results
+        return self.emm_engine.search_many(trapdoors, self.encrypted_db)
@@ -19,16 +19,14 @@ from ..structures.point_3d import Point3D
 from ..structures.rect_3d import Rect3D
 from ..structures.quad_tree_3d import QuadTree3D
 from .common.emm import EMM
-from .common.emm_engine import EMMEngine
+from .common.emm_engine import EMMEngine, Key
 from ..util.serialization import ObjectToBytes
 
 
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 
 import math
 
-from collections import defaultdict
-
 import struct
 from tqdm import tqdm
 
@@ -43,10 +41,7 @@ class QuadBRC3D(EMM):
         self.quad = None
         super().__init__(emm_engine)
 
-    def build_index(self, key: bytes, plaintext_mm: Dict[Point3D, List[bytes]]):
-        """
-        Outputs an encrypted index I.
-        """
+    def _init_structures(self) -> None:
         print("Build quadtree...")
         max_side_len = max(self.emm_engine.MAX_X, self.emm_engine.MAX_Y)
         start_level = math.ceil(math.log2(next_power_of_2(max_side_len)))
@@ -55,17 +50,29 @@ class QuadBRC3D(EMM):
             start_level
         )
 
+    def build_index(self, key: Key, plaintext_mm: Dict[Point3D, List[bytes]]):
+        """
+        Outputs an encrypted index I.
+        """
+        self._init_structures()
+
         print("Inserting...")
-        modified_db = defaultdict(list)
+        # Sigma.Setup over the labelled entries:
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
+
+    def _index_entries(
+        self, plaintext_mm: Dict[Point3D, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
         for point, files in tqdm(plaintext_mm.items()):
             for rect_cover in self.quad.find_containing_range_covers(point):
                 #if point.x == 5 and point.y ==4:
                 #    print(rect_cover)
                 label_bytes = self._convert_rect_to_bytes(rect_cover)
-                modified_db[label_bytes].extend(files)
-
-        # Sigma.Setup over the modified_db:
-        self.encrypted_db = self.emm_engine.build_index(key, modified_db)
+                yield label_bytes, files
 
     def _convert_rect_to_bytes(self, rect: Rect3D):
         """
@@ -82,8 +89,10 @@ class QuadBRC3D(EMM):
             rect.end.z,
         )
 
-    def trapdoor(self, key: bytes, p1: Point3D, p2: Point3D) -> bytes:
-        range_covers = self.quad.get_brc_range_cover(Rect3D(p1, p2))
+    def trapdoor(self, key: Key, p1: Point3D, p2: Point3D) -> bytes:
+        key = self.key_context(key)
+        with self.phase("cover"):
+            range_covers = self.quad.get_brc_range_cover(Rect3D(p1, p2))
 
         trapdoors = set()
 
@@ -94,8 +103,4 @@ class QuadBRC3D(EMM):
         return trapdoors
 
     def search(self, trapdoor):
-        results = set()
-        for trpdr in trapdoor:
-            result = self.emm_engine.search(trpdr, self.encrypted_db)
-            results = results.union(result)
-        return results
+        return self.emm_engine.search_many(trapdoor, self.encrypted_db)
@@ -0,0 +1,75 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from .common.emm_engine import Key
+from .common.emm import EMM, EMMND
+from ..structures.point_nd import PointND
+from ..structures.quad_tree_nd import QuadTreeND
+from ..structures.rect_nd import RectND
+
+from typing import Dict, Iterator, List, Set, Tuple
+
+from tqdm import tqdm
+
+
+class QuadBRCND(EMMND):
+    """
+    Quad-BRC over `dims` dimensions, on a 2^d-ary tree of cubes (see
+    QuadTreeND): every point is stored under the cube containing it at each
+    level, and a query is covered by the fewest cubes whose union it is.
+    """
+
+    def _init_structures(self) -> None:
+        super()._init_structures()
+        self.quad = QuadTreeND(self.height, self.dims)
+
+    def build_index(self, key: Key, plaintext_mm: Dict[PointND, List[bytes]]) -> EMM:
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
+
+    def _index_entries(
+        self, plaintext_mm: Dict[PointND, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
+        for point, files in tqdm(plaintext_mm.items()):
+            self._check_dims(point)
+            for cube in self.quad.find_containing_range_covers(point):
+                yield self._convert_rect_to_bytes(cube), files
+
+    def _convert_rect_to_bytes(self, rect: RectND) -> bytes:
+        """
+        Converts a `RectND` to its serialized byte representation for storage in
+        an encrypted DB.
+        """
+        return self.encode_label(rect.start + rect.end)
+
+    def trapdoor(self, key: Key, p1: PointND, p2: PointND) -> Set[bytes]:
+        key = self.key_context(key)
+        self._check_dims(p1)
+        self._check_dims(p2)
+        trapdoors = set()
+        with self.phase("cover"):
+            range_covers = self.quad.get_brc_range_cover(RectND(p1, p2))
+        for cube in range_covers:
+            new_trp = self.emm_engine.trapdoor(key, self._convert_rect_to_bytes(cube))
+            trapdoors.add(new_trp)
+        return trapdoors
+
+    def search(self, trapdoors: Set[bytes]) -> Set[bytes]:
+        return self.emm_engine.search_many(trapdoors, self.encrypted_db)
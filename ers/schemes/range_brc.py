@@ -15,18 +15,14 @@
 ## limitations under the License.
 ##
 
-from .common.emm_engine import EMMEngine
+from .common.emm_engine import EMMEngine, Key
 from .common.emm import EMM
 from ..structures.point import Point
-from ..structures.range_tree import RangeTree
-from ..util.serialization import ObjectToBytes
+from ..structures.range_tree import ImplicitRangeTree
 
-from typing import Dict, List, Set
+from typing import Dict, Iterator, List, Set, Tuple
 
 import itertools
-import math
-
-from collections import defaultdict
 
 from tqdm import tqdm
 
@@ -38,56 +34,48 @@ class RangeBRC(EMM):
         self.y_tree = None
         super().__init__(emm_engine)
 
-    @classmethod
-    def descend_tree(self, val: int, rnge: List[int]) -> List[int]:
-        rnges = []
-        while rnge != [val, val]:
-            rnges.append(rnge)
-            if val <= ((rnge[0] + rnge[1]) // 2):
-                rnge = [rnge[0], ((rnge[0] + rnge[1]) // 2)]
-            else:
-                rnge = [((rnge[0] + rnge[1]) // 2) + 1, rnge[1]]
-
-        rnges.append([val, val])
-        return rnges
+    def _init_structures(self) -> None:
+        x_tree_height = (self.emm_engine.MAX_X - 1).bit_length()
+        y_tree_height = (self.emm_engine.MAX_Y - 1).bit_length()
 
-    def build_index(self, key: bytes, plaintext_mm: Dict[Point, List[bytes]]) -> EMM:
-        x_tree_height = math.ceil(math.log2(self.emm_engine.MAX_X))
-        y_tree_height = math.ceil(math.log2(self.emm_engine.MAX_Y))
+        self.x_tree = ImplicitRangeTree(x_tree_height)
+        self.y_tree = ImplicitRangeTree(y_tree_height)
 
-        self.x_tree = RangeTree.initialize_tree(x_tree_height)
-        self.y_tree = RangeTree.initialize_tree(y_tree_height)
+    def build_index(self, key: Key, plaintext_mm: Dict[Point, List[bytes]]) -> EMM:
+        self._init_structures()
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
 
-        modified_db = defaultdict(list)
+    def _index_entries(
+        self, plaintext_mm: Dict[Point, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
         for point, vals in tqdm(plaintext_mm.items()):
-            full_x_range = [0, self.emm_engine.MAX_X - 1]
-            x_roots = RangeBRC.descend_tree(point.x, full_x_range)
+            x_roots = self.x_tree.path(point.x)
             for root in x_roots:
-                full_y_range = [0, self.emm_engine.MAX_Y - 1]
-                y_path = RangeBRC.descend_tree(point.y, full_y_range)
+                y_path = self.y_tree.path(point.y)
                 for y_node in y_path:
-                    label = ObjectToBytes([root, y_node])
-                    modified_db[label].extend(vals)
-
-        self.encrypted_db = self.emm_engine.build_index(key, modified_db)
+                    label = self.encode_label([root, y_node])
+                    yield label, vals
 
     def generate_cover(self, p1: Point, p2: Point) -> Set[bytes]:
         x_covers = self.x_tree.get_brc_range_cover((p1.x, p2.x))
         y_covers = self.y_tree.get_brc_range_cover((p1.y, p2.y))
         return itertools.product(x_covers, y_covers)
 
-    def trapdoor(self, key: bytes, p1: Point, p2: Point) -> Set[bytes]:
+    def trapdoor(self, key: Key, p1: Point, p2: Point) -> Set[bytes]:
+        key = self.key_context(key)
         trapdoors = set()
 
-        for p1, p2 in self.generate_cover(p1, p2):
-            token_bytes = ObjectToBytes([p1, p2])
+        with self.phase("cover"):
+            cover = list(self.generate_cover(p1, p2))
+        for p1, p2 in cover:
+            token_bytes = self.encode_label([p1, p2])
             new_trp = self.emm_engine.trapdoor(key, token_bytes)
             trapdoors.add(new_trp)
         return trapdoors
 
     def search(self, trapdoors: Set[bytes]) -> Set[bytes]:
-        results = set()
-        for trpdr in trapdoors:
-            result = self.emm_engine.search(trpdr, self.encrypted_db)
-            results = results.union(result)
-        return results
+        return self.emm_engine.search_many(trapdoors, self.encrypted_db)
@@ -0,0 +1,71 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from .common.emm_engine import Key
+from .common.emm import EMM, EMMND
+from ..structures.point_nd import PointND
+from ..structures.range_tree import dyadic_cover, dyadic_path
+
+from typing import Dict, Iterator, List, Set, Tuple
+
+import itertools
+
+from tqdm import tqdm
+
+
+class RangeBRCND(EMMND):
+    """
+    Range-BRC over `dims` dimensions: one range tree per axis, with every
+    point stored under each combination of the tree nodes above its
+    coordinates, and a query covered by every combination of the per-axis
+    best range covers. With dims=2 the labels are those of RangeBRC.
+    """
+
+    def build_index(self, key: Key, plaintext_mm: Dict[PointND, List[bytes]]) -> EMM:
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
+
+    def _index_entries(
+        self, plaintext_mm: Dict[PointND, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
+        for point, vals in tqdm(plaintext_mm.items()):
+            self._check_dims(point)
+            paths = [dyadic_path(coord, self.height) for coord in point]
+            for nodes in itertools.product(*paths):
+                yield self.encode_label(nodes), vals
+
+    def generate_cover(self, p1: PointND, p2: PointND) -> List[Tuple[Tuple[int, int], ...]]:
+        self._check_dims(p1)
+        self._check_dims(p2)
+        covers = [dyadic_cover(low, high, self.height) for low, high in zip(p1, p2)]
+        return list(itertools.product(*covers))
+
+    def trapdoor(self, key: Key, p1: PointND, p2: PointND) -> Set[bytes]:
+        key = self.key_context(key)
+        trapdoors = set()
+        with self.phase("cover"):
+            cover = self.generate_cover(p1, p2)
+        for nodes in cover:
+            new_trp = self.emm_engine.trapdoor(key, self.encode_label(nodes))
+            trapdoors.add(new_trp)
+        return trapdoors
+
+    def search(self, trapdoors: Set[bytes]) -> Set[bytes]:
+        return self.emm_engine.search_many(trapdoors, self.encrypted_db)
@@ -17,14 +17,10 @@
 
 from __future__ import annotations
 
-from ..util.serialization import ObjectToBytes
-from .common.emm_engine import EMMEngine
+from .common.emm_engine import EMMEngine, Key
 from .common.emm import EMM
 from ..structures.point import Point
 from ..structures.tdag import Tdag
-from ..util.serialization import ObjectToBytes
-
-from collections import defaultdict
 
 from tqdm import tqdm
 import collections
@@ -65,7 +61,7 @@ class TdagSRC(EMM):
         rnges.append([val, val])
         return rnges
 
-    def build_index(self, key: bytes, plaintext_mm: Dict[Point, List[bytes]]) -> Dict[Tuple[int, int], int]:
+    def _init_structures(self) -> None:
         x_tree_height = math.ceil(math.log2(self.emm_engine.MAX_X))
         y_tree_height = math.ceil(math.log2(self.emm_engine.MAX_Y))
 
@@ -75,7 +71,17 @@ class TdagSRC(EMM):
         self.level_x = x_tree_height
         self.level_y = y_tree_height
 
-        modified_db = defaultdict(list)
+    def build_index(self, key: Key, plaintext_mm: Dict[Point, List[bytes]]) -> Dict[Tuple[int, int], int]:
+        self._init_structures()
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
+
+    def _index_entries(
+        self, plaintext_mm: Dict[Point, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
         for point, vals in tqdm(plaintext_mm.items()):
             full_x_range = [0, self.emm_engine.MAX_X - 1]
             x_roots = TdagSRC.descend_tree(point.x, full_x_range)
@@ -83,10 +89,8 @@ class TdagSRC(EMM):
                 full_y_range = [0, self.emm_engine.MAX_Y - 1]
                 y_path = TdagSRC.descend_tree(point.y, full_y_range)
                 for y_node in y_path:
-                    label = ObjectToBytes([root, y_node])
-                    modified_db[label].extend(vals)
-
-        self.encrypted_db = self.emm_engine.build_index(key, modified_db)
+                    label = self.encode_label([root, y_node])
+                    yield label, vals
 
 
     def generate_cover(self, p1: Point, p2: Point):
@@ -94,9 +98,10 @@ class TdagSRC(EMM):
         y_cover = self.y_tree.get_single_range_cover((p1.y, p2.y))
         return (x_cover, y_cover)
 
-    def trapdoor(self, key, p1: Point, p2: Point) -> List[Tuple[int, int]]:
-        cover = self.generate_cover(p1, p2)
-        return self.emm_engine.trapdoor(key, ObjectToBytes(cover))
+    def trapdoor(self, key: Key, p1: Point, p2: Point) -> List[Tuple[int, int]]:
+        with self.phase("cover"):
+            cover = self.generate_cover(p1, p2)
+        return self.emm_engine.trapdoor(key, self.encode_label(cover))
 
     def search(self, trapdoor) -> ResolveDone:
         return self.emm_engine.search(trapdoor, self.encrypted_db)
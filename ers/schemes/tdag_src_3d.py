@@ -17,16 +17,12 @@
 
 from __future__ import annotations
 
-from ..util.serialization import ObjectToBytes
-from .common.emm_engine import EMMEngine
+from .common.emm_engine import EMMEngine, Key
 from .common.emm import EMM
 from ..structures.point_3d import Point3D
 from ..structures.tdag import Tdag
-from ..util.serialization import ObjectToBytes
 
 
-from collections import defaultdict
-
 from tqdm import tqdm
 import collections
 
@@ -62,7 +58,7 @@ class TdagSRC3D(EMM):
 
         rnges.append([val, val])
         return rnges
-    def build_index(self, key: bytes, plaintext_mm: Dict[Point3D, List[bytes]]) -> Dict[Tuple[int, int], int]:
+    def _init_structures(self) -> None:
         # At the moment we only support squares
         x_tree_height = math.ceil(math.log2(self.emm_engine.MAX_X))
         y_tree_height = math.ceil(math.log2(self.emm_engine.MAX_Y))
@@ -71,7 +67,17 @@ class TdagSRC3D(EMM):
         self.y_tree = Tdag.initialize_tree(y_tree_height)
         self.z_tree = Tdag.initialize_tree(y_tree_height)
 
-        modified_db = defaultdict(list)
+    def build_index(self, key: Key, plaintext_mm: Dict[Point3D, List[bytes]]) -> Dict[Tuple[int, int], int]:
+        self._init_structures()
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
+
+    def _index_entries(
+        self, plaintext_mm: Dict[Point3D, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
         for point, vals in tqdm(plaintext_mm.items()):
             full_x_range = [0, self.emm_engine.MAX_X - 1]
             x_roots = TdagSRC3D.descend_tree(point.x, full_x_range)
@@ -82,10 +88,8 @@ class TdagSRC3D(EMM):
                     full_z_range = [0, self.emm_engine.MAX_Y - 1]
                     z_path = TdagSRC3D.descend_tree(point.z, full_z_range)
                     for z_node in z_path:
-                        label = ObjectToBytes([root, y_node, z_node])
-                        modified_db[label].extend(vals)
-
-        self.encrypted_db = self.emm_engine.build_index(key, modified_db)
+                        label = self.encode_label([root, y_node, z_node])
+                        yield label, vals
 
     def generate_cover(self, p1: Point3D, p2: Point3D):
         x_cover = self.x_tree.get_single_range_cover((p1.x, p2.x))
@@ -93,9 +97,10 @@ class TdagSRC3D(EMM):
         z_cover = self.z_tree.get_single_range_cover((p1.z, p2.z))
         return (x_cover, y_cover, z_cover)
 
-    def trapdoor(self, key, p1: Point3D, p2: Point3D) -> List[Tuple[int, int]]:
-        cover = self.generate_cover(p1, p2)
-        return self.emm_engine.trapdoor(key, ObjectToBytes(cover))
+    def trapdoor(self, key: Key, p1: Point3D, p2: Point3D) -> List[Tuple[int, int]]:
+        with self.phase("cover"):
+            cover = self.generate_cover(p1, p2)
+        return self.emm_engine.trapdoor(key, self.encode_label(cover))
 
     def search(self, trapdoor) -> ResolveDone:
         return self.emm_engine.search(trapdoor, self.encrypted_db)
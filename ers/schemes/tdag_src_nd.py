@@ -0,0 +1,65 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from .common.emm_engine import Key
+from .common.emm import EMM, EMMND
+from ..structures.point_nd import PointND
+from ..structures.tdag import tdag_cover, tdag_path
+
+from typing import Dict, Iterator, List, Tuple
+
+import itertools
+
+from tqdm import tqdm
+
+
+class TdagSRCND(EMMND):
+    """
+    Tdag-SRC over `dims` dimensions: one TDAG per axis, with every point
+    stored under each combination of the TDAG nodes containing its
+    coordinates, and a query answered with the single token for the
+    combination of the per-axis single range covers.
+    """
+
+    def build_index(self, key: Key, plaintext_mm: Dict[PointND, List[bytes]]) -> EMM:
+        self.encrypted_db = self.emm_engine.build_index(key, self._index_entries(plaintext_mm))
+
+    def _index_entries(
+        self, plaintext_mm: Dict[PointND, List[bytes]]
+    ) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """
+        Yields a (label, values) pair for every label each point is
+        stored under.
+        """
+        for point, vals in tqdm(plaintext_mm.items()):
+            self._check_dims(point)
+            paths = [tdag_path(coord, self.height) for coord in point]
+            for nodes in itertools.product(*paths):
+                yield self.encode_label(nodes), vals
+
+    def generate_cover(self, p1: PointND, p2: PointND) -> Tuple[Tuple[int, int], ...]:
+        self._check_dims(p1)
+        self._check_dims(p2)
+        return tuple(tdag_cover(low, high, self.height) for low, high in zip(p1, p2))
+
+    def trapdoor(self, key: Key, p1: PointND, p2: PointND) -> bytes:
+        with self.phase("cover"):
+            cover = self.generate_cover(p1, p2)
+        return self.emm_engine.trapdoor(key, self.encode_label(cover))
+
+    def search(self, trapdoor: bytes):
+        return self.emm_engine.search(trapdoor, self.encrypted_db)
@@ -0,0 +1,118 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from ..schemes.common.store import CompactStore
+from .async_server import AsyncSearchServer, log_stats
+from .prefork import serve_prefork
+from .server import SearchServer, engine_for_store
+
+import argparse
+import asyncio
+import sys
+
+
+async def serve_async(args, engine, store):
+    server = AsyncSearchServer(engine, store, args.executor_workers)
+    host, port = await server.start(args.host, args.port)
+    print(f"Listening on {host}:{port}", flush=True)
+    if args.stats_interval > 0:
+        asyncio.create_task(log_stats(server.stats, args.stats_interval))
+    try:
+        await server.serve_forever()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve an encrypted index over TCP"
+    )
+    parser.add_argument("index", help="index file written by a mmap store or save_index")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7070)
+    parser.add_argument(
+        "--search_threads",
+        type=int,
+        default=1,
+        help="threads used to search large token batches",
+    )
+    parser.add_argument(
+        "--cache_bytes",
+        type=int,
+        default=None,
+        help="keep recent search results, keyed by token, in about this many bytes",
+    )
+    parser.add_argument(
+        "--frontend",
+        choices=["asyncio", "threads"],
+        default="asyncio",
+        help="asyncio event loop, or one thread per connection",
+    )
+    parser.add_argument(
+        "--executor_workers",
+        type=int,
+        default=4,
+        help="threads the asyncio frontend hands large searches to",
+    )
+    parser.add_argument(
+        "--stats_interval",
+        type=float,
+        default=0,
+        help="seconds between server statistics lines on stderr (0 = off)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="worker processes, all serving the same memory-mapped index",
+    )
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        serve_prefork(
+            args.index,
+            args.host,
+            args.port,
+            args.workers,
+            frontend=args.frontend,
+            executor_workers=args.executor_workers,
+            stats_interval=args.stats_interval,
+            engine_options={
+                "search_threads": args.search_threads,
+                "cache_bytes": args.cache_bytes,
+            },
+            on_listening=lambda address: print(
+                f"Listening on {address[0]}:{address[1]}", flush=True
+            ),
+        )
+        sys.exit(0)
+
+    store = CompactStore.open(args.index)
+    engine = engine_for_store(
+        store, search_threads=args.search_threads, cache_bytes=args.cache_bytes
+    )
+    try:
+        if args.frontend == "asyncio":
+            asyncio.run(serve_async(args, engine, store))
+        else:
+            with SearchServer((args.host, args.port), engine, store) as server:
+                host, port = server.server_address[:2]
+                print(f"Listening on {host}:{port}", flush=True)
+                server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    store.close()
@@ -0,0 +1,349 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from ..schemes.common.emm_engine import EMMEngine
+from .protocol import (
+    FRAME_HEADER,
+    OP_ERROR,
+    OP_GET,
+    OP_SEARCH,
+    OP_STATS,
+    OP_VALUES,
+    decode_items,
+    encode_frame,
+    encode_results,
+    encode_values,
+    parse_frame_header,
+)
+from .server import lookup_many
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Set, Tuple
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+# A search of at most INLINE_MAX_TOKENS tokens is answered on the event loop
+# as long as no posting list needs more than INLINE_MAX_PROBES lookups; the
+# rest of the work is handed to the executor.
+INLINE_MAX_TOKENS = 16
+INLINE_MAX_PROBES = 64
+
+# Requests a single connection may have in flight before the server stops
+# reading from it.
+MAX_PIPELINED_REQUESTS = 64
+
+# Latency percentiles are computed over this many most recent requests.
+LATENCY_WINDOW = 10000
+
+
+class ServerStats:
+    """
+    Request counters, the latency of recent requests (receipt of the request
+    frame to the last response byte handed to the socket) and the depth of
+    the executor queue, for one server process.
+    """
+
+    def __init__(self):
+        self.open_connections = 0
+        self.requests = 0
+        self.inline_requests = 0
+        self.offloaded_requests = 0
+        self.errors = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def enqueue(self) -> None:
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+    def dequeue(self) -> None:
+        self.queue_depth -= 1
+
+    def record(self, latency_ns: int) -> None:
+        self.requests += 1
+        self.latencies.append(latency_ns)
+
+    def snapshot(self) -> Dict[str, float]:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] / 10**9
+
+        return {
+            "pid": os.getpid(),
+            "open_connections": self.open_connections,
+            "requests": self.requests,
+            "inline_requests": self.inline_requests,
+            "offloaded_requests": self.offloaded_requests,
+            "errors": self.errors,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "latency_mean_sec": (
+                sum(latencies) / len(latencies) / 10**9 if latencies else 0
+            ),
+            "latency_p50_sec": percentile(0.50),
+            "latency_p99_sec": percentile(0.99),
+            "latency_max_sec": latencies[-1] / 10**9 if latencies else 0,
+        }
+
+
+class AsyncSearchServer:
+    """
+    asyncio front end for EMMEngine search over the protocol in
+    protocol.py. Each connection is a reader coroutine that parses request
+    frames and a writer coroutine that sends the answers back in request
+    order, so pipelined requests on one connection are worked on
+    concurrently.
+
+    Small searches run inline on the event loop under a probe budget (see
+    INLINE_MAX_TOKENS and INLINE_MAX_PROBES). Larger batches, and posting
+    lists that outrun the budget, continue in a thread pool of
+    `executor_workers` threads, so one long scan never stalls the loop.
+    """
+
+    def __init__(
+        self,
+        engine: EMMEngine,
+        encrypted_db,
+        executor_workers: int = 4,
+        inline_max_tokens: int = INLINE_MAX_TOKENS,
+        inline_max_probes: int = INLINE_MAX_PROBES,
+    ):
+        self.engine = engine
+        self.encrypted_db = encrypted_db
+        self.executor = ThreadPoolExecutor(executor_workers)
+        self.inline_max_tokens = inline_max_tokens
+        self.inline_max_probes = inline_max_probes
+        self.stats = ServerStats()
+        self.server = None
+
+    async def start(self, host: str, port: int, sock: socket.socket = None):
+        """
+        Starts listening on (host, port), or on an already bound `sock`, and
+        returns the address actually bound.
+        """
+        if sock is not None:
+            self.server = await asyncio.start_server(self._serve_connection, sock=sock)
+        else:
+            self.server = await asyncio.start_server(
+                self._serve_connection, host, port
+            )
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self) -> None:
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    def _search_inline(
+        self, tokens: List[bytes], results: Set[bytes]
+    ) -> List[Tuple[bytes, int, List[bytes]]]:
+        """
+        Probes each posting list up to the inline budget, adding what it
+        finds to `results`. Returns (token, resume position, ciphertexts
+        found so far) for the posting lists that are not finished.
+        """
+        cache = self.engine.result_cache
+        unfinished = []
+        for token in tokens:
+            found, resume = self.engine.probe(
+                token, self.encrypted_db, 0, self.inline_max_probes
+            )
+            results.update(found)
+            if resume is not None:
+                unfinished.append((token, resume, found))
+            elif cache is not None:
+                cache.put(token, found)
+        return unfinished
+
+    def _search_remaining(
+        self,
+        request_id: int,
+        results: Set[bytes],
+        unfinished: List[Tuple[bytes, int, List[bytes]]],
+    ) -> List[bytes]:
+        """
+        Finishes the posting lists in `unfinished`, adding to `results`, and
+        encodes the response frames. Runs in the executor.
+        """
+        cache = self.engine.result_cache
+        fresh = [token for token, start, _ in unfinished if start == 0]
+        if cache is None:
+            results.update(self.engine.search_many(fresh, self.encrypted_db))
+        else:
+            for token, found in zip(
+                fresh, self.engine.posting_lists(fresh, self.encrypted_db)
+            ):
+                cache.put(token, found)
+                results.update(found)
+        for token, start, found in unfinished:
+            if start:
+                rest, _ = self.engine.probe(token, self.encrypted_db, start)
+                results.update(rest)
+                if cache is not None:
+                    cache.put(token, found + rest)
+        return list(encode_results(request_id, results))
+
+    async def search(self, request_id: int, tokens: List[bytes]) -> List[bytes]:
+        """
+        Returns the response frames for a search request. Tokens in the
+        engine's result cache are answered from it.
+        """
+        results = set()
+        cache = self.engine.result_cache
+        if cache is not None:
+            misses = []
+            for token in tokens:
+                cached = cache.get(token)
+                if cached is None:
+                    misses.append(token)
+                else:
+                    results.update(cached)
+            tokens = misses
+
+        if len(tokens) <= self.inline_max_tokens:
+            unfinished = self._search_inline(tokens, results)
+            if not unfinished:
+                self.stats.inline_requests += 1
+                return list(encode_results(request_id, results))
+        else:
+            unfinished = [(token, 0, []) for token in tokens]
+
+        self.stats.offloaded_requests += 1
+        self.stats.enqueue()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._search_remaining, request_id, results, unfinished
+            )
+        finally:
+            self.stats.dequeue()
+
+    def _lookup(self, request_id: int, labels: List[bytes]) -> List[bytes]:
+        values = lookup_many(self.encrypted_db, labels)
+        return [encode_frame(OP_VALUES, request_id, encode_values(values))]
+
+    async def get(self, request_id: int, labels: List[bytes]) -> List[bytes]:
+        """
+        Returns the response frame for a label lookup request. Lookups
+        within the inline probe budget run on the loop.
+        """
+        if len(labels) <= self.inline_max_tokens * self.inline_max_probes:
+            self.stats.inline_requests += 1
+            return self._lookup(request_id, labels)
+
+        self.stats.offloaded_requests += 1
+        self.stats.enqueue()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._lookup, request_id, labels
+            )
+        finally:
+            self.stats.dequeue()
+
+    async def _respond(self, op: int, request_id: int, body: bytes) -> List[bytes]:
+        try:
+            if op == OP_SEARCH:
+                return await self.search(request_id, decode_items(body))
+            if op == OP_GET:
+                return await self.get(request_id, decode_items(body))
+            if op == OP_STATS:
+                stats = self.stats.snapshot()
+                if self.engine.result_cache is not None:
+                    stats.update(self.engine.result_cache.stats())
+                return [encode_frame(OP_STATS, request_id, json.dumps(stats).encode())]
+            raise ValueError(f"Unknown op {op}")
+        except Exception as e:
+            # Any failure, not only a bad request (a store error, say), is
+            # answered with an error frame so the connection keeps serving.
+            return self._error(request_id, e)
+
+    def _error(self, request_id: int, error: Exception) -> List[bytes]:
+        self.stats.errors += 1
+        message = str(error) or type(error).__name__
+        return [encode_frame(OP_ERROR, request_id, message.encode())]
+
+    async def _send_responses(
+        self, responses: asyncio.Queue, writer: asyncio.StreamWriter
+    ) -> None:
+        connected = True
+        while True:
+            response = await responses.get()
+            if response is None:
+                return
+            received, request_id, pending = response
+            try:
+                frames = await pending
+            except Exception as e:
+                frames = self._error(request_id, e)
+            if not connected:
+                continue
+            try:
+                writer.writelines(frames)
+                await writer.drain()
+            except ConnectionError:
+                # Keep draining the queue so the reader never blocks on it.
+                connected = False
+                continue
+            self.stats.record(time.perf_counter_ns() - received)
+
+    async def _serve_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        writer.get_extra_info("socket").setsockopt(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+        )
+        self.stats.open_connections += 1
+        responses = asyncio.Queue(MAX_PIPELINED_REQUESTS)
+        sender = asyncio.create_task(self._send_responses(responses, writer))
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(FRAME_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                length, op, request_id = parse_frame_header(header)
+                body = await reader.readexactly(length)
+                received = time.perf_counter_ns()
+                pending = asyncio.ensure_future(self._respond(op, request_id, body))
+                await responses.put((received, request_id, pending))
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            await responses.put(None)
+            await sender
+            writer.close()
+            self.stats.open_connections -= 1
+
+
+async def log_stats(stats: ServerStats, interval: float) -> None:
+    """
+    Writes a JSON snapshot of `stats` to stderr every `interval` seconds.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        print(json.dumps(stats.snapshot()), file=sys.stderr, flush=True)
@@ -0,0 +1,242 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from .protocol import (
+    OP_DONE,
+    OP_ERROR,
+    OP_GET,
+    OP_RESULTS,
+    OP_SEARCH,
+    OP_STATS,
+    OP_VALUES,
+    decode_items,
+    decode_values,
+    encode_frame,
+    encode_items,
+    read_frame,
+)
+
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import json
+import socket
+import threading
+
+# Search tokens sent per OP_SEARCH request.
+DEFAULT_BATCH_SIZE = 256
+
+# Labels sent per OP_GET request.
+GET_BATCH_SIZE = 4096
+
+Trapdoor = Union[bytes, Iterable[bytes]]
+
+
+def trapdoor_tokens(trapdoor: Trapdoor) -> List[bytes]:
+    """
+    Schemes return either a single search token or a collection of them.
+    """
+    if isinstance(trapdoor, bytes):
+        return [trapdoor]
+    return list(trapdoor)
+
+
+class SearchClient:
+    """
+    Client side of the search protocol. A query's tokens are split into
+    requests of `batch_size` tokens, and all of them are written to the
+    socket (from a helper thread) while responses are read back, so a query
+    costs one round trip however many batches it needs.
+
+    A server error for one request is raised only once every other pending
+    request has been answered, so the connection stays usable. If a query
+    ends with responses still unread (the connection dropped, or a
+    search_iter was abandoned), the client closes the connection, and later
+    calls raise ValueError.
+    """
+
+    def __init__(
+        self, address: Tuple[str, int], batch_size: int = DEFAULT_BATCH_SIZE
+    ):
+        self.address = address
+        self.batch_size = batch_size
+        self.sock = socket.create_connection(address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.sock.makefile("rb")
+        self._next_request_id = 0
+        self.broken = None
+
+    def _request_id(self) -> int:
+        request_id = self._next_request_id
+        self._next_request_id = (request_id + 1) & 0xFFFFFFFF
+        return request_id
+
+    def _send_requests(self, op: int, requests: List[Tuple[int, List[bytes]]]) -> None:
+        for request_id, items in requests:
+            self.sock.sendall(encode_frame(op, request_id, encode_items(items)))
+
+    def _batch(self, items: List[bytes], batch_size: int) -> List[Tuple[int, List[bytes]]]:
+        return [
+            (self._request_id(), items[i : i + batch_size])
+            for i in range(0, len(items), batch_size)
+        ]
+
+    def _start_sender(self, op: int, requests) -> Optional[threading.Thread]:
+        """
+        Writes `requests` from a helper thread, so responses can be read
+        while later requests are still being sent. A single request cannot
+        deadlock against its own response and is written inline.
+        """
+        if len(requests) == 1:
+            self._send_requests(op, requests)
+            return None
+        sender = threading.Thread(target=self._send_requests, args=(op, requests))
+        sender.start()
+        return sender
+
+    def _check_usable(self) -> None:
+        if self.broken is not None:
+            raise ValueError(f"Connection to {self.address} is unusable: {self.broken}")
+
+    def _break(self, reason: str) -> None:
+        """
+        Closes a connection whose remaining responses can no longer be
+        matched to requests.
+        """
+        self.broken = reason
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.close()
+
+    def _read_response(self, pending: Set[int]) -> Tuple[int, int, bytes]:
+        frame = read_frame(self.rfile)
+        if frame is None:
+            raise ValueError("Server closed the connection")
+        op, request_id, body = frame
+        if request_id not in pending:
+            raise ValueError(f"Unexpected response to request {request_id}")
+        return frame
+
+    def _finish(self, sender: Optional[threading.Thread], pending: Set[int]) -> None:
+        """
+        Waits for the request writer; if responses are still owed, the
+        connection is out of step and is closed first.
+        """
+        if pending:
+            self._break(f"{len(pending)} responses were left unread")
+        if sender is not None:
+            sender.join()
+
+    def search_iter(self, trapdoor: Trapdoor) -> Iterator[List[bytes]]:
+        """
+        Yields the ciphertexts matching `trapdoor` in chunks, as the server
+        streams them back.
+        """
+        self._check_usable()
+        tokens = trapdoor_tokens(trapdoor)
+        requests = self._batch(tokens, self.batch_size)
+        if not requests:
+            return
+
+        sender = self._start_sender(OP_SEARCH, requests)
+        pending = {request_id for request_id, _ in requests}
+        error = None
+        try:
+            while pending:
+                op, request_id, body = self._read_response(pending)
+                if op == OP_RESULTS:
+                    if error is None:
+                        yield decode_items(body)
+                elif op == OP_DONE:
+                    pending.remove(request_id)
+                elif op == OP_ERROR:
+                    pending.remove(request_id)
+                    error = error or ValueError(f"Server error: {body.decode()}")
+                else:
+                    raise ValueError(f"Unknown op {op}")
+        finally:
+            self._finish(sender, pending)
+        if error is not None:
+            raise error
+
+    def search(self, trapdoor: Trapdoor) -> Set[bytes]:
+        results = set()
+        for chunk in self.search_iter(trapdoor):
+            results.update(chunk)
+        return results
+
+    def get_many(self, labels: List[bytes]) -> List[Optional[bytes]]:
+        """
+        Looks up raw ciphertext labels, returning the value stored under each
+        (None if absent) in order. Used by the sharded coordinator, which
+        walks posting lists itself.
+        """
+        self._check_usable()
+        requests = self._batch(list(labels), GET_BATCH_SIZE)
+        if not requests:
+            return []
+
+        sender = self._start_sender(OP_GET, requests)
+        pending = {request_id for request_id, _ in requests}
+        values = {}
+        error = None
+        try:
+            while pending:
+                op, request_id, body = self._read_response(pending)
+                if op == OP_VALUES:
+                    values[request_id] = decode_values(body)
+                elif op == OP_ERROR:
+                    error = error or ValueError(f"Server error: {body.decode()}")
+                else:
+                    raise ValueError(f"Unknown op {op}")
+                pending.remove(request_id)
+        finally:
+            self._finish(sender, pending)
+        if error is not None:
+            raise error
+        return [value for request_id, _ in requests for value in values[request_id]]
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Fetches the server's request and latency statistics (asyncio
+        frontend only).
+        """
+        self._check_usable()
+        request_id = self._request_id()
+        self.sock.sendall(encode_frame(OP_STATS, request_id))
+        pending = {request_id}
+        try:
+            op, _, body = self._read_response(pending)
+            pending.clear()
+        finally:
+            self._finish(None, pending)
+        if op == OP_ERROR:
+            raise ValueError(f"Server error: {body.decode()}")
+        if op != OP_STATS:
+            raise ValueError(f"Unexpected op {op}")
+        return json.loads(body)
+
+    def close(self) -> None:
+        self.rfile.close()
+        self.sock.close()
+
+    def __enter__(self) -> "SearchClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
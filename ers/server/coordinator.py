@@ -0,0 +1,137 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from ..schemes.common.prf import get_prf_backend
+from ..schemes.common.store import shard_of
+from .client import SearchClient, Trapdoor, trapdoor_tokens
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+# Posting-list positions fetched per token in the first round; the window
+# doubles every round up to MAX_WINDOW.
+INITIAL_WINDOW = 4
+MAX_WINDOW = 1024
+
+
+class ShardedSearchClient:
+    """
+    Scatter-gather search over an index split across shard servers (see
+    store.ShardedStore).
+
+    The entries of one posting list are spread over every shard, so no
+    shard can walk a list on its own. Instead the coordinator derives the
+    labels of positions 0, 1, 2, ... from each search token (it only needs
+    the PRF backend and label width, not the key), sends each label to the
+    shard that owns it, and stops a list at its first missing label. Each
+    round fetches a window of positions for every unfinished list at once,
+    one request per shard, all shards in parallel; the window doubles every
+    round, so a list of length n takes O(log n) rounds and at most about n
+    wasted lookups.
+    """
+
+    def __init__(
+        self,
+        addresses: List[Tuple[str, int]],
+        prf: str,
+        label_width: Optional[int] = None,
+        initial_window: int = INITIAL_WINDOW,
+        max_window: int = MAX_WINDOW,
+    ):
+        self.addresses = addresses
+        self.prf = get_prf_backend(prf)
+        self.label_width = label_width
+        self.initial_window = initial_window
+        self.max_window = max_window
+        self.shards = [SearchClient(address) for address in addresses]
+        self._pool = ThreadPoolExecutor(len(self.shards))
+
+    def get_many(self, labels: List[bytes]) -> List[Optional[bytes]]:
+        """
+        Looks up each label on its owning shard, all shards in parallel.
+        """
+        num_shards = len(self.shards)
+        positions = [[] for _ in range(num_shards)]
+        for index, label in enumerate(labels):
+            positions[shard_of(label, num_shards)].append(index)
+
+        futures = {
+            shard: self._pool.submit(
+                self.shards[shard].get_many, [labels[i] for i in indices]
+            )
+            for shard, indices in enumerate(positions)
+            if indices
+        }
+        values = [None] * len(labels)
+        for shard, future in futures.items():
+            for index, value in zip(positions[shard], future.result()):
+                values[index] = value
+        return values
+
+    def search(self, trapdoor: Trapdoor) -> Set[bytes]:
+        results = set()
+        active = [
+            self.prf.labels(token, 0, self.label_width)
+            for token in trapdoor_tokens(trapdoor)
+        ]
+        window = self.initial_window
+        while active:
+            windows = [[next(labels) for _ in range(window)] for labels in active]
+            values = self.get_many([label for labels in windows for label in labels])
+            still_active = []
+            for i, labels in enumerate(active):
+                found = values[i * window : (i + 1) * window]
+                for value in found:
+                    if value is None:
+                        break
+                    results.add(value)
+                else:
+                    still_active.append(labels)
+            active = still_active
+            window = min(2 * window, self.max_window)
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Server statistics summed over shards; latency and queue-depth
+        figures are the worst shard's.
+        """
+        per_shard = [shard.stats() for shard in self.shards]
+        merged = {}
+        for key in per_shard[0]:
+            if key == "pid":
+                continue
+            values = [stats[key] for stats in per_shard]
+            if key.startswith("latency") or key.endswith("queue_depth"):
+                merged[key] = max(values)
+            else:
+                merged[key] = sum(values)
+        if "cache_hit_rate" in merged:
+            lookups = merged["cache_hits"] + merged["cache_misses"]
+            merged["cache_hit_rate"] = merged["cache_hits"] / lookups if lookups else 0
+        return merged
+
+    def close(self) -> None:
+        for shard in self.shards:
+            shard.close()
+        self._pool.shutdown()
+
+    def __enter__(self) -> "ShardedSearchClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,114 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from ..schemes.common.store import CompactStore, split_index
+from .client import SearchClient
+from .coordinator import ShardedSearchClient
+from .server import engine_for_store, spawn_server
+
+from typing import Callable, List, Tuple, Union
+
+import argparse
+import functools
+import time
+
+
+class LocalShardCluster:
+    """
+    Runs one `ers.server` process per shard file on localhost, so the
+    sharded path can be exercised and benchmarked on a single machine.
+    `server_args` are passed to every shard server.
+    """
+
+    def __init__(self, shard_paths: List[str], server_args: List[str] = ()):
+        self.shard_paths = shard_paths
+        self.server_args = list(server_args)
+        self.processes = []
+        self.addresses: List[Tuple[str, int]] = []
+
+        # Every shard was written by the same engine; read its parameters
+        # from the first shard's header.
+        header = CompactStore.open(shard_paths[0])
+        self.prf = header.prf
+        self.label_width = engine_for_store(header).label_width
+        self.shard_sizes = []
+        for path in shard_paths:
+            shard = CompactStore.open(path)
+            self.shard_sizes.append(len(shard))
+            shard.close()
+        header.close()
+
+    def start(self) -> List[Tuple[str, int]]:
+        for path in self.shard_paths:
+            process, address = spawn_server(path, args=self.server_args)
+            self.processes.append(process)
+            self.addresses.append(address)
+        return self.addresses
+
+    def connector(self) -> Callable[[], Union[SearchClient, ShardedSearchClient]]:
+        """
+        A picklable factory for clients of the running cluster: a plain
+        SearchClient for a single shard, otherwise a ShardedSearchClient.
+        """
+        if len(self.addresses) == 1:
+            return functools.partial(SearchClient, self.addresses[0])
+        return functools.partial(
+            ShardedSearchClient, self.addresses, self.prf, self.label_width
+        )
+
+    def client(self) -> Union[SearchClient, ShardedSearchClient]:
+        return self.connector()()
+
+    def stop(self) -> None:
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait()
+        self.processes = []
+        self.addresses = []
+
+    def __enter__(self) -> "LocalShardCluster":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Split an encrypted index into shards and serve each one locally"
+    )
+    parser.add_argument("index", help="index file written by a mmap store or save_index")
+    parser.add_argument("--shards", type=int, default=4)
+    args = parser.parse_args()
+
+    index = CompactStore.open(args.index)
+    sharded = split_index(index, args.index, args.shards, index.prf)
+    index.close()
+    sharded.close()
+
+    with LocalShardCluster(sharded.paths) as cluster:
+        for path, size, (host, port) in zip(
+            cluster.shard_paths, cluster.shard_sizes, cluster.addresses
+        ):
+            print(f"{path}: {size} entries on {host}:{port}", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,67 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from .client import Trapdoor
+
+from typing import Callable, List, Tuple
+
+import multiprocessing
+import time
+
+DEFAULT_LOAD_SECONDS = 5.0
+
+
+def _replay(args: Tuple[Callable, List[Trapdoor], float]) -> Tuple[int, float]:
+    """
+    Sends the trapdoors in a loop for `duration` seconds through one client.
+    Returns the number of searches completed and the time taken. Runs inside
+    a load-generator process.
+    """
+    connect, trapdoors, duration = args
+    completed = 0
+    with connect() as client:
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            for trapdoor in trapdoors:
+                client.search(trapdoor)
+                completed += 1
+        return completed, time.perf_counter() - start
+
+
+def measure_throughput(
+    connect: Callable,
+    trapdoors: List[Trapdoor],
+    num_clients: int,
+    duration: float = DEFAULT_LOAD_SECONDS,
+) -> float:
+    """
+    Replays `trapdoors` from `num_clients` client processes at once, each
+    connecting with the picklable factory `connect` (e.g. a
+    functools.partial of SearchClient), and returns the searches answered
+    per second.
+    Clients are separate processes so the load generator is not itself
+    limited to one core.
+    """
+    if not trapdoors:
+        return 0
+    with multiprocessing.Pool(num_clients) as pool:
+        outcomes = pool.map(
+            _replay, [(connect, trapdoors, duration)] * num_clients
+        )
+    completed = sum(count for count, _ in outcomes)
+    elapsed = max(seconds for _, seconds in outcomes)
+    return completed / elapsed
@@ -0,0 +1,156 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from ..schemes.common.store import CompactStore
+from .async_server import AsyncSearchServer, log_stats
+from .server import SearchServer, engine_for_store
+
+from typing import Callable, List, Tuple
+
+import asyncio
+import os
+import signal
+import socket
+
+LISTEN_BACKLOG = 1024
+
+
+def _listening_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+
+def _serve_worker(
+    index_path: str,
+    sock: socket.socket,
+    frontend: str,
+    executor_workers: int,
+    stats_interval: float,
+    engine_options: dict,
+) -> None:
+    """
+    Body of one worker process: maps the index and serves `sock` until
+    terminated.
+    """
+    store = CompactStore.open(index_path)
+    engine = engine_for_store(store, **engine_options)
+
+    if frontend == "threads":
+        server = SearchServer(sock.getsockname(), engine, store, bind_and_activate=False)
+        server.socket.close()
+        server.socket = sock
+        server.serve_forever()
+        return
+
+    async def serve():
+        server = AsyncSearchServer(engine, store, executor_workers)
+        await server.start(None, None, sock=sock)
+        if stats_interval > 0:
+            asyncio.create_task(log_stats(server.stats, stats_interval))
+        try:
+            await server.serve_forever()
+        finally:
+            server.close()
+
+    asyncio.run(serve())
+
+
+def serve_prefork(
+    index_path: str,
+    host: str,
+    port: int,
+    num_workers: int,
+    frontend: str = "asyncio",
+    executor_workers: int = 4,
+    stats_interval: float = 0,
+    engine_options: dict = None,
+    on_listening: Callable[[Tuple[str, int]], None] = None,
+) -> None:
+    """
+    Serves `index_path` from `num_workers` forked worker processes.
+
+    Every worker memory-maps the same index file read-only, so the index
+    pages live once in the page cache however many workers there are; no
+    worker holds a copy of the index on its heap for refcount updates to
+    un-share. Where the platform has SO_REUSEPORT each worker listens on
+    its own socket bound to the shared port and the kernel spreads new
+    connections across them; otherwise the workers accept from one
+    inherited socket.
+
+    Runs until SIGINT or SIGTERM, then stops the workers.
+    """
+    if not hasattr(os, "fork"):
+        raise ValueError("Multi-worker serving needs os.fork")
+    engine_options = engine_options or {}
+    reuse_port = hasattr(socket, "SO_REUSEPORT")
+
+    # With SO_REUSEPORT this socket only reserves the port; it is never
+    # listened on, so it never receives connections.
+    reserved = _listening_socket(host, port, reuse_port)
+    address = reserved.getsockname()[:2]
+    if not reuse_port:
+        reserved.listen(LISTEN_BACKLOG)
+
+    workers: List[int] = []
+    for _ in range(num_workers):
+        if reuse_port:
+            sock = _listening_socket(address[0], address[1], True)
+            sock.listen(LISTEN_BACKLOG)
+        else:
+            sock = reserved
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                _serve_worker(
+                    index_path,
+                    sock,
+                    frontend,
+                    executor_workers,
+                    stats_interval,
+                    engine_options,
+                )
+            finally:
+                os._exit(0)
+        workers.append(pid)
+        if reuse_port:
+            sock.close()
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    if on_listening is not None:
+        on_listening(address)
+    try:
+        for pid in workers:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in workers:
+            os.waitpid(pid, 0)
+    finally:
+        reserved.close()
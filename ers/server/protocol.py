@@ -0,0 +1,146 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+
+import struct
+
+# Every message is a frame: a FRAME_HEADER (body length, op, request id)
+# followed by the body, all integers big-endian. A client may send any
+# number of requests before reading a response; the server answers each
+# request id with zero or more OP_RESULTS frames and then one OP_DONE (or
+# OP_ERROR) frame, in the order the requests arrived.
+#
+#   OP_SEARCH  client -> server   body: items, the search tokens
+#   OP_RESULTS server -> client   body: items, ciphertexts found
+#   OP_DONE    server -> client   body: ITEM_COUNT, total ciphertexts sent
+#   OP_ERROR   server -> client   body: UTF-8 error message
+#   OP_STATS   client -> server   body: empty
+#              server -> client   body: JSON object of server statistics
+#   OP_GET     client -> server   body: items, ciphertext labels
+#   OP_VALUES  server -> client   body: items, the ciphertext stored under
+#                                 each label, or an empty item if none
+#
+# "items" is ITEM_COUNT followed by that many ITEM_LENGTH-prefixed strings.
+FRAME_HEADER = struct.Struct(">IBI")
+ITEM_COUNT = struct.Struct(">I")
+ITEM_LENGTH = struct.Struct(">I")
+
+OP_SEARCH = 1
+OP_RESULTS = 2
+OP_DONE = 3
+OP_ERROR = 4
+OP_STATS = 5
+OP_GET = 6
+OP_VALUES = 7
+
+MAX_FRAME_SIZE = 1 << 26
+
+# Ciphertexts per OP_RESULTS frame.
+RESULT_CHUNK_SIZE = 4096
+
+Frame = Tuple[int, int, bytes]
+
+
+def encode_items(items: Iterable[bytes]) -> bytes:
+    items = list(items)
+    parts = [ITEM_COUNT.pack(len(items))]
+    for item in items:
+        parts.append(ITEM_LENGTH.pack(len(item)))
+        parts.append(item)
+    return b"".join(parts)
+
+
+def decode_items(body: bytes) -> List[bytes]:
+    try:
+        (count,) = ITEM_COUNT.unpack_from(body, 0)
+        offset = ITEM_COUNT.size
+        items = []
+        for _ in range(count):
+            (length,) = ITEM_LENGTH.unpack_from(body, offset)
+            offset += ITEM_LENGTH.size
+            items.append(body[offset : offset + length])
+            offset += length
+    except struct.error:
+        raise ValueError("Malformed item list")
+    if offset != len(body):
+        raise ValueError("Malformed item list")
+    return items
+
+
+def encode_values(values: Iterable[Optional[bytes]]) -> bytes:
+    """
+    Encodes lookup results; ciphertexts are never empty, so an empty item
+    stands for a missing label.
+    """
+    return encode_items(b"" if value is None else value for value in values)
+
+
+def decode_values(body: bytes) -> List[Optional[bytes]]:
+    return [value or None for value in decode_items(body)]
+
+
+def encode_frame(op: int, request_id: int, body: bytes = b"") -> bytes:
+    if len(body) > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame body of {len(body)} bytes is too large")
+    return FRAME_HEADER.pack(len(body), op, request_id) + body
+
+
+def parse_frame_header(header: bytes) -> Tuple[int, int, int]:
+    """
+    Returns (body length, op, request id), rejecting oversized bodies.
+    """
+    length, op, request_id = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame body of {length} bytes is too large")
+    return length, op, request_id
+
+
+def read_frame(stream: BinaryIO) -> Optional[Frame]:
+    """
+    Reads one frame from a buffered binary stream. Returns None if the
+    stream ends cleanly between frames.
+    """
+    header = stream.read(FRAME_HEADER.size)
+    if not header:
+        return None
+    if len(header) < FRAME_HEADER.size:
+        raise ValueError("Connection closed mid-frame")
+    length, op, request_id = parse_frame_header(header)
+    body = stream.read(length)
+    if len(body) < length:
+        raise ValueError("Connection closed mid-frame")
+    return op, request_id, body
+
+
+def encode_results(request_id: int, results: Iterable[bytes]) -> Iterable[bytes]:
+    """
+    Yields the OP_RESULTS frames carrying `results`, RESULT_CHUNK_SIZE
+    ciphertexts at a time, followed by the OP_DONE frame.
+    """
+    chunk = []
+    total = 0
+    for result in results:
+        chunk.append(result)
+        if len(chunk) == RESULT_CHUNK_SIZE:
+            yield encode_frame(OP_RESULTS, request_id, encode_items(chunk))
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        yield encode_frame(OP_RESULTS, request_id, encode_items(chunk))
+        total += len(chunk)
+    yield encode_frame(OP_DONE, request_id, ITEM_COUNT.pack(total))
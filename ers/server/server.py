@@ -0,0 +1,142 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from ..schemes.common.emm_engine import EMMEngine
+from ..schemes.common.store import CompactStore
+from .protocol import (
+    OP_ERROR,
+    OP_GET,
+    OP_SEARCH,
+    OP_VALUES,
+    decode_items,
+    encode_frame,
+    encode_results,
+    encode_values,
+    read_frame,
+)
+
+from typing import List, Optional, Set, Tuple
+
+import os
+import socketserver
+import subprocess
+import sys
+
+
+def engine_for_store(store: CompactStore, **engine_options) -> EMMEngine:
+    """
+    Returns an EMMEngine that searches `store`: same PRF backend and label
+    width as the one that built it. The domain bounds are unused by search.
+    An empty store records no label width and is searched with full labels.
+    """
+    return EMMEngine(
+        0, 0, prf=store.prf, label_width=store.label_width or None, **engine_options
+    )
+
+
+def lookup_many(encrypted_db, labels: List[bytes]) -> List[Optional[bytes]]:
+    """
+    The ciphertext stored under each label, or None.
+    """
+    if hasattr(encrypted_db, "get_many"):
+        return encrypted_db.get_many(labels)
+    return [encrypted_db.get(label) for label in labels]
+
+
+class SearchHandler(socketserver.StreamRequestHandler):
+    """
+    Serves one connection: reads request frames until the client hangs up
+    and answers each one in turn.
+    """
+
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        while True:
+            frame = read_frame(self.rfile)
+            if frame is None:
+                return
+            op, request_id, body = frame
+            try:
+                if op == OP_SEARCH:
+                    results = self.server.search(decode_items(body))
+                    frames = encode_results(request_id, results)
+                elif op == OP_GET:
+                    values = lookup_many(self.server.encrypted_db, decode_items(body))
+                    frames = [encode_frame(OP_VALUES, request_id, encode_values(values))]
+                else:
+                    raise ValueError(f"Unknown op {op}")
+            except Exception as e:
+                message = str(e) or type(e).__name__
+                self.wfile.write(encode_frame(OP_ERROR, request_id, message.encode()))
+                continue
+            for data in frames:
+                self.wfile.write(data)
+
+
+class SearchServer(socketserver.ThreadingTCPServer):
+    """
+    Hosts an encrypted index and answers batched search requests over the
+    protocol in protocol.py, one thread per connection.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        engine: EMMEngine,
+        encrypted_db,
+        bind_and_activate: bool = True,
+    ):
+        super().__init__(address, SearchHandler, bind_and_activate)
+        self.engine = engine
+        self.encrypted_db = encrypted_db
+
+    def search(self, tokens: List[bytes]) -> Set[bytes]:
+        return self.engine.search_many(tokens, self.encrypted_db)
+
+
+def spawn_server(
+    index_path: str, host: str = "127.0.0.1", args: List[str] = ()
+) -> Tuple[subprocess.Popen, Tuple[str, int]]:
+    """
+    Starts `python -m ers.server` on `index_path` in a child process, on a
+    free port, and returns the process and the address it listens on.
+    """
+    # Make `ers` importable in the child however the parent found it.
+    package_root = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [package_root, env.get("PYTHONPATH")])
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "ers.server", index_path, "--host", host, "--port", "0"]
+        + list(args),
+        stdout=subprocess.PIPE,
+        text=True,
+        env=env,
+    )
+    line = process.stdout.readline()
+    if not line.startswith("Listening on "):
+        process.kill()
+        raise ValueError(f"Server failed to start: {line!r}")
+    _, port = line.rsplit(":", 1)
+    return process, (host, int(port))
@@ -0,0 +1,188 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from .point import Point
+from .point_3d import Point3D
+from .quad_tree import QuadTree
+from .quad_tree_3d import QuadTree3D
+from .quad_tree_src import QuadTreeSRC
+from .quad_tree_3d_src import QuadTreeSRC3D
+from .rect import Rect
+from .rect_3d import Rect3D
+
+from typing import Callable, List, Tuple
+
+import argparse
+import random
+import time
+import tracemalloc
+
+# Microbenchmarks of the geometry types on the paths that allocate and hash
+# them in bulk: range-cover computation, QDAG construction and the
+# per-point label enumeration of build_index.
+
+
+def _rate(operation: Callable[[], int]) -> float:
+    """
+    Runs `operation`, which returns how many items it handled, and returns
+    the items handled per second.
+    """
+    start = time.perf_counter()
+    count = operation()
+    return count / (time.perf_counter() - start)
+
+
+def _allocated_bytes(make: Callable[[int], object], count: int) -> float:
+    """
+    Average bytes allocated per object by `count` calls to `make`.
+    """
+    tracemalloc.start()
+    objects = [make(i) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size / count
+
+
+def _random_queries(side: int, dims: int, count: int) -> List[Tuple[List[int], List[int]]]:
+    queries = []
+    for _ in range(count):
+        corners = [sorted(random.sample(range(side), 2)) for _ in range(dims)]
+        queries.append(([low for low, _ in corners], [high for _, high in corners]))
+    return queries
+
+
+def run(height: int, src_height: int, count: int) -> None:
+    side = 2 ** height
+    points = [(random.randrange(side), random.randrange(side)) for _ in range(count)]
+    points_3d = [
+        (random.randrange(side), random.randrange(side), random.randrange(side))
+        for _ in range(count)
+    ]
+    queries = _random_queries(side, 2, count // 100)
+    queries_3d = _random_queries(side, 3, count // 1000)
+
+    quad = QuadTree(Rect(Point(0, 0), Point(side - 1, side - 1)), height)
+    quad_3d = QuadTree3D(
+        Rect3D(Point3D(0, 0, 0), Point3D(side - 1, side - 1, side - 1)), height
+    )
+    qdag = QuadTreeSRC(src_height, True)
+    src_side = 2 ** src_height
+
+    def allocate_points() -> int:
+        for x, y in points:
+            Point(x, y)
+        return len(points)
+
+    def allocate_rects() -> int:
+        for x, y in points:
+            Rect(Point(x, y), Point(x + 1, y + 1))
+        return len(points)
+
+    def hash_rects() -> int:
+        rects = {Rect(Point(x, y), Point(x + 1, y + 1)): None for x, y in points}
+        found = sum(Rect(Point(x, y), Point(x + 1, y + 1)) in rects for x, y in points)
+        return len(rects) + found
+
+    def brc_covers() -> int:
+        return sum(
+            len(quad.get_brc_range_cover(Rect(Point(*low), Point(*high))))
+            for low, high in queries
+        )
+
+    def brc_covers_3d() -> int:
+        return sum(
+            len(quad_3d.get_brc_range_cover(Rect3D(Point3D(*low), Point3D(*high))))
+            for low, high in queries_3d
+        )
+
+    def quad_inserts() -> int:
+        return sum(
+            len(list(quad.find_containing_range_covers(Point(x, y)))) for x, y in points
+        )
+
+    def quad_inserts_3d() -> int:
+        return sum(
+            len(list(quad_3d.find_containing_range_covers(Point3D(x, y, z))))
+            for x, y, z in points_3d
+        )
+
+    def qdag_inserts() -> int:
+        return sum(
+            len(qdag.find_containing_range_covers(Point(x % src_side, y % src_side)))
+            for x, y in points[: count // 10]
+        )
+
+    def qdag_covers() -> int:
+        for low, high in queries:
+            corners = [
+                sorted((low[axis] % src_side, high[axis] % src_side)) for axis in (0, 1)
+            ]
+            qdag.get_single_range_cover(
+                Rect(
+                    Point(corners[0][0], corners[1][0]),
+                    Point(corners[0][1], corners[1][1]),
+                )
+            )
+        return len(queries)
+
+    def qdag_build() -> int:
+        return len(QuadTreeSRC(src_height, True).qdag_dict)
+
+    def qdag_build_3d() -> int:
+        return len(QuadTreeSRC3D(3, True).qdag_dict)
+
+    print("Operation,ItemsPerSec")
+    for name, operation in [
+        ("PointAlloc", allocate_points),
+        ("RectAlloc", allocate_rects),
+        ("RectHashInsertLookup", hash_rects),
+        ("QuadBRCCoverNodes", brc_covers),
+        ("QuadBRC3DCoverNodes", brc_covers_3d),
+        ("QuadInsertLabels", quad_inserts),
+        ("Quad3DInsertLabels", quad_inserts_3d),
+        ("QdagInsertLabels", qdag_inserts),
+        ("QdagSingleCovers", qdag_covers),
+        ("QdagBuildNodes", qdag_build),
+        ("Qdag3DBuildNodes", qdag_build_3d),
+    ]:
+        print(f"{name},{_rate(operation):.0f}")
+
+    print("----")
+    print("Type,BytesPerObject")
+    print(f"Point,{_allocated_bytes(lambda i: Point(i, i), count):.1f}")
+    print(f"Point3D,{_allocated_bytes(lambda i: Point3D(i, i, i), count):.1f}")
+    print(
+        f"Rect,{_allocated_bytes(lambda i: Rect(Point(i, i), Point(i + 1, i + 1)), count):.1f}"
+    )
+    print(
+        "Rect3D,"
+        f"{_allocated_bytes(lambda i: Rect3D(Point3D(i, i, i), Point3D(i + 1, i + 1, i + 1)), count):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Microbenchmark Point, Rect and the quadtree covers built on them"
+    )
+    parser.add_argument("--height", type=int, default=10, help="quadtree height")
+    parser.add_argument("--src_height", type=int, default=5, help="QDAG height")
+    parser.add_argument("--count", type=int, default=200000, help="points per operation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    run(args.height, args.src_height, args.count)
@@ -24,8 +24,13 @@ from ..util import serialization
 class Point:
     """
     A point representing an integer coordinate in a two-dimensional space.
+
+    Points are allocated in bulk by the covers and index builds, so they
+    carry fixed slots instead of a per-instance __dict__.
     """
 
+    __slots__ = ("x", "y")
+
     def __init__(self, x: int, y: int):
         self.x = int(x)
         self.y = int(y)
@@ -43,8 +48,11 @@ class Point:
     def __hash__(self):
         return hash((self.x, self.y))
 
+    def __reduce__(self):
+        return (self.__class__, (self.x, self.y))
+
     def __bytes__(self):
-        return serialization.ObjectToBytes([self.x, self.y])
+        return serialization.IntsToBytes((self.x, self.y))
 
     def __str__(self):
         return "Point(" + str(self.x) + ", " + str(self.y) + ")"
@@ -54,7 +62,7 @@ class Point:
 
     @classmethod
     def from_bytes(self, b: bytes):
-        x, y = serialization.BytesToObject(b)
+        x, y = serialization.BytesToLabelObject(b)
         return self(x, y)
 
     def contained_by(self, bottom, top):
@@ -24,8 +24,13 @@ from ..util import serialization
 class Point3D:
     """
     A point representing an integer coordinate in a three-dimensional space.
+
+    Points are allocated in bulk by the covers and index builds, so they
+    carry fixed slots instead of a per-instance __dict__.
     """
 
+    __slots__ = ("x", "y", "z")
+
     def __init__(self, x: int, y: int, z: int):
         self.x = int(x)
         self.y = int(y)
@@ -44,8 +49,11 @@ class Point3D:
     def __hash__(self):
         return hash((self.x, self.y, self.z))
 
+    def __reduce__(self):
+        return (self.__class__, (self.x, self.y, self.z))
+
     def __bytes__(self):
-        return serialization.ObjectToBytes([self.x, self.y, self.z])
+        return serialization.IntsToBytes((self.x, self.y, self.z))
 
     def __str__(self):
         return f"Point3D({self.x}, {self.y}, {self.z})"
@@ -55,7 +63,7 @@ class Point3D:
 
     @classmethod
     def from_bytes(self, b: bytes):
-        x, y, z = serialization.BytesToObject(b)
+        x, y, z = serialization.BytesToLabelObject(b)
         return self(x, y, z)
 
     def contained_by(self, bottom, top):
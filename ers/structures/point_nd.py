@@ -0,0 +1,56 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from ..util import serialization
+
+
+class PointND(tuple):
+    """
+    A point representing an integer coordinate in a d-dimensional space,
+    stored as a tuple of its d coordinates. Points compare, hash and unpack
+    like tuples, so per-axis work is a zip over coordinates.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, *coords: int):
+        return super().__new__(cls, map(int, coords))
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+    @property
+    def dims(self) -> int:
+        return len(self)
+
+    def __bytes__(self):
+        return serialization.IntsToBytes(tuple(self))
+
+    def __str__(self):
+        return "PointND(" + ", ".join(map(str, self)) + ")"
+
+    def __repr__(self):
+        return str(self)
+
+    @classmethod
+    def from_bytes(self, b: bytes):
+        return self(*serialization.BytesToLabelObject(b))
+
+    def contained_by(self, bottom, top):
+        return all(
+            low <= coord <= high for low, coord, high in zip(bottom, self, top)
+        )
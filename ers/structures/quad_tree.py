@@ -20,7 +20,6 @@ from .point import Point
 
 from typing import List, Set
 
-import math
 
 class QuadTree:
     def __init__(self, bounding_box: Rect, level: int):
@@ -50,19 +49,17 @@ class QuadTree:
             else:
                 results = list()
                 for child_rect in current_node.divide():
-                    resp = self._get_brc_range_cover_helper(query, child_rect)
-                    if resp not in results:
-                        results.extend(resp)
+                    results.extend(self._get_brc_range_cover_helper(query, child_rect))
                 return results
 
 
     def find_containing_range_covers(self, point: Point) -> Set[Rect]:
             x, y = point.x, point.y
             for power in range(self.level+1):
-                range_size = 2 ** power
+                range_size = 1 << power
 
-                left_x = math.floor(x / range_size) * range_size
-                left_y = math.floor(y / range_size) * range_size
+                left_x = x >> power << power
+                left_y = y >> power << power
                 right_x = left_x + range_size -1 
                 right_y = left_y + range_size -1
 
@@ -20,7 +20,6 @@ from .point_3d import Point3D
 
 from typing import Dict, List, Set
 
-import math
 
 QDAG_ROOT = "__root__"
 
@@ -55,9 +54,7 @@ class QuadTree3D:
             else:
                 results = list()
                 for child_rect in current_node.divide():
-                    resp = self._get_brc_range_cover_helper(query, child_rect)
-                    if resp not in results:
-                        results.extend(resp)
+                    results.extend(self._get_brc_range_cover_helper(query, child_rect))
                 return results
 
 
@@ -65,11 +62,11 @@ class QuadTree3D:
     def find_containing_range_covers(self, point: Point3D) -> Set[Rect3D]:
             x, y, z = point.x, point.y, point.z
             for power in range(self.level+1):
-                range_size = 2 ** power
+                range_size = 1 << power
 
-                left_x = math.floor(x / range_size) * range_size
-                left_y = math.floor(y / range_size) * range_size
-                left_z = math.floor(z / range_size) * range_size
+                left_x = x >> power << power
+                left_y = y >> power << power
+                left_z = z >> power << power
                 right_x = left_x + range_size -1 
                 right_y = left_y + range_size -1
                 right_z = left_z + range_size -1
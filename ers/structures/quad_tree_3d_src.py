@@ -17,13 +17,18 @@
 
 from .rect_3d import Rect3D
 from .point_3d import Point3D
+from ..util.serialization import BytesToDag, DagToBytes
 
 from typing import Dict, List, Set
 
 import math
+import struct
 
 QDAG_ROOT = "__root__"
 
+# max_domain and is_src, ahead of the DAG in to_bytes.
+QDAG_HEADER = struct.Struct("<Q?")
+
 
 class QuadTreeSRC3D:
     def __init__(self, height: int, is_src: bool):
@@ -31,6 +36,36 @@ class QuadTreeSRC3D:
         self.qdag_dict = QuadTreeSRC3D._build_quad_tree_src(height, is_src)
         self.is_src = is_src
 
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the DAG (see DagToBytes) so from_bytes can restore it
+        without rebuilding it, which takes time exponential in the height.
+        """
+        root = self.qdag_dict[QDAG_ROOT][0]
+        dag = {root: self.qdag_dict[root]}
+        dag.update(
+            (rect, children)
+            for rect, children in self.qdag_dict.items()
+            if rect != QDAG_ROOT
+        )
+        return QDAG_HEADER.pack(self.max_domain, self.is_src) + DagToBytes(
+            dag, lambda r: (r.start.x, r.start.y, r.start.z, r.end.x, r.end.y, r.end.z)
+        )
+
+    @classmethod
+    def from_bytes(cls, b: bytes) -> "QuadTreeSRC3D":
+        max_domain, is_src = QDAG_HEADER.unpack_from(b, 0)
+        qdag_dict = BytesToDag(
+            b[QDAG_HEADER.size :],
+            lambda c: Rect3D(Point3D(c[0], c[1], c[2]), Point3D(c[3], c[4], c[5])),
+        )
+        tree = cls.__new__(cls)
+        tree.max_domain = max_domain
+        tree.is_src = is_src
+        tree.qdag_dict = qdag_dict
+        qdag_dict[QDAG_ROOT] = [next(iter(qdag_dict))]
+        return tree
+
     def find_containing_range_covers(self, point: Point3D) -> Set[Rect3D]:
         # Start at root:
         root_rect_list = self.qdag_dict[
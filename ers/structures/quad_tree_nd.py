@@ -0,0 +1,126 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from .point_nd import PointND
+from .rect_nd import RectND
+from .tdag import tdag_cover_at, tdag_nodes_at
+
+from typing import Iterator, List
+
+import itertools
+
+
+class QuadTreeND:
+    """
+    A complete 2^d-ary tree over the hypercube [0, 2^height)^dims: every node
+    is a cube of side 2^level whose corner is a multiple of 2^level on every
+    axis, and splits into the 2^d cubes of half its side. The tree is never
+    built; nodes are computed from coordinates axis by axis.
+    """
+
+    def __init__(self, height: int, dims: int):
+        self.height = height
+        self.dims = dims
+
+    def find_containing_range_covers(self, point: PointND) -> Iterator[RectND]:
+        """
+        Yields the cube containing `point` at every level, root first.
+        """
+        for level in range(self.height, -1, -1):
+            start = PointND(*((coord >> level) << level for coord in point))
+            yield RectND(start, PointND(*(coord + (1 << level) - 1 for coord in start)))
+
+    def get_brc_range_cover(self, query: RectND) -> List[RectND]:
+        """
+        The fewest tree nodes whose union is `query`.
+        """
+        cover = []
+        self._get_brc_range_cover_helper(
+            query.start, query.end, (0,) * self.dims, self.height, cover
+        )
+        return cover
+
+    def _get_brc_range_cover_helper(
+        self, low: PointND, high: PointND, start: tuple, level: int, cover: List[RectND]
+    ) -> None:
+        size = 1 << level
+        if all(
+            lo <= corner and corner + size - 1 <= hi
+            for lo, hi, corner in zip(low, high, start)
+        ):
+            cover.append(
+                RectND(PointND(*start), PointND(*(corner + size - 1 for corner in start)))
+            )
+            return
+        # Only recurse into the children that overlap the query, choosing
+        # the overlapping halves axis by axis.
+        half = size >> 1
+        halves = [
+            [
+                corner
+                for corner in (axis_start, axis_start + half)
+                if corner <= hi and corner + half - 1 >= lo
+            ]
+            for lo, hi, axis_start in zip(low, high, start)
+        ]
+        for child in itertools.product(*halves):
+            self._get_brc_range_cover_helper(low, high, child, level - 1, cover)
+
+
+class QuadTreeSRCND:
+    """
+    The d-dimensional QDAG of QuadTreeSRC and QuadTreeSRC3D: every node of
+    side 2^level >= 2 has 3^d children of half its side, starting at 0, a
+    quarter or half of the way along each axis. On every axis, the nodes of
+    a level are then those of a TDAG level (see tdag.tdag_nodes_at), so the
+    DAG is computed axis by axis rather than materialised, which takes time
+    exponential in the height.
+    """
+
+    def __init__(self, height: int, dims: int):
+        self.height = height
+        self.dims = dims
+
+    def find_containing_range_covers(self, point: PointND) -> Iterator[RectND]:
+        """
+        Yields every node containing `point`, root first: at most 2^d per
+        level.
+        """
+        for level in range(self.height, -1, -1):
+            for axes in itertools.product(
+                *(tdag_nodes_at(coord, level, self.height) for coord in point)
+            ):
+                yield RectND(
+                    PointND(*(low for low, _ in axes)), PointND(*(high for _, high in axes))
+                )
+
+    def get_single_range_cover(self, query: RectND) -> RectND:
+        """
+        The smallest node containing `query`.
+        """
+        for level in range(self.height + 1):
+            axes = []
+            for low, high in zip(query.start, query.end):
+                cover = tdag_cover_at(low, high, level, self.height)
+                if cover is None:
+                    break
+                axes.append(cover)
+            else:
+                return RectND(
+                    PointND(*(low for low, _ in axes)), PointND(*(high for _, high in axes))
+                )
+        raise ValueError(f"{query} is outside the domain of the QDAG")
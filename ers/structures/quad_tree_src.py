@@ -17,13 +17,18 @@
 
 from .rect import Rect
 from .point import Point
+from ..util.serialization import BytesToDag, DagToBytes
 
 from typing import Dict, List, Set
 
 import math
+import struct
 
 QDAG_ROOT = "__root__"
 
+# max_domain and is_src, ahead of the DAG in to_bytes.
+QDAG_HEADER = struct.Struct("<Q?")
+
 
 def get_quad_divisions(rect: Rect) -> List[Rect]:
     """
@@ -113,6 +118,36 @@ class QuadTreeSRC:
         self.qdag_dict = QuadTreeSRC._build_quad_tree_src(height, is_src)
         self.is_src = is_src
 
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the DAG (see DagToBytes) so from_bytes can restore it
+        without rebuilding it, which takes time exponential in the height.
+        """
+        root = self.qdag_dict[QDAG_ROOT][0]
+        dag = {root: self.qdag_dict[root]}
+        dag.update(
+            (rect, children)
+            for rect, children in self.qdag_dict.items()
+            if rect != QDAG_ROOT
+        )
+        return QDAG_HEADER.pack(self.max_domain, self.is_src) + DagToBytes(
+            dag, lambda r: (r.start.x, r.start.y, r.end.x, r.end.y)
+        )
+
+    @classmethod
+    def from_bytes(cls, b: bytes) -> "QuadTreeSRC":
+        max_domain, is_src = QDAG_HEADER.unpack_from(b, 0)
+        qdag_dict = BytesToDag(
+            b[QDAG_HEADER.size :],
+            lambda c: Rect(Point(c[0], c[1]), Point(c[2], c[3])),
+        )
+        tree = cls.__new__(cls)
+        tree.max_domain = max_domain
+        tree.is_src = is_src
+        tree.qdag_dict = qdag_dict
+        qdag_dict[QDAG_ROOT] = [next(iter(qdag_dict))]
+        return tree
+
     def find_containing_range_covers(self, point: Point) -> Set[Rect]:
         # Start at root:
         root_rect_list = self.qdag_dict[
@@ -15,7 +15,7 @@
 ## limitations under the License.
 ##
 
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import functools
 
@@ -176,3 +176,139 @@ class RangeTree:
             if lvl not in seen_levels:
                 return False
         return True
+
+
+def dyadic_path(value: int, height: int) -> List[Tuple[int, int]]:
+    """
+    The ranges of the nodes on the path from the root of a complete range
+    tree over [0, 2^height - 1] down to the leaf (value, value), root first.
+    Computed from the bits of `value`, without building the tree.
+    """
+    return [
+        ((value >> level) << level, (((value >> level) + 1) << level) - 1)
+        for level in range(height, -1, -1)
+    ]
+
+
+def dyadic_cover(low: int, high: int, height: int) -> List[Tuple[int, int]]:
+    """
+    The ranges of the fewest range-tree nodes over [0, 2^height - 1] whose
+    union is [low, high] (the best range cover), left to right; the same
+    nodes RangeTree.get_brc_range_cover returns.
+    """
+    cover = []
+    while low <= high:
+        # The largest aligned node starting at `low` that ends by `high`:
+        # its size is bounded by the alignment of `low` and by the largest
+        # power of two that fits in what is left of the range.
+        size = min(
+            1 << ((high - low + 1).bit_length() - 1),
+            low & -low if low else 1 << height,
+        )
+        cover.append((low, low + size - 1))
+        low += size
+    return cover
+
+
+class ImplicitRangeTree:
+    """
+    A complete range tree over [0, 2^height - 1] that is never built. The
+    node at `level` (0 for leaves) with index i covers
+    [i * 2^level, (i + 1) * 2^level - 1], so paths and covers follow from
+    the bits of the query bounds: memory is O(1) and every cover takes
+    O(height) steps, however large the domain. Best and single range
+    covers are the same, in the same order, as those of a RangeTree of the
+    same height.
+    """
+
+    def __init__(self, height: int):
+        if height < 0:
+            raise ValueError("height must be non-negative")
+        self.height = height
+        self.range = (0, (1 << height) - 1)
+
+    @staticmethod
+    def node_range(level: int, index: int) -> Tuple[int, int]:
+        return (index << level, ((index + 1) << level) - 1)
+
+    def path(self, value: int) -> List[Tuple[int, int]]:
+        """
+        The ranges of the nodes from the root down to the leaf (value, value).
+        """
+        return dyadic_path(value, self.height)
+
+    def get_range_cover(self, query_range: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """
+        The best range cover of `query_range` (clipped to the domain) as
+        (level, range) pairs, left to right.
+        """
+        low = max(query_range[0], 0)
+        high = min(query_range[1], self.range[1])
+        return [
+            ((high - low + 1).bit_length() - 1, (low, high))
+            for low, high in dyadic_cover(low, high, self.height)
+        ]
+
+    def get_brc_range_cover(
+        self, query_range: Tuple[int, int]
+    ) -> List[Tuple[int, int]]:
+        low = max(query_range[0], 0)
+        high = min(query_range[1], self.range[1])
+        return dyadic_cover(low, high, self.height)
+
+    def get_urc_range_cover(
+        self, query_range: Tuple[int, int]
+    ) -> List[Tuple[int, int]]:
+        """
+        Splits nodes of the best range cover until it has a node at every
+        level up to its highest, left to right. To fill the lowest missing
+        level it splits the (rightmost) node of the next level up, down to
+        that level, so the cover keeps O(height) nodes. RangeTree splits in
+        another order and can return exponentially many.
+        """
+        range_cover = self.get_range_cover(query_range)
+        while range_cover:
+            levels = {level for level, _ in range_cover}
+            missing = [level for level in range(max(levels)) if level not in levels]
+            if not missing:
+                break
+            position = None
+            for i, (level, _) in enumerate(range_cover):
+                if level > missing[0] and (
+                    position is None or level <= range_cover[position][0]
+                ):
+                    position = i
+            level, (low, high) = range_cover[position]
+            middle = low + (1 << (level - 1))
+            range_cover[position : position + 1] = [
+                (level - 1, (low, middle - 1)),
+                (level - 1, (middle, high)),
+            ]
+        return [rng for _, rng in range_cover]
+
+    def get_single_range_cover(
+        self, query_range: Tuple[int, int]
+    ) -> Optional[Tuple[int, int]]:
+        """
+        The range of the smallest node containing `query_range`, or None if
+        the root does not contain it.
+        """
+        low, high = query_range
+        if low < 0 or high > self.range[1] or low > high:
+            return None
+        # The two bounds share their bits above the level of that node.
+        level = (low ^ high).bit_length()
+        return self.node_range(level, low >> level)
+
+    def get_range_cover_bits(self, query_range: Tuple[int, int]) -> List[List[int]]:
+        """
+        The best range cover as root-to-node paths, 0 for a left child and 1
+        for a right one.
+        """
+        paths = []
+        for level, (low, _) in self.get_range_cover(query_range):
+            index = low >> level
+            paths.append(
+                [(index >> bit) & 1 for bit in range(self.height - level - 1, -1, -1)]
+            )
+        return paths
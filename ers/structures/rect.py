@@ -16,13 +16,14 @@
 ##
 
 import functools
-import math
 
 from .point import Point
 
 
 @functools.total_ordering
 class Rect:
+    __slots__ = ("start", "end")
+
     def __init__(self, start: Point, end: Point):
         """
         Creates a rectangle bounded by the points `start` (inclusive) and
@@ -34,6 +35,9 @@ class Rect:
         if (self.start.x > self.end.x) or (self.start.y > self.end.y):
             raise ValueError
 
+    def __reduce__(self):
+        return (self.__class__, (self.start, self.end))
+
     def __str__(self):
         return "Rect[" + str(self.start) + ", " + str(self.end) + "]"
 
@@ -88,12 +92,8 @@ class Rect:
         """
         if not isinstance(point, Point):
             return False
-        return (
-            point.x >= self.start.x
-            and point.x < self.end.x
-            and point.y >= self.start.y
-            and point.y < self.end.y
-        )
+        start, end = self.start, self.end
+        return start.x <= point.x < end.x and start.y <= point.y < end.y
 
     def contains_rect(self, rect) -> bool:
         """
@@ -103,15 +103,13 @@ class Rect:
         if not isinstance(rect, Rect):
             return False
 
+        start, end = self.start, self.end
+        other_start, other_end = rect.start, rect.end
         return (
-            rect.start_x() >= self.start.x
-            and rect.start_x() < self.end.x
-            and rect.start_y() >= self.start.y
-            and rect.start_y() < self.end.y
-            and rect.end_x() > self.start.x
-            and rect.end_x() <= self.end.x
-            and rect.end_y() > self.start.y
-            and rect.end_y() <= self.end.y
+            start.x <= other_start.x < end.x
+            and start.y <= other_start.y < end.y
+            and start.x < other_end.x <= end.x
+            and start.y < other_end.y <= end.y
         )
 
     def contains_rect_inclusive(self, rect) -> bool:
@@ -121,15 +119,13 @@ class Rect:
         if not isinstance(rect, Rect):
             return False
 
+        start, end = self.start, self.end
+        other_start, other_end = rect.start, rect.end
         return (
-            rect.start_x() >= self.start.x
-            and rect.start_x() <= self.end.x
-            and rect.start_y() >= self.start.y
-            and rect.start_y() <= self.end.y
-            and rect.end_x() >= self.start.x
-            and rect.end_x() <= self.end.x
-            and rect.end_y() >= self.start.y
-            and rect.end_y() <= self.end.y
+            start.x <= other_start.x <= end.x
+            and start.y <= other_start.y <= end.y
+            and start.x <= other_end.x <= end.x
+            and start.y <= other_end.y <= end.y
         )
 
     def draw(self, ax, c="k", lw=1, **kwargs):
@@ -168,19 +164,17 @@ class Rect:
         return self.end.z
 
     def divide(self):
-        #print(self.start.x, self.end.x)
-        #print(self.start.y, self.end.y)
-        x_half = math.floor((self.start.x + self.end.x) / 2)
-        y_half = math.floor((self.start.y + self.end.y) / 2)
-
-        #print("half", x_half, y_half)
+        start_x, start_y = self.start.x, self.start.y
+        end_x, end_y = self.end.x, self.end.y
+        x_half = (start_x + end_x) // 2
+        y_half = (start_y + end_y) // 2
 
-        if self.end.x-self.start.x >=1 or self.end.y-self.start.y >=1:
+        if end_x - start_x >= 1 or end_y - start_y >= 1:
             return [
-                Rect(Point(self.start.x, self.start.y), Point(x_half, y_half)),
-                Rect(Point(self.start.x, y_half+1), Point(x_half, self.end.y)),
-                Rect(Point(x_half+1, self.start.y), Point(self.end.x, y_half)),
-                Rect(Point(x_half+1, y_half+1), Point(self.end.x, self.end.y)),
+                Rect(self.start, Point(x_half, y_half)),
+                Rect(Point(start_x, y_half + 1), Point(x_half, end_y)),
+                Rect(Point(x_half + 1, start_y), Point(end_x, y_half)),
+                Rect(Point(x_half + 1, y_half + 1), self.end),
             ]
         else:
             return []
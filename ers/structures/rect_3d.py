@@ -18,11 +18,12 @@
 from .point_3d import Point3D
 
 import functools
-import math
 
 
 @functools.total_ordering
 class Rect3D:
+    __slots__ = ("start", "end")
+
     def __init__(self, start: Point3D, end: Point3D):
         """
         Creates a rectangle bounded by the points `start` (inclusive) and
@@ -38,6 +39,9 @@ class Rect3D:
         ):
             raise ValueError
 
+    def __reduce__(self):
+        return (self.__class__, (self.start, self.end))
+
     def __str__(self):
         return "Rect3D[" + str(self.start) + ", " + str(self.end) + "]"
 
@@ -92,13 +96,11 @@ class Rect3D:
         """
         if not isinstance(point, Point3D):
             return False
+        start, end = self.start, self.end
         return (
-            point.x >= self.start.x
-            and point.x < self.end.x
-            and point.y >= self.start.y
-            and point.y < self.end.y
-            and point.z >= self.start.z
-            and point.z < self.end.z
+            start.x <= point.x < end.x
+            and start.y <= point.y < end.y
+            and start.z <= point.z < end.z
         )
 
     def contains_rect(self, rect) -> bool:
@@ -109,19 +111,15 @@ class Rect3D:
         if not isinstance(rect, Rect3D):
             return False
 
+        start, end = self.start, self.end
+        other_start, other_end = rect.start, rect.end
         return (
-            rect.start_x() >= self.start.x
-            and rect.start_x() < self.end.x
-            and rect.start_y() >= self.start.y
-            and rect.start_y() < self.end.y
-            and rect.start_z() >= self.start.z
-            and rect.start_z() < self.end.z
-            and rect.end_x() > self.start.x
-            and rect.end_x() <= self.end.x
-            and rect.end_y() > self.start.y
-            and rect.end_y() <= self.end.y
-            and rect.end_z() > self.start.z
-            and rect.end_z() <= self.end.z
+            start.x <= other_start.x < end.x
+            and start.y <= other_start.y < end.y
+            and start.z <= other_start.z < end.z
+            and start.x < other_end.x <= end.x
+            and start.y < other_end.y <= end.y
+            and start.z < other_end.z <= end.z
         )
 
     def contains_rect_brc(self, rect) -> bool:
@@ -132,15 +130,17 @@ class Rect3D:
         if not isinstance(rect, Rect3D):
             return False
 
+        start, end = self.start, self.end
+        other_start, other_end = rect.start, rect.end
         return (
-            
-            self.start.x <= rect.start.x
-            and self.end.x+1 >= rect.end.x
-            and self.start.y <= rect.start.y
-            and self.end.y+1 >= rect.end.y
-            and self.start.z <= rect.start.z
-            and self.end.z+1 >= rect.end.z
+            start.x <= other_start.x
+            and end.x + 1 >= other_end.x
+            and start.y <= other_start.y
+            and end.y + 1 >= other_end.y
+            and start.z <= other_start.z
+            and end.z + 1 >= other_end.z
         )
+
     def contains_rect_inclusive(self, rect) -> bool:
         """
         Returns true if `rect` is inside this `Rect`.
@@ -148,19 +148,15 @@ class Rect3D:
         if not isinstance(rect, Rect3D):
             return False
 
+        start, end = self.start, self.end
+        other_start, other_end = rect.start, rect.end
         return (
-            rect.start_x() >= self.start.x
-            and rect.start_x() <= self.end.x
-            and rect.start_y() >= self.start.y
-            and rect.start_y() <= self.end.y
-            and rect.start_z() >= self.start.z
-            and rect.start_z() <= self.end.z
-            and rect.end_x() >= self.start.x
-            and rect.end_x() <= self.end.x
-            and rect.end_y() >= self.start.y
-            and rect.end_y() <= self.end.y
-            and rect.end_z() >= self.start.z
-            and rect.end_z() <= self.end.z
+            start.x <= other_start.x <= end.x
+            and start.y <= other_start.y <= end.y
+            and start.z <= other_start.z <= end.z
+            and start.x <= other_end.x <= end.x
+            and start.y <= other_end.y <= end.y
+            and start.z <= other_end.z <= end.z
         )
 
     def draw(self, ax, c="k", lw=1, **kwargs):
@@ -200,24 +196,22 @@ class Rect3D:
 
 
     def divide(self):
-        #print(self.start.x, self.end.x)
-        #print(self.start.y, self.end.y)
-        x_half = math.floor((self.start.x + self.end.x) / 2)
-        y_half = math.floor((self.start.y + self.end.y) / 2)
-        z_half = math.floor((self.start.z + self.end.z) / 2)
-
-        #print("half", x_half, y_half)
+        start_x, start_y, start_z = self.start.x, self.start.y, self.start.z
+        end_x, end_y, end_z = self.end.x, self.end.y, self.end.z
+        x_half = (start_x + end_x) // 2
+        y_half = (start_y + end_y) // 2
+        z_half = (start_z + end_z) // 2
 
-        if self.end.x-self.start.x >=1 or self.end.y-self.start.y >=1:
+        if end_x - start_x >= 1 or end_y - start_y >= 1:
             return [
-                Rect3D(Point3D(self.start.x, self.start.y, self.start.z), Point3D(x_half, y_half, z_half)),
-                Rect3D(Point3D(self.start.x, self.start.y, z_half+1), Point3D(x_half, y_half, self.end.z)),
-                Rect3D(Point3D(self.start.x, y_half+1, self.start.z), Point3D(x_half, self.end.y,z_half)),
-                Rect3D(Point3D(self.start.x, y_half+1, z_half+1), Point3D(x_half, self.end.y,self.end.z)),
-                Rect3D(Point3D(x_half+1, self.start.y,self.start.z), Point3D(self.end.x, y_half,z_half)),
-                Rect3D(Point3D(x_half+1, self.start.y,z_half+1), Point3D(self.end.x, y_half,self.end.z)),
-                Rect3D(Point3D(x_half+1, y_half+1,self.start.z), Point3D(self.end.x, self.end.y,z_half)),
-                Rect3D(Point3D(x_half+1, y_half+1,z_half+1), Point3D(self.end.x, self.end.y,self.end.z)),
+                Rect3D(self.start, Point3D(x_half, y_half, z_half)),
+                Rect3D(Point3D(start_x, start_y, z_half + 1), Point3D(x_half, y_half, end_z)),
+                Rect3D(Point3D(start_x, y_half + 1, start_z), Point3D(x_half, end_y, z_half)),
+                Rect3D(Point3D(start_x, y_half + 1, z_half + 1), Point3D(x_half, end_y, end_z)),
+                Rect3D(Point3D(x_half + 1, start_y, start_z), Point3D(end_x, y_half, z_half)),
+                Rect3D(Point3D(x_half + 1, start_y, z_half + 1), Point3D(end_x, y_half, end_z)),
+                Rect3D(Point3D(x_half + 1, y_half + 1, start_z), Point3D(end_x, end_y, z_half)),
+                Rect3D(Point3D(x_half + 1, y_half + 1, z_half + 1), self.end),
             ]
         else:
             return []
@@ -0,0 +1,115 @@
+##
+## Copyright 2022 Zachary Espiritu and Evangelia Anna Markatou and
+##                Francesca Falzon and Roberto Tamassia and William Schor
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##    http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+##
+
+from .point_nd import PointND
+
+from typing import List, Tuple
+
+import itertools
+
+
+class RectND(tuple):
+    """
+    An axis-aligned box in a d-dimensional space, stored as the tuple
+    (start, end) of its corners. Unlike Rect, both corners are inclusive,
+    matching the (p1, p2) range queries the schemes answer.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, start: PointND, end: PointND):
+        start, end = PointND(*start), PointND(*end)
+        if len(start) != len(end):
+            raise ValueError("RectND corners must have the same dimension")
+        if any(low > high for low, high in zip(start, end)):
+            raise ValueError("RectND start must not exceed its end on any axis")
+        return super().__new__(cls, (start, end))
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+    @property
+    def start(self) -> PointND:
+        return self[0]
+
+    @property
+    def end(self) -> PointND:
+        return self[1]
+
+    @property
+    def dims(self) -> int:
+        return len(self[0])
+
+    def __str__(self):
+        return "RectND[" + str(self[0]) + ", " + str(self[1]) + "]"
+
+    def __repr__(self):
+        return str(self)
+
+    def intervals(self) -> List[Tuple[int, int]]:
+        """
+        The box as one inclusive (low, high) interval per axis.
+        """
+        return list(zip(self[0], self[1]))
+
+    def lengths(self) -> List[int]:
+        """
+        The number of integer coordinates the box spans on each axis.
+        """
+        return [high - low + 1 for low, high in zip(self[0], self[1])]
+
+    def volume(self) -> int:
+        volume = 1
+        for length in self.lengths():
+            volume *= length
+        return volume
+
+    def contains_point(self, point: PointND) -> bool:
+        return point.contained_by(self[0], self[1])
+
+    def contains_rect(self, rect: "RectND") -> bool:
+        return all(
+            low <= other_low and other_high <= high
+            for low, high, other_low, other_high in zip(
+                self[0], self[1], rect[0], rect[1]
+            )
+        )
+
+    def intersects(self, rect: "RectND") -> bool:
+        return all(
+            low <= other_high and other_low <= high
+            for low, high, other_low, other_high in zip(
+                self[0], self[1], rect[0], rect[1]
+            )
+        )
+
+    def divide(self) -> List["RectND"]:
+        """
+        Splits every axis longer than one coordinate in half and returns the
+        (up to 2^d) boxes formed by the halves.
+        """
+        halves = []
+        for low, high in zip(self[0], self[1]):
+            if low == high:
+                halves.append([(low, high)])
+            else:
+                middle = (low + high) // 2
+                halves.append([(low, middle), (middle + 1, high)])
+        return [
+            RectND(PointND(*(low for low, _ in axes)), PointND(*(high for _, high in axes)))
+            for axes in itertools.product(*halves)
+        ]
@@ -15,7 +15,7 @@
 ## limitations under the License.
 ##
 
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import functools
 
@@ -86,3 +86,63 @@ class Tdag:
     ) -> bool:
         return (main[0] <= secondary[0]) and (main[1] >= secondary[1])
 
+
+
+def tdag_nodes_at(value: int, level: int, height: int) -> List[Tuple[int, int]]:
+    """
+    The ranges of the TDAG nodes spanning 2^level coordinates that contain
+    `value`, in a TDAG over [0, 2^height - 1]. Above the leaves, nodes of
+    each size start at every multiple of half that size: the range-tree
+    nodes and the nodes injected between each pair of neighbours, so every
+    value is in at most two nodes per level.
+    """
+    size = 1 << level
+    if level == 0:
+        return [(value, value)]
+    half = size >> 1
+    aligned = (value // half) * half
+    return [
+        (start, start + size - 1)
+        for start in (aligned - half, aligned)
+        if 0 <= start <= (1 << height) - size
+    ]
+
+
+def tdag_path(value: int, height: int) -> List[Tuple[int, int]]:
+    """
+    The ranges of every TDAG node over [0, 2^height - 1] that contains
+    `value`, root first.
+    """
+    return [
+        node
+        for level in range(height, -1, -1)
+        for node in tdag_nodes_at(value, level, height)
+    ]
+
+
+def tdag_cover_at(
+    low: int, high: int, level: int, height: int
+) -> Optional[Tuple[int, int]]:
+    """
+    The range of a TDAG node spanning 2^level coordinates that contains
+    [low, high], or None if there is none.
+    """
+    size = 1 << level
+    if level == 0:
+        return (low, high) if low == high else None
+    half = size >> 1
+    start = min((low // half) * half, (1 << height) - size)
+    return (start, start + size - 1) if high < start + size else None
+
+
+def tdag_cover(low: int, high: int, height: int) -> Tuple[int, int]:
+    """
+    The range of the smallest TDAG node over [0, 2^height - 1] that
+    contains [low, high] (the single range cover). It spans at most four
+    times the query length rounded up to a power of two.
+    """
+    for level in range(height + 1):
+        cover = tdag_cover_at(low, high, level, height)
+        if cover is not None:
+            return cover
+    raise ValueError(f"[{low}, {high}] is outside the domain of a height-{height} TDAG")
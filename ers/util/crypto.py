@@ -25,6 +25,8 @@ from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
+from typing import List
+
 import random
 import os
 import math
@@ -75,6 +77,20 @@ def HMAC(key: bytes, data: bytes) -> bytes:
     return h.finalize()
 
 
+def HMACState(key: bytes) -> hmac.HMAC:
+    """
+    Returns a SHA-512 HMAC context that has already absorbed the key. Call
+    `.copy()` on it, then `update` and `finalize` the copy, to MAC a message
+    without re-running the key schedule.
+
+    Params:
+        > key - bytes
+
+    Returns: a keyed HMAC context (cryptography.hazmat.primitives.hmac.HMAC)
+    """
+    return hmac.HMAC(key, hashes.SHA512())
+
+
 def HMACEqual(hmac1: bytes, hmac2: bytes) -> bool:
     """
     Check if an HMAC is correct in constant time wrt the number of matching bytes.
@@ -204,6 +220,42 @@ def SymmetricDecrypt(key: bytes, ciphertext: bytes) -> bytes:
     return plaintext
 
 
+def SymmetricDecryptBatch(key: bytes, ciphertexts: List[bytes]) -> List[bytes]:
+    """
+    Decrypts many SymmetricEncrypt ciphertexts under the same key. All block
+    decryptions go through one AES-ECB context in a single call; the CBC
+    chaining (XOR with the previous block or the IV) and the PKCS7 unpadding
+    are then applied per ciphertext. Equivalent to calling SymmetricDecrypt
+    on each ciphertext, but without building a Cipher per ciphertext.
+
+    Params:
+        > key         - bytes
+        > ciphertexts - list of bytes (each with its IV as the last 16 bytes)
+
+    Returns: the list of plaintexts, in the same order (list of bytes).
+             Raises ValueError if a plaintext has invalid padding.
+    """
+    decryptor = Cipher(algorithms.AES(key), modes.ECB()).decryptor()
+    blocks = decryptor.update(b"".join(ct[:-16] for ct in ciphertexts))
+
+    plaintexts = []
+    offset = 0
+    for ct in ciphertexts:
+        length = len(ct) - 16
+        chain = ct[-16:] + ct[: length - 16]
+        padded = (
+            int.from_bytes(blocks[offset : offset + length], "big")
+            ^ int.from_bytes(chain, "big")
+        ).to_bytes(length, "big")
+        offset += length
+
+        pad = padded[-1] if padded else 0
+        if not 1 <= pad <= 16 or padded[-pad:] != bytes([pad]) * pad:
+            raise ValueError("Invalid padding bytes.")
+        plaintexts.append(padded[:-pad])
+    return plaintexts
+
+
 def SecureRandom(num_bytes: int) -> bytes:
     """
     Given a length, return that many randomly generated bytes. Can be used for an IV or symmetric key.
@@ -17,6 +17,13 @@
 
 import json
 import base64
+import functools
+import itertools
+import struct
+import sys
+
+from array import array
+from typing import Callable, Dict, List, Sequence, Tuple
 
 def _print_bytes(b: bytes) -> None:
     """
@@ -162,3 +169,206 @@ def BytesToObject(b: bytes) -> object:
     """
     obj = json.loads(b.decode())
     return _repair_bytes(obj)
+
+
+# First byte of every IntsToBytes encoding. JSON text never starts with it,
+# so the two label formats can be told apart.
+BINARY_TAG = b"\x01"
+
+BINARY_INT = "q"
+BINARY_NONE = "n"
+
+
+def _binary_shape(o, ints: list) -> str:
+    """
+    A helper function for IntsToBytes: appends the integers of `o` to `ints`
+    in order and returns its shape, with each list or tuple written as
+    "(...)", each int as "q" and each None as "n".
+    """
+    if isinstance(o, int):
+        ints.append(o)
+        return BINARY_INT
+    if isinstance(o, (list, tuple)):
+        return "(" + "".join([_binary_shape(item, ints) for item in o]) + ")"
+    if o is None:
+        return BINARY_NONE
+    raise ValueError(f"IntsToBytes cannot encode {type(o)}; expected ints, lists and tuples")
+
+
+@functools.lru_cache(maxsize=None)
+def _binary_format(shape: str) -> struct.Struct:
+    return struct.Struct("<" + BINARY_INT * shape.count(BINARY_INT))
+
+
+@functools.lru_cache(maxsize=None)
+def _flat_codec(length: int) -> Tuple[bytes, struct.Struct]:
+    shape = "(" + BINARY_INT * length + ")"
+    return BINARY_TAG + shape.encode(), _binary_format(shape)
+
+
+@functools.lru_cache(maxsize=None)
+def _nested_codec(lengths: Tuple[int, ...]) -> Tuple[bytes, struct.Struct]:
+    shape = "(" + "".join("(" + BINARY_INT * n + ")" for n in lengths) + ")"
+    return BINARY_TAG + shape.encode(), _binary_format(shape)
+
+
+def IntsToBytes(o: object) -> bytes:
+    """
+    A compact, canonical alternative to ObjectToBytes for the labels schemes
+    build from integers: arbitrary nestings of lists and tuples of ints (and
+    None). The encoding is BINARY_TAG, the ASCII shape of `o` (see
+    _binary_shape) and then its ints as little-endian int64s, so equal
+    values always encode to equal bytes and lists and tuples are
+    interchangeable.
+    """
+    # Fast paths for the shapes labels are made of: a sequence of ints
+    # (a point) and a sequence of sequences of ints (a list of ranges).
+    try:
+        if isinstance(o[0], (list, tuple)):
+            prefix, codec = _nested_codec(tuple(map(len, o)))
+            return prefix + codec.pack(*itertools.chain.from_iterable(o))
+        prefix, codec = _flat_codec(len(o))
+        return prefix + codec.pack(*o)
+    except (IndexError, TypeError, KeyError, struct.error):
+        pass
+    ints = []
+    shape = _binary_shape(o, ints)
+    return BINARY_TAG + shape.encode() + _binary_format(shape).pack(*ints)
+
+
+def _binary_rebuild(shape: str, position: int, ints: iter):
+    """
+    A helper function for BytesToInts: rebuilds the value whose shape starts
+    at `position`, returning it and the position after it.
+    """
+    char = shape[position]
+    if char == BINARY_INT:
+        return next(ints), position + 1
+    if char == BINARY_NONE:
+        return None, position + 1
+    items = []
+    position += 1
+    while shape[position] != ")":
+        item, position = _binary_rebuild(shape, position, ints)
+        items.append(item)
+    return items, position + 1
+
+
+def BytesToInts(b: bytes) -> object:
+    """
+    Decodes the output of IntsToBytes, with every list or tuple rebuilt as
+    a list.
+    """
+    if b[:1] != BINARY_TAG:
+        raise ValueError("Not an IntsToBytes encoding")
+    # The shape is a single balanced term, so it ends where its first
+    # parenthesis closes (or after one character).
+    shape_end = 1
+    depth = 0
+    while True:
+        char = b[shape_end : shape_end + 1]
+        if not char:
+            raise ValueError("Truncated IntsToBytes encoding")
+        shape_end += 1
+        if char == b"(":
+            depth += 1
+        elif char == b")":
+            depth -= 1
+        if depth == 0:
+            break
+    shape = b[1:shape_end].decode()
+    ints = iter(_binary_format(shape).unpack(b[shape_end:]))
+    value, _ = _binary_rebuild(shape, 0, ints)
+    return value
+
+
+def BytesToLabelObject(b: bytes) -> object:
+    """
+    Decodes a label in either format: IntsToBytes if it starts with
+    BINARY_TAG, ObjectToBytes (JSON) otherwise.
+    """
+    if b[:1] == BINARY_TAG:
+        return BytesToInts(b)
+    return BytesToObject(b)
+
+
+# How schemes turn cover nodes into labels; see EMMEngine(label_codec=...).
+# "json" reproduces the labels of indexes built before IntsToBytes existed.
+LABEL_CODECS = {
+    "binary": IntsToBytes,
+    "json": ObjectToBytes,
+}
+
+
+# Node count, edge count and ints per node of a DagToBytes encoding.
+DAG_HEADER = struct.Struct("<QQI")
+
+
+def _int_array(typecode: str, values) -> array:
+    values = array(typecode, values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def DagToBytes(
+    dag: Dict[object, List[object]], node_ints: Callable[[object], Sequence[int]]
+) -> bytes:
+    """
+    Serializes a DAG given as a dict from each node to its list of children,
+    where every child is also a key. Nodes are numbered in the dict's order
+    and written as the fixed number of ints `node_ints` returns for each,
+    followed by each node's child count and then every child's number, all
+    as little-endian arrays, so reading it back is a few array copies
+    rather than a parse.
+    """
+    number = {node: i for i, node in enumerate(dag)}
+    ints = _int_array("q", itertools.chain.from_iterable(map(node_ints, dag)))
+    width = len(ints) // len(number) if number else 0
+    counts = _int_array("Q", map(len, dag.values()))
+    edges = _int_array(
+        "Q", (number[child] for children in dag.values() for child in children)
+    )
+    return b"".join(
+        [
+            DAG_HEADER.pack(len(number), len(edges), width),
+            ints.tobytes(),
+            counts.tobytes(),
+            edges.tobytes(),
+        ]
+    )
+
+
+def _read_int_array(typecode: str, b: bytes, start: int, count: int) -> array:
+    values = array(typecode)
+    end = start + values.itemsize * count
+    if end > len(b):
+        raise ValueError("Truncated DagToBytes encoding")
+    values.frombytes(b[start:end])
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def BytesToDag(
+    b: bytes, make_node: Callable[[Sequence[int]], object]
+) -> Dict[object, List[object]]:
+    """
+    Decodes the output of DagToBytes, rebuilding every node from its ints
+    with `make_node`. The dict keeps the order the nodes were written in.
+    """
+    num_nodes, num_edges, width = DAG_HEADER.unpack_from(b, 0)
+    position = DAG_HEADER.size
+    ints = _read_int_array("q", b, position, num_nodes * width)
+    position += ints.itemsize * len(ints)
+    counts = _read_int_array("Q", b, position, num_nodes)
+    position += counts.itemsize * num_nodes
+    edges = _read_int_array("Q", b, position, num_edges)
+
+    nodes = [make_node(ints[i : i + width]) for i in range(0, len(ints), width)]
+    dag = {}
+    start = 0
+    for node, count in zip(nodes, counts):
+        dag[node] = [nodes[child] for child in edges[start : start + count]]
+        start += count
+    return dag